@@ -0,0 +1,428 @@
+"""Offline-Lasttest für Custom API und MCP Server gegen lokale Stubs.
+
+Startet OpenAI- und Upstream-Stubs im Prozess sowie beide Services als Subprozesse, erzeugt parallele
+Last auf `/chat/completions` (SSE und JSON) und auf die MCP-Tools und schreibt Durchsatz, TTFB und
+p50/p95/p99-Latenzen pro Endpunkt als JSON.
+
+    python -m benchmarks.run --requests 200 --concurrency 20 --output bench.json
+    python -m benchmarks.run --output bench.json --compare baseline.json --max-regression 10
+"""
+
+import asyncio
+import base64
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+import click
+import httpx
+import uvicorn
+
+from benchmarks.stubs import create_openai_stub, create_upstream_stub
+
+USERNAME: str = "bench"
+PASSWORD: str = "bench"
+AUTH_HEADER: str = "Basic " + base64.b64encode(f"{USERNAME}:{PASSWORD}".encode()).decode()
+INGREDIENTS: list[str] = ["Nudeln", "Tomaten", "Käse", "Basilikum", "Knoblauch", "Zwiebeln", "Paprika", "Reis", "Eier"]
+
+
+@dataclass
+class Sample:
+    ok: bool
+    latency: float
+    ttfb: float | None = None
+    ttfc: float | None = None
+    error: str | None = None
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    samples: list[Sample] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def summary(self) -> dict[str, Any]:
+        ok: list[Sample] = [sample for sample in self.samples if sample.ok]
+        errors: dict[str, int] = {}
+        for sample in self.samples:
+            if not sample.ok:
+                errors[sample.error or "unknown"] = errors.get(sample.error or "unknown", 0) + 1
+        return {
+            "requests": len(self.samples),
+            "ok": len(ok),
+            "errors": errors,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "throughput_rps": round(len(ok) / self.elapsed, 2) if self.elapsed else 0.0,
+            "latency": distribution([sample.latency for sample in ok]),
+            "ttfb": distribution([sample.ttfb for sample in ok if sample.ttfb is not None]),
+            "ttfc": distribution([sample.ttfc for sample in ok if sample.ttfc is not None]),
+        }
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered: list[float] = sorted(values)
+    position: float = (len(ordered) - 1) * q
+    lower: int = int(position)
+    upper: int = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def distribution(values: list[float]) -> dict[str, float] | None:
+    if not values:
+        return None
+    return {
+        "mean": round(sum(values) / len(values), 4),
+        "p50": round(percentile(values, 0.50), 4),
+        "p95": round(percentile(values, 0.95), 4),
+        "p99": round(percentile(values, 0.99), 4),
+        "max": round(max(values), 4),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+### Servers ###
+async def start_stub(app: Any, port: int) -> tuple[uvicorn.Server, asyncio.Task]:
+    server: uvicorn.Server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task: asyncio.Task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+def start_service(python: str, module: str, env: dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [python, "-c", f"from {module} import main; main()"],
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_until_healthy(url: str, timeout: float = 60.0) -> float:
+    started_at: float = time.perf_counter()
+    async with httpx.AsyncClient(headers={"Authorization": AUTH_HEADER}) as client:
+        while time.perf_counter() - started_at < timeout:
+            try:
+                if (await client.get(url)).status_code < 300:
+                    return time.perf_counter() - started_at
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Service unter {url} wurde nicht rechtzeitig bereit")
+
+
+### Load ###
+async def run_scenario(
+    name: str, requests: int, concurrency: int, call: Callable[[int], Awaitable[Sample]]
+) -> ScenarioResult:
+    result: ScenarioResult = ScenarioResult(name=name)
+    counter: list[int] = [0]
+
+    async def worker() -> None:
+        while counter[0] < requests:
+            index: int = counter[0]
+            counter[0] += 1
+            started_at: float = time.perf_counter()
+            try:
+                result.samples.append(await call(index))
+            except Exception as error:
+                result.samples.append(
+                    Sample(ok=False, latency=time.perf_counter() - started_at, error=type(error).__name__)
+                )
+
+    started_at: float = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - started_at
+    return result
+
+
+def ingredients_for(index: int) -> str:
+    # Unique ingredient sets so that the recipe cache does not short-circuit the generation path
+    picked: list[str] = [INGREDIENTS[(index + offset) % len(INGREDIENTS)] for offset in range(3)]
+    return ", ".join(picked + [f"Zutat{index}"])
+
+
+def chat_stream_call(client: httpx.AsyncClient) -> Callable[[int], Awaitable[Sample]]:
+    async def call(index: int) -> Sample:
+        body: dict[str, Any] = {
+            "model": "recipe",
+            "messages": [{"role": "user", "content": ingredients_for(index)}],
+            "stream": True,
+        }
+        started_at: float = time.perf_counter()
+        ttfb: float | None = None
+        ttfc: float | None = None
+        async with client.stream("POST", "/chat/completions", json=body) as response:
+            if response.status_code != 200:
+                return Sample(ok=False, latency=time.perf_counter() - started_at, error=f"HTTP {response.status_code}")
+            async for line in response.aiter_lines():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - started_at
+                if ttfc is None and line.startswith("data: ") and '"type":"chunk"' in line:
+                    ttfc = time.perf_counter() - started_at
+        return Sample(
+            ok=ttfc is not None,
+            latency=time.perf_counter() - started_at,
+            ttfb=ttfb,
+            ttfc=ttfc,
+            error=None if ttfc else "no content",
+        )
+
+    return call
+
+
+def chat_json_call(client: httpx.AsyncClient) -> Callable[[int], Awaitable[Sample]]:
+    async def call(index: int) -> Sample:
+        body: dict[str, Any] = {
+            "model": "recipe",
+            "messages": [{"role": "user", "content": ingredients_for(index)}],
+            "stream": False,
+        }
+        started_at: float = time.perf_counter()
+        response: httpx.Response = await client.post("/chat/completions", json=body)
+        latency: float = time.perf_counter() - started_at
+        if response.status_code != 200:
+            return Sample(ok=False, latency=latency, error=f"HTTP {response.status_code}")
+        return Sample(ok=True, latency=latency, ttfb=latency)
+
+    return call
+
+
+class MCPSession:
+    """Minimaler MCP-Client über Streamable HTTP (JSON-RPC), ohne zusätzliche Abhängigkeiten"""
+
+    def __init__(self, client: httpx.AsyncClient) -> None:
+        self.client: httpx.AsyncClient = client
+        self.session_id: str | None = None
+        self._next_id: int = 0
+
+    async def _post(self, payload: dict[str, Any]) -> tuple[httpx.Response, dict[str, Any] | None, float]:
+        headers: dict[str, str] = {"Accept": "application/json, text/event-stream"}
+        if self.session_id:
+            headers["mcp-session-id"] = self.session_id
+        started_at: float = time.perf_counter()
+        async with self.client.stream("POST", "/", json=payload, headers=headers) as response:
+            ttfb: float = time.perf_counter() - started_at
+            message: dict[str, Any] | None = None
+            if "id" in payload:
+                if response.headers.get("content-type", "").startswith("text/event-stream"):
+                    async for line in response.aiter_lines():
+                        if line.startswith("data: "):
+                            data: dict[str, Any] = json.loads(line[6:])
+                            if data.get("id") == payload["id"]:
+                                message = data
+                                break
+                else:
+                    message = json.loads(await response.aread())
+            return response, message, ttfb
+
+    async def request(self, method: str, params: dict[str, Any]) -> tuple[dict[str, Any] | None, float]:
+        self._next_id += 1
+        response, message, ttfb = await self._post(
+            {"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params}
+        )
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        self.session_id = response.headers.get("mcp-session-id", self.session_id)
+        return message, ttfb
+
+    async def initialize(self) -> None:
+        await self.request(
+            "initialize",
+            {"protocolVersion": "2025-06-18", "capabilities": {}, "clientInfo": {"name": "benchmark", "version": "1"}},
+        )
+        await self._post({"jsonrpc": "2.0", "method": "notifications/initialized"})
+
+
+def mcp_tool_call(
+    client: httpx.AsyncClient, tool: str, sessions: list[MCPSession]
+) -> Callable[[int], Awaitable[Sample]]:
+    async def call(_: int) -> Sample:
+        session: MCPSession = sessions.pop() if sessions else MCPSession(client)
+        if session.session_id is None:
+            await session.initialize()
+        started_at: float = time.perf_counter()
+        try:
+            message, ttfb = await session.request("tools/call", {"name": tool, "arguments": {}})
+        finally:
+            sessions.append(session)
+        latency: float = time.perf_counter() - started_at
+        if message is None or "error" in message or (message.get("result") or {}).get("isError"):
+            return Sample(ok=False, latency=latency, error="tool error")
+        return Sample(ok=True, latency=latency, ttfb=ttfb)
+
+    return call
+
+
+### Report ###
+def compare(results: dict[str, Any], baseline: dict[str, Any], max_regression: float) -> bool:
+    regressed: bool = False
+    click.echo(f"\n{'scenario':<22}{'p95 base':>10}{'p95 now':>10}{'Δ p95':>9}{'rps base':>10}{'rps now':>10}")
+    for name, summary in results["scenarios"].items():
+        base: dict[str, Any] | None = baseline.get("scenarios", {}).get(name)
+        if not base or not base.get("latency") or not summary.get("latency"):
+            continue
+        p95_base: float = base["latency"]["p95"]
+        p95_now: float = summary["latency"]["p95"]
+        delta: float = (p95_now - p95_base) / p95_base * 100 if p95_base else 0.0
+        flag: str = " ❌" if delta > max_regression else ""
+        regressed |= delta > max_regression
+        click.echo(
+            f"{name:<22}{p95_base:>10.3f}{p95_now:>10.3f}{delta:>8.1f}%"
+            f"{base['throughput_rps']:>10.2f}{summary['throughput_rps']:>10.2f}{flag}"
+        )
+    return regressed
+
+
+async def benchmark(options: dict[str, Any]) -> dict[str, Any]:
+    openai_port, upstream_port, api_port, mcp_port = free_port(), free_port(), free_port(), free_port()
+    stubs: list[tuple[uvicorn.Server, asyncio.Task]] = [
+        await start_stub(
+            create_openai_stub(options["llm_latency"], options["llm_jitter"], options["llm_tokens_per_second"]),
+            openai_port,
+        ),
+        await start_stub(create_upstream_stub(options["upstream_latency"], options["upstream_jitter"]), upstream_port),
+    ]
+    upstream: str = f"http://127.0.0.1:{upstream_port}"
+    services: list[subprocess.Popen] = [
+        start_service(
+            options["custom_api_python"],
+            "custom_api.main",
+            {
+                "CUSTOM_API_PORT": str(api_port),
+                "CUSTOM_API_USER": USERNAME,
+                "CUSTOM_API_PASSWORD": PASSWORD,
+                "OPENAI_API_KEY": "sk-benchmark",
+                "CUSTOM_API_LLM_PROVIDER": f"http://127.0.0.1:{openai_port}/v1",
+                "CUSTOM_API_RECIPE_CACHE_BACKEND": "memory" if options["with_cache"] else "none",
+                "CUSTOM_API_LLM_PROMPT_LAYOUT": options["prompt_layout"],
+            },
+        ),
+        start_service(
+            options["mcp_python"],
+            "mcp_server.main",
+            {
+                "MCP_PORT": str(mcp_port),
+                "MCP_USER": USERNAME,
+                "MCP_PASSWORD": PASSWORD,
+                "MCP_CAT_FACT_URL": f"{upstream}/fact",
+                "MCP_DOG_IMAGE_URL": f"{upstream}/api/breeds/image/random",
+                "MCP_ADVICE_URL": f"{upstream}/advice",
+            },
+        ),
+    ]
+
+    results: dict[str, Any] = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "options": {key: value for key, value in options.items() if not key.endswith("_python")},
+        },
+        "startup": {},
+        "scenarios": {},
+    }
+    try:
+        results["startup"]["custom_api_seconds"] = round(
+            await wait_until_healthy(f"http://127.0.0.1:{api_port}/health"), 3
+        )
+        # /health antwortet vor dem LLM-Warm-up; die Szenarien starten erst, wenn /ready meldet
+        results["startup"]["custom_api_ready_seconds"] = round(
+            results["startup"]["custom_api_seconds"] + await wait_until_healthy(f"http://127.0.0.1:{api_port}/ready"),
+            3,
+        )
+        results["startup"]["mcp_server_seconds"] = round(
+            await wait_until_healthy(f"http://127.0.0.1:{mcp_port}/health"), 3
+        )
+        limits: httpx.Limits = httpx.Limits(max_connections=options["concurrency"] * 2)
+        headers: dict[str, str] = {"Authorization": AUTH_HEADER}
+        timeout: httpx.Timeout = httpx.Timeout(120.0)
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{api_port}", headers=headers, limits=limits, timeout=timeout
+        ) as api, httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{mcp_port}", headers=headers, limits=limits, timeout=timeout
+        ) as mcp:
+            sessions: list[MCPSession] = []
+            scenarios: dict[str, Callable[[int], Awaitable[Sample]]] = {
+                "chat_stream": chat_stream_call(api),
+                "chat_json": chat_json_call(api),
+                "mcp_cat_fact": mcp_tool_call(mcp, "cat_fact", sessions),
+                "mcp_dog_image": mcp_tool_call(mcp, "dog_image", sessions),
+                "mcp_advice": mcp_tool_call(mcp, "advice", sessions),
+            }
+            for name in options["scenarios"] or scenarios:
+                click.echo(f"▶ {name}: {options['requests']} requests, concurrency {options['concurrency']}")
+                result: ScenarioResult = await run_scenario(
+                    name, options["requests"], options["concurrency"], scenarios[name]
+                )
+                results["scenarios"][name] = result.summary()
+            # Token-Summen der Custom API, um Prompt-Layouts und Completion-Grenzen zu vergleichen
+            results["llm"] = (await api.get("/stats/llm")).json()
+    finally:
+        for service in services:
+            service.terminate()
+        for service in services:
+            try:
+                service.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                service.kill()
+        for stub, _ in stubs:
+            stub.should_exit = True
+        await asyncio.gather(*(task for _, task in stubs))
+    return results
+
+
+@click.command()
+@click.option("--requests", default=100, show_default=True, help="Anfragen pro Szenario")
+@click.option("--concurrency", default=10, show_default=True, help="Parallele Clients pro Szenario")
+@click.option("--scenario", "scenarios", multiple=True, help="Nur diese Szenarien (mehrfach möglich)")
+@click.option("--llm-latency", default=0.5, show_default=True, help="Stub-LLM: Latenz bis zum ersten Token (s)")
+@click.option("--llm-jitter", default=0.1, show_default=True)
+@click.option("--llm-tokens-per-second", default=200.0, show_default=True)
+@click.option("--upstream-latency", default=0.3, show_default=True, help="Stub-Upstream-APIs: Latenz (s)")
+@click.option("--upstream-jitter", default=0.1, show_default=True)
+@click.option("--with-cache", is_flag=True, help="Rezept-Cache der Custom API aktiviert lassen")
+@click.option(
+    "--prompt-layout",
+    type=click.Choice(["prefix", "inline"]),
+    default="prefix",
+    show_default=True,
+    help="Prompt-Layout",
+)
+@click.option("--custom-api-python", default=sys.executable, show_default=True, help="Python mit custom_api")
+@click.option("--mcp-python", default=sys.executable, show_default=True, help="Python mit mcp_server")
+@click.option("--output", type=click.Path(dir_okay=False), default="bench_output.json", show_default=True)
+@click.option("--compare", "baseline", type=click.Path(exists=True, dir_okay=False), help="Vergleich mit früherem Lauf")
+@click.option("--max-regression", default=10.0, show_default=True, help="Erlaubte p95-Verschlechterung in %")
+def main(output: str, baseline: str | None, max_regression: float, **options: Any) -> None:
+    results: dict[str, Any] = asyncio.run(benchmark(options))
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=4, ensure_ascii=False)
+    click.echo(json.dumps(results["scenarios"], indent=2, ensure_ascii=False))
+    click.echo(f"📄 Ergebnisse geschrieben nach {output}")
+    if baseline:
+        with open(baseline, encoding="utf-8") as file:
+            if compare(results, json.load(file), max_regression):
+                raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Lokale Stand-ins für OpenAI und die externen APIs der MCP-Tools, damit Benchmarks offline laufen"""
+
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, AsyncIterator
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+SAMPLE_RECIPE: dict[str, Any] = {
+    "recipe_name": "Cremige Tomaten-Basilikum-Pasta",
+    "description": "Ein aromatisches italienisches Gericht mit frischen Tomaten und Kräutern. Perfekt für ein schnelles Abendessen.",
+    "cooking_time": "20 Minuten",
+    "difficulty": "Einfach",
+    "ingredients": [
+        "250g Pasta",
+        "400g gehackte Tomaten",
+        "150ml Sahne",
+        "2 Knoblauchzehen",
+        "frisches Basilikum",
+        "50g Parmesan",
+        "2 EL Olivenöl",
+        "Salz und Pfeffer",
+    ],
+    "instructions": [
+        "Pasta in reichlich Salzwasser al dente kochen",
+        "Knoblauch fein hacken und in Olivenöl glasig anbraten",
+        "Gehackte Tomaten hinzufügen und 10 Minuten köcheln lassen",
+        "Sahne einrühren und mit Salz und Pfeffer abschmecken",
+        "Pasta abgießen und unter die Sauce mischen",
+        "Mit Parmesan und Basilikum servieren",
+    ],
+    "tips": [
+        "Etwas Nudelwasser aufheben, um die Sauce zu binden",
+        "Basilikum erst am Ende hinzufügen",
+        "Für eine leichtere Variante Sahne durch Ricotta ersetzen",
+    ],
+    "nutritional_info": "Ca. 450 Kalorien pro Portion. Reich an Kohlenhydraten und Vitamin C.",
+}
+
+
+def _delay(latency: float, jitter: float) -> float:
+    return max(0.0, random.uniform(latency - jitter, latency + jitter))
+
+
+def _tokens(text: str, size: int = 4) -> list[str]:
+    return [text[index : index + size] for index in range(0, len(text), size)]
+
+
+def create_openai_stub(latency: float = 0.5, jitter: float = 0.1, tokens_per_second: float = 100.0) -> Starlette:
+    """OpenAI-kompatibler `/v1/chat/completions`-Endpunkt mit konfigurierbarer Latenz und Token-Rate"""
+
+    content: str = json.dumps(SAMPLE_RECIPE, ensure_ascii=False)
+    tokens: list[str] = _tokens(content)
+
+    async def chat_completions(request: Request) -> JSONResponse | StreamingResponse:
+        body: dict[str, Any] = await request.json()
+        completion_id: str = f"chatcmpl-{uuid.uuid4().hex}"
+        created: int = int(time.time())
+        model: str = body.get("model", "stub")
+        prompt_tokens: int = sum(len(str(message.get("content", ""))) for message in body.get("messages", [])) // 4
+        usage: dict[str, Any] = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+        await asyncio.sleep(_delay(latency, jitter))
+
+        if not body.get("stream"):
+            await asyncio.sleep(len(tokens) / tokens_per_second)
+            return JSONResponse(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content, "refusal": None},
+                            "finish_reason": "stop",
+                            "logprobs": None,
+                        }
+                    ],
+                    "usage": usage,
+                }
+            )
+
+        def chunk(delta: dict[str, Any], finish_reason: str | None = None) -> str:
+            payload: dict[str, Any] = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}],
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def stream() -> AsyncIterator[str]:
+            tick: float = 0.02
+            per_tick: int = max(1, round(tokens_per_second * tick))
+            yield chunk({"role": "assistant", "content": ""})
+            for index in range(0, len(tokens), per_tick):
+                yield chunk({"content": "".join(tokens[index : index + per_tick])})
+                await asyncio.sleep(tick)
+            yield chunk({}, finish_reason="stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                payload: dict[str, Any] = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": usage,
+                }
+                yield f"data: {json.dumps(payload)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return Starlette(routes=[Route("/v1/chat/completions", chat_completions, methods=["POST"])])
+
+
+def create_upstream_stub(latency: float = 0.3, jitter: float = 0.1) -> Starlette:
+    """Stand-in für catfact.ninja, dog.ceo und adviceslip.com"""
+
+    async def cat_fact(_: Request) -> JSONResponse:
+        await asyncio.sleep(_delay(latency, jitter))
+        fact: str = "Katzen verbringen etwa 70 Prozent ihres Lebens mit Schlafen."
+        return JSONResponse({"fact": fact, "length": len(fact)})
+
+    async def dog_image(_: Request) -> JSONResponse:
+        await asyncio.sleep(_delay(latency, jitter))
+        return JSONResponse(
+            {"message": f"https://images.dog.ceo/breeds/stub/{random.randint(1, 9999)}.jpg", "status": "success"}
+        )
+
+    async def advice(_: Request) -> JSONResponse:
+        await asyncio.sleep(_delay(latency, jitter))
+        return JSONResponse({"slip": {"id": random.randint(1, 224), "advice": "Trink genug Wasser."}})
+
+    return Starlette(
+        routes=[
+            Route("/fact", cat_fact),
+            Route("/api/breeds/image/random", dog_image),
+            Route("/advice", advice),
+        ]
+    )
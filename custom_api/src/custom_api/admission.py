@@ -0,0 +1,314 @@
+import asyncio
+import math
+import os
+import sqlite3
+import time
+from collections import deque
+from typing import Any, AsyncIterator
+
+from loguru import logger
+
+from custom_api.metrics import Gauge, process_alive
+from custom_api.server import worker_count, worker_share
+
+
+class AdmissionRejected(Exception):
+    """Die Warteschlange ist voll oder die Wartezeit ist abgelaufen"""
+
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after: int = retry_after
+
+
+class Ticket:
+    """Platz in der Admission-Warteschlange; wird per `wait()` eingelöst und per `release()` freigegeben"""
+
+    def __init__(self, controller: "AdmissionController", user: str) -> None:
+        self.controller: AdmissionController = controller
+        self.user: str = user
+        self.granted: bool = False
+        self.released: bool = False
+        self.enqueued_at: float = time.monotonic()
+        self.admitted_at: float | None = None
+        self._event: asyncio.Event = asyncio.Event()
+
+    @property
+    def position(self) -> int:
+        """1-basierte Position in der Warteschlange, 0 sobald zugelassen"""
+        if self.granted:
+            return 0
+        try:
+            return self.controller._queue.index(self) + 1
+        except ValueError:
+            return 0
+
+    def _grant(self) -> None:
+        self.granted = True
+        self.admitted_at = time.monotonic()
+        self._event.set()
+
+    def _notify(self) -> None:
+        self._event.set()
+
+    async def wait(self) -> AsyncIterator[int]:
+        """Wartet auf Zulassung und liefert bei jeder Änderung die aktuelle Warteschlangenposition"""
+        deadline: float = self.enqueued_at + self.controller.queue_timeout
+        last_position: int = 0
+        try:
+            while not self.granted:
+                position: int = self.position
+                if position != last_position:
+                    last_position = position
+                    yield position
+                remaining: float = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.controller.timed_out += 1
+                    raise AdmissionRejected("Zeitüberschreitung in der Warteschlange", self.controller.retry_after())
+                self._event.clear()
+                shared: bool = self.controller.user_slots is not None
+                try:
+                    await asyncio.wait_for(
+                        self._event.wait(), timeout=min(remaining, USER_SLOTS_POLL_INTERVAL) if shared else remaining
+                    )
+                except asyncio.TimeoutError:
+                    # Freigaben anderer Worker lösen hier kein `_dispatch` aus
+                    if shared:
+                        self.controller._dispatch()
+        except BaseException:
+            self.release()
+            raise
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+
+USER_SLOTS_POLL_INTERVAL: float = 0.1
+
+
+class SharedUserSlots:
+    """Zählt laufende Anfragen pro Benutzer über alle Worker-Prozesse in einer gemeinsamen SQLite-Datei.
+
+    Jeder Prozess verbindet sich beim ersten Zugriff selbst und führt seine Plätze unter seiner PID;
+    Einträge beendeter Prozesse werden beim nächsten Zugriff auf denselben Benutzer verworfen.
+    """
+
+    def __init__(self, path: str, max_per_user: int) -> None:
+        self.path: str = path
+        self.max_per_user: int = max_per_user
+        self._connection: sqlite3.Connection | None = None
+        self._pid: int | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection: sqlite3.Connection = sqlite3.connect(self.path, isolation_level=None, timeout=5.0)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=OFF")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS user_slots "
+            "(pid INTEGER NOT NULL, user TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (pid, user))"
+        )
+        # Eine wiederverwendete PID übernimmt keine Plätze eines früheren Prozesses
+        connection.execute("DELETE FROM user_slots WHERE pid = ?", (os.getpid(),))
+        self._connection, self._pid = connection, os.getpid()
+        return connection
+
+    def try_acquire(self, user: str) -> bool:
+        connection: sqlite3.Connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows: list[tuple[int, int]] = connection.execute(
+                "SELECT pid, count FROM user_slots WHERE user = ?", (user,)
+            ).fetchall()
+            dead: list[int] = [pid for pid, _ in rows if pid != self._pid and not process_alive(pid)]
+            connection.executemany("DELETE FROM user_slots WHERE pid = ?", [(pid,) for pid in dead])
+            acquired: bool = sum(count for pid, count in rows if pid not in dead) < self.max_per_user
+            if acquired:
+                connection.execute(
+                    "INSERT INTO user_slots (pid, user, count) VALUES (?, ?, 1) "
+                    "ON CONFLICT (pid, user) DO UPDATE SET count = count + 1",
+                    (self._pid, user),
+                )
+            connection.execute("COMMIT")
+            return acquired
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def release(self, user: str) -> None:
+        connection: sqlite3.Connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute("UPDATE user_slots SET count = count - 1 WHERE pid = ? AND user = ?", (self._pid, user))
+        connection.execute("DELETE FROM user_slots WHERE pid = ? AND count <= 0", (self._pid,))
+        connection.execute("COMMIT")
+
+
+class AdmissionController:
+    """Begrenzt parallele LLM-Aufrufe global und pro Benutzer mit einer begrenzten Warteschlange.
+
+    Ist die Warteschlange voll, wird sofort abgelehnt (429 mit `Retry-After`); wartende Anfragen
+    werden in FIFO-Reihenfolge zugelassen, sofern ihr Benutzer-Limit es erlaubt. Mit `user_slots`
+    gilt das Benutzer-Limit für alle Worker gemeinsam statt pro Prozess.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        max_per_user: int = 4,
+        max_queue: int = 64,
+        queue_timeout: float = 30.0,
+        user_slots: SharedUserSlots | None = None,
+    ) -> None:
+        self.max_concurrency: int = max_concurrency
+        self.max_per_user: int = max_per_user
+        self.max_queue: int = max_queue
+        self.queue_timeout: float = queue_timeout
+        self.user_slots: SharedUserSlots | None = user_slots
+        self._queue: deque[Ticket] = deque()
+        self._in_flight: int = 0
+        self._per_user: dict[str, int] = {}
+        self.admitted: int = 0
+        self.rejected: int = 0
+        self.timed_out: int = 0
+        self.wait_seconds_total: float = 0.0
+        self.wait_seconds_max: float = 0.0
+        self.service_seconds_total: float = 0.0
+        self.completed: int = 0
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """Die Limits gelten für den ganzen Dienst.
+
+        Globale Parallelität und Warteschlange werden auf die Worker-Prozesse aufgeteilt. Das Benutzer-Limit
+        zählen mehrere Worker gemeinsam in `CUSTOM_API_ADMISSION_PATH` (Standard: `admission.sqlite3` in
+        `CUSTOM_API_METRICS_DIR`); ohne gemeinsames Verzeichnis wird es abgerundet aufgeteilt und ist dann
+        nur näherungsweise einzuhalten.
+        """
+        max_per_user: int = int(os.getenv("CUSTOM_API_ADMISSION_MAX_PER_USER", "4"))
+        workers: int = worker_count("CUSTOM_API")
+        metrics_dir: str | None = os.getenv("CUSTOM_API_METRICS_DIR")
+        path: str | None = os.getenv("CUSTOM_API_ADMISSION_PATH") or (
+            os.path.join(metrics_dir, "admission.sqlite3") if metrics_dir else None
+        )
+        user_slots: SharedUserSlots | None = None
+        if workers > 1 and path:
+            user_slots = SharedUserSlots(path, max_per_user)
+        elif workers > 1:
+            if workers > max_per_user:
+                logger.warning(
+                    f"🚦 {workers} Worker ohne gemeinsames Verzeichnis: "
+                    f"bis zu {workers} statt {max_per_user} parallele Anfragen pro Benutzer möglich"
+                )
+            max_per_user = max(max_per_user // workers, 1)
+        return cls(
+            max_concurrency=worker_share(int(os.getenv("CUSTOM_API_ADMISSION_MAX_CONCURRENCY", "16")), "CUSTOM_API"),
+            max_per_user=max_per_user,
+            max_queue=worker_share(int(os.getenv("CUSTOM_API_ADMISSION_MAX_QUEUE", "64")), "CUSTOM_API"),
+            queue_timeout=float(os.getenv("CUSTOM_API_ADMISSION_QUEUE_TIMEOUT", "30")),
+            user_slots=user_slots,
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _can_run(self, user: str) -> bool:
+        return self._in_flight < self.max_concurrency and self._per_user.get(user, 0) < self.max_per_user
+
+    def _try_start(self, ticket: Ticket) -> bool:
+        if not self._can_run(ticket.user):
+            return False
+        if self.user_slots is not None and not self.user_slots.try_acquire(ticket.user):
+            return False
+        self._start(ticket)
+        return True
+
+    def _start(self, ticket: Ticket) -> None:
+        self._in_flight += 1
+        self._per_user[ticket.user] = self._per_user.get(ticket.user, 0) + 1
+        self.admitted += 1
+        waited: float = time.monotonic() - ticket.enqueued_at
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        ticket._grant()
+
+    def retry_after(self) -> int:
+        average_service: float = self.service_seconds_total / self.completed if self.completed else 5.0
+        return max(1, math.ceil(average_service * (self.queue_depth + 1) / max(self.max_concurrency, 1)))
+
+    def try_enter(self, user: str) -> Ticket | None:
+        """Reserviert einen Platz nur, wenn er sofort frei ist; stellt nie an"""
+        # Nach jedem `_dispatch` wartet nur, wer am eigenen Benutzer-Limit hängt; bei freier Kapazität darf
+        # eine neue Anfrage daher an ihnen vorbei, ohne die FIFO-Reihenfolge lauffähiger Anfragen zu verletzen.
+        # Wartende desselben Benutzers überholt sie nicht (Plätze anderer Worker werden ohne `_dispatch` frei)
+        if any(waiting.user == user for waiting in self._queue):
+            return None
+        ticket: Ticket = Ticket(self, user)
+        return ticket if self._try_start(ticket) else None
+
+    def enter(self, user: str) -> Ticket:
+        """Reserviert sofort einen Platz oder stellt die Anfrage an; lehnt ab, wenn die Warteschlange voll ist"""
+        if (admitted := self.try_enter(user)) is not None:
+            return admitted
+        ticket: Ticket = Ticket(self, user)
+        if len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            logger.warning(f"🚦 Admission rejected for {user}: queue full ({len(self._queue)})")
+            raise AdmissionRejected("Zu viele gleichzeitige Anfragen", self.retry_after())
+        self._queue.append(ticket)
+        return ticket
+
+    def _release(self, ticket: Ticket) -> None:
+        if ticket.granted:
+            self._in_flight -= 1
+            self._per_user[ticket.user] -= 1
+            if not self._per_user[ticket.user]:
+                del self._per_user[ticket.user]
+            if self.user_slots is not None:
+                self.user_slots.release(ticket.user)
+            if ticket.admitted_at is not None:
+                self.service_seconds_total += time.monotonic() - ticket.admitted_at
+                self.completed += 1
+        elif ticket in self._queue:
+            self._queue.remove(ticket)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        for waiting in list(self._queue):
+            if self._in_flight >= self.max_concurrency:
+                break
+            if self._try_start(waiting):
+                self._queue.remove(waiting)
+        for waiting in self._queue:
+            waiting._notify()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": len(self._queue),
+            "max_concurrency": self.max_concurrency,
+            "max_per_user": self.max_per_user,
+            "max_queue": self.max_queue,
+            "shared_per_user_limit": self.user_slots is not None,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_seconds_avg": self.wait_seconds_total / self.admitted if self.admitted else 0.0,
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+
+
+ADMISSION: AdmissionController = AdmissionController.from_env()
+ADMISSION_IN_FLIGHT: Gauge = Gauge(
+    "admission_in_flight", "Zugelassene, laufende LLM-Anfragen", function=lambda: ADMISSION.in_flight
+)
+ADMISSION_QUEUE_DEPTH: Gauge = Gauge(
+    "admission_queue_depth", "Wartende Anfragen in der Admission Control", function=lambda: ADMISSION.queue_depth
+)
@@ -1,13 +1,18 @@
 import logging
 import os
 import secrets
+import time
 
 import click
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from passlib.context import CryptContext
 
+from custom_api.credential_cache import CredentialCache, PasswordHash
+from custom_api.metrics import Histogram
+
 logging.getLogger("passlib").setLevel(logging.ERROR)
 
 load_dotenv()
@@ -29,7 +34,22 @@ def hash_password(password: str, show_hashed_password: bool = False) -> str:
 ### Basic Auth ###
 PWD_CONTEXT: CryptContext = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECURITY: HTTPBasic = HTTPBasic(description="Security scheme for basic authentication")
-HASHED_PASSWORD: str = hash_password(password=os.getenv("CUSTOM_API_PASSWORD", ""))
+CREDENTIAL_CACHE: CredentialCache = CredentialCache(
+    max_size=int(os.getenv("CUSTOM_API_AUTH_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("CUSTOM_API_AUTH_CACHE_TTL", "300")),
+)
+AUTH_VERIFICATION_SECONDS: Histogram = Histogram(
+    "auth_verification_seconds", "Dauer der Basic-Auth-Prüfung nach Ergebnis", ("result",)
+)
+
+
+# Wird im Warm-up berechnet und bei geändertem CUSTOM_API_PASSWORD neu erzeugt
+PASSWORD_HASH: PasswordHash = PasswordHash("CUSTOM_API_PASSWORD", hash_password)
+
+
+def credential_fingerprint(hashed_password: str) -> str:
+    """Fingerprint der gecachten Zugangsdaten: aktuell konfigurierter Benutzer und Passwort-Hash"""
+    return f"{os.getenv('CUSTOM_API_USER', '')}\x00{hashed_password}"
 
 
 def verify_user(username: str) -> bool:
@@ -38,18 +58,29 @@ def verify_user(username: str) -> bool:
 
 
 def verify_password(plain_password: str) -> bool:
-    if not HASHED_PASSWORD:
+    hashed_password: str = PASSWORD_HASH.get()
+    if not hashed_password:
         return True
-    return PWD_CONTEXT.verify(plain_password, HASHED_PASSWORD)
+    return PWD_CONTEXT.verify(plain_password, hashed_password)
+
 
+async def verify_basic_auth(credentials: HTTPBasicCredentials = Depends(SECURITY)) -> str:
+    started_at: float = time.perf_counter()
+    cache_key: str = f"{credentials.username}:{credentials.password}"
+    fingerprint: str = credential_fingerprint(await PASSWORD_HASH.aget())
+    if CREDENTIAL_CACHE.contains(cache_key, fingerprint):
+        AUTH_VERIFICATION_SECONDS.labels("cached").observe(time.perf_counter() - started_at)
+        return credentials.username
 
-def verify_basic_auth(credentials: HTTPBasicCredentials = Depends(SECURITY)) -> str:
     correct_username: bool = verify_user(credentials.username)
-    correct_password: bool = verify_password(credentials.password)
+    correct_password: bool = correct_username and await run_in_threadpool(verify_password, credentials.password)
     if not (correct_username and correct_password):
+        AUTH_VERIFICATION_SECONDS.labels("rejected").observe(time.perf_counter() - started_at)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Basic"},
         )
+    CREDENTIAL_CACHE.add(cache_key, fingerprint)
+    AUTH_VERIFICATION_SECONDS.labels("verified").observe(time.perf_counter() - started_at)
     return credentials.username
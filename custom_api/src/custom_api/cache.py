@@ -0,0 +1,224 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Generic, TypeVar
+
+from loguru import logger
+from pydantic import BaseModel
+
+from custom_api.server import worker_count
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+### Backends ###
+class CacheBackend(ABC):
+    """Key-Value-Speicher für serialisierte Ergebnisse mit Größen- und TTL-Begrenzung"""
+
+    blocking: bool = False
+
+    @abstractmethod
+    def get(self, key: str) -> str | None:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-Process LRU mit TTL"""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0) -> None:
+        self.max_size: int = max_size
+        self.ttl: float = ttl
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry: tuple[float, str] | None = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """On-Disk LRU mit TTL, geteilt zwischen allen Workern auf demselben Host (eine Verbindung je Prozess)"""
+
+    blocking: bool = True
+
+    def __init__(self, path: str, max_size: int = 10000, ttl: float = 86400.0, table: str = "cache") -> None:
+        self.path: str = path
+        self.max_size: int = max_size
+        self.ttl: float = ttl
+        self.table: str = table
+        self._lock: threading.Lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._pid: int | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Verbindung des aktuellen Prozesses; über `fork` geerbte SQLite-Verbindungen sind nicht nutzbar"""
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection: sqlite3.Connection = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed_at ON {self.table} (accessed_at)")
+        connection.commit()
+        self._connection, self._pid = connection, os.getpid()
+        return connection
+
+    def get(self, key: str) -> str | None:
+        now: float = time.time()
+        with self._lock:
+            connection: sqlite3.Connection = self._connect()
+            row: tuple[str, float] | None = connection.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                connection.commit()
+                return None
+            connection.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            connection.commit()
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now: float = time.time()
+        with self._lock:
+            connection: sqlite3.Connection = self._connect()
+            connection.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now),
+            )
+            connection.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+            connection.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_size,),
+            )
+            connection.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            connection: sqlite3.Connection = self._connect()
+            connection.execute(f"DELETE FROM {self.table}")
+            connection.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            connection: sqlite3.Connection = self._connect()
+            return connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+def create_cache_backend(prefix: str, default_size: int = 1024, default_ttl: float = 3600.0) -> CacheBackend | None:
+    """Erstellt ein Backend aus den Umgebungsvariablen `<PREFIX>_BACKEND`, `_SIZE`, `_TTL` und `_PATH`"""
+    # Mehrere Worker teilen sich standardmäßig den SQLite-Cache statt je eines eigenen im Speicher
+    default_backend: str = "sqlite" if worker_count("CUSTOM_API") > 1 else "memory"
+    backend: str = (os.getenv(f"{prefix}_BACKEND") or default_backend).lower()
+    max_size: int = int(os.getenv(f"{prefix}_SIZE", str(default_size)))
+    ttl: float = float(os.getenv(f"{prefix}_TTL", str(default_ttl)))
+    if backend == "sqlite":
+        path: str = os.getenv(f"{prefix}_PATH", f"/tmp/{prefix.lower()}.sqlite3")
+        return SQLiteCacheBackend(path=path, max_size=max_size, ttl=ttl)
+    if backend == "memory":
+        return MemoryCacheBackend(max_size=max_size, ttl=ttl)
+    return None
+
+
+### Result Cache ###
+class ResultCache(Generic[ModelT]):
+    """Cache für Pydantic-Ergebnisse vor teuren LLM-Aufrufen mit Hit-Ratio und eingesparter Latenz"""
+
+    def __init__(self, backend: CacheBackend | None, model: type[ModelT]) -> None:
+        self.backend: CacheBackend | None = backend
+        self.model: type[ModelT] = model
+        self.hits: int = 0
+        self.misses: int = 0
+        self.saved_seconds: float = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def _run(self, function: Any, *args: Any) -> Any:
+        if self.backend is not None and self.backend.blocking:
+            return await asyncio.to_thread(function, *args)
+        return function(*args)
+
+    async def get(self, key: str) -> ModelT | None:
+        if self.backend is None:
+            return None
+        try:
+            raw: str | None = await self._run(self.backend.get, key)
+        except Exception:
+            logger.exception("Cache lookup failed")
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        entry: dict[str, Any] = json.loads(raw)
+        self.hits += 1
+        self.saved_seconds += entry.get("latency", 0.0)
+        return self.model.model_validate(entry["result"])
+
+    async def set(self, key: str, result: ModelT, latency: float = 0.0) -> None:
+        if self.backend is None:
+            return
+        raw: str = json.dumps({"result": result.model_dump(mode="json"), "latency": latency}, ensure_ascii=False)
+        try:
+            await self._run(self.backend.set, key, raw)
+        except Exception:
+            logger.exception("Cache store failed")
+
+    async def stats(self) -> dict[str, Any]:
+        lookups: int = self.hits + self.misses
+        # `len()` zählt beim SQLite-Backend per Abfrage, daher wie get/set außerhalb des Event-Loops
+        size: int = await self._run(len, self.backend) if self.backend is not None else 0
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
@@ -0,0 +1,127 @@
+# Gemeinsames Modul beider Services: Änderungen auch im Schwesterpaket nachziehen (scripts/check_shared_modules.py)
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from starlette.concurrency import run_in_threadpool
+
+
+class CredentialCache:
+    """Bounded TTL cache of credentials that already passed bcrypt verification.
+
+    Entries are keyed by an HMAC of the credentials with a per-process random key, so
+    the plaintext is never stored. The fingerprint of the configured user and password
+    hash is part of the HMAC input and the cache is cleared as soon as it changes, so a
+    changed configuration takes effect on the next request. Otherwise verified credentials
+    are accepted without re-running bcrypt for at most `ttl` seconds.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0) -> None:
+        self.max_size: int = max_size
+        self.ttl: float = ttl
+        self._key: bytes = secrets.token_bytes(32)
+        self._entries: OrderedDict[bytes, float] = OrderedDict()
+        self._fingerprint: str | None = None
+        self._lock: threading.Lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def _digest(self, credentials: str, fingerprint: str) -> bytes:
+        message: bytes = f"{fingerprint}\x00{credentials}".encode("utf-8")
+        return hmac.new(self._key, message, hashlib.sha256).digest()
+
+    def _bind(self, fingerprint: str) -> None:
+        if fingerprint != self._fingerprint:
+            self._entries.clear()
+            self._fingerprint = fingerprint
+
+    def contains(self, credentials: str, fingerprint: str) -> bool:
+        if self.max_size <= 0 or self.ttl <= 0:
+            return False
+        digest: bytes = self._digest(credentials, fingerprint)
+        now: float = time.monotonic()
+        with self._lock:
+            self._bind(fingerprint)
+            expires_at: float | None = self._entries.get(digest)
+            if expires_at is not None and expires_at > now:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return True
+            if expires_at is not None:
+                del self._entries[digest]
+                self.evictions += 1
+            self.misses += 1
+            return False
+
+    def add(self, credentials: str, fingerprint: str) -> None:
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        digest: bytes = self._digest(credentials, fingerprint)
+        with self._lock:
+            self._bind(fingerprint)
+            self._entries[digest] = time.monotonic() + self.ttl
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            lookups: int = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class PasswordHash:
+    """bcrypt-Hash des konfigurierten Passworts, neu berechnet sobald sich die Umgebungsvariable ändert.
+
+    Der Hash dient zugleich als Fingerprint des `CredentialCache`: Ein neues Passwort ergibt einen
+    neuen Hash und verwirft damit alle zuvor bestätigten Zugangsdaten.
+    """
+
+    def __init__(self, env_var: str, hash_function: Callable[[str], str]) -> None:
+        self.env_var: str = env_var
+        self._hash_function: Callable[[str], str] = hash_function
+        # (SHA-256 des konfigurierten Passworts, bcrypt-Hash); der Klartext wird nicht vorgehalten
+        self._entry: tuple[bytes, str] | None = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def _configured(self) -> tuple[str, bytes]:
+        password: str = os.getenv(self.env_var, "")
+        return password, hashlib.sha256(password.encode("utf-8")).digest()
+
+    def _cached(self, source: bytes) -> str | None:
+        entry: tuple[bytes, str] | None = self._entry
+        return entry[1] if entry is not None and hmac.compare_digest(entry[0], source) else None
+
+    def get(self) -> str:
+        password, source = self._configured()
+        if (value := self._cached(source)) is not None:
+            return value
+        with self._lock:
+            if (value := self._cached(source)) is None:
+                value = self._hash_function(password)
+                self._entry = (source, value)
+        return value
+
+    async def aget(self) -> str:
+        """Wie `get`, berechnet einen fehlenden oder veralteten Hash aber im Threadpool"""
+        value: str | None = self._cached(self._configured()[1])
+        return value if value is not None else await run_in_threadpool(self.get)
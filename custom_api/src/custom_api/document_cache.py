@@ -0,0 +1,62 @@
+import gzip
+import hashlib
+from typing import Callable, Hashable
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+class CachedDocument:
+    """Vorserialisierte Antwort mit schwachem ETag und optional vorab komprimierter gzip-Variante"""
+
+    def __init__(self, body: bytes, media_type: str, compress: bool = True, min_size: int = 1024) -> None:
+        self.body: bytes = body
+        self.media_type: str = media_type
+        self.etag: str = f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.gzipped: bytes | None = (
+            gzip.compress(body, compresslevel=6) if compress and len(body) >= min_size else None
+        )
+
+    def _matches(self, if_none_match: str) -> bool:
+        candidates: list[str] = [tag.strip() for tag in if_none_match.split(",")]
+        opaque: str = self.etag.removeprefix("W/")
+        return "*" in candidates or any(tag.removeprefix("W/") == opaque for tag in candidates)
+
+    def respond(self, request: Request) -> Response:
+        headers: dict[str, str] = {"ETag": self.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if_none_match: str | None = request.headers.get("if-none-match")
+        if if_none_match and self._matches(if_none_match):
+            return Response(status_code=304, headers=headers)
+        if self.gzipped is not None and "gzip" in request.headers.get("accept-encoding", ""):
+            return Response(self.gzipped, media_type=self.media_type, headers={**headers, "Content-Encoding": "gzip"})
+        return Response(self.body, media_type=self.media_type, headers=headers)
+
+
+class DocumentCache:
+    """Baut ein Dokument beim ersten Abruf und erst wieder, wenn sich `version()` ändert (z.B. die Routen)"""
+
+    def __init__(
+        self,
+        build: Callable[[], bytes],
+        version: Callable[[], Hashable],
+        media_type: str,
+        compress: bool = True,
+    ) -> None:
+        self.build: Callable[[], bytes] = build
+        self.version: Callable[[], Hashable] = version
+        self.media_type: str = media_type
+        self.compress: bool = compress
+        self._document: CachedDocument | None = None
+        self._version: Hashable = None
+        self.builds: int = 0
+
+    def get(self) -> CachedDocument:
+        version: Hashable = self.version()
+        if self._document is None or version != self._version:
+            self._document = CachedDocument(self.build(), self.media_type, compress=self.compress)
+            self._version = version
+            self.builds += 1
+        return self._document
+
+    def respond(self, request: Request) -> Response:
+        return self.get().respond(request)
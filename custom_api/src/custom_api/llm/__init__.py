@@ -1,15 +1,53 @@
+import asyncio
 import os
+import time
 from abc import abstractmethod
-from typing import Self
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Self,
+    Sequence,
+)
 
+import httpx
 from dotenv import load_dotenv
-from langchain.prompts import PromptTemplate
-from langchain.utils import convert_to_secret_str
-from langchain_openai import AzureChatOpenAI, ChatOpenAI
+from loguru import logger
 from pydantic import BaseModel, SecretStr
 
+from custom_api.http_transport import CountingTransport
+from custom_api.llm.hedging import (
+    HedgeConfig,
+    HedgeStats,
+    LatencyTracker,
+    retriable_errors,
+)
+from custom_api.logs import SAMPLED_LOGGER
+from custom_api.metrics import LATENCY_BUCKETS, Counter, Gauge, Histogram
+
+# langchain und langchain_openai werden erst beim Bau der Clients (Warm-up oder erste Anfrage) importiert
+if TYPE_CHECKING:
+    from langchain_core.prompts import BasePromptTemplate
+    from langchain_core.runnables import Runnable
+    from langchain_openai import AzureChatOpenAI, ChatOpenAI
+
 load_dotenv()
 
+LLM_CALL_SECONDS: Histogram = Histogram(
+    "llm_call_duration_seconds",
+    "Dauer einzelner LLM-Versuche (bei Streams bis zum ersten Chunk) nach Ergebnis",
+    ("key", "outcome"),
+    buckets=LATENCY_BUCKETS,
+)
+LLM_CALLS_IN_PROGRESS: Gauge = Gauge("llm_calls_in_progress", "Laufende LLM-Versuche inkl. Hedges")
+LLM_TOKENS: Counter = Counter(
+    "llm_tokens_total",
+    "Token laut Antwort-Metadaten: prompt, davon cached (Prompt-Cache), completion",
+    ("model", "kind"),
+)
+
 
 class LLMConfig(BaseModel):
     name: str
@@ -20,9 +58,75 @@ class LLMConfig(BaseModel):
     temperature: float = 0.0
     timeout: int = 3000
 
+    def cache_key(self) -> tuple[Any, ...]:
+        """Schlüssel für Client-/Chain-Cache ohne Per-Call-Parameter wie die Temperatur"""
+        return tuple(self.model_dump(exclude={"temperature"}).values())
+
+
+class TokenUsageStats:
+    """Summen der Token-Zähler aller abgeschlossenen Modellantworten"""
+
+    def __init__(self) -> None:
+        self.calls: int = 0
+        self.prompt_tokens: int = 0
+        self.cached_tokens: int = 0
+        self.completion_tokens: int = 0
+
+    def record(self, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> None:
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += cached_tokens
+        self.completion_tokens += completion_tokens
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_ratio": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+            "mean_prompt_tokens": self.prompt_tokens / self.calls if self.calls else 0.0,
+            "mean_completion_tokens": self.completion_tokens / self.calls if self.calls else 0.0,
+        }
+
+
+def compact_json_schema(schema: type[BaseModel]) -> dict[str, Any]:
+    """JSON-Schema ohne Beschreibungen und Feldtitel; nur der Titel der Wurzel bleibt als Schemaname erhalten"""
+
+    def strip(node: Any) -> Any:
+        if isinstance(node, list):
+            return [strip(item) for item in node]
+        if not isinstance(node, dict):
+            return node
+        return {
+            key: {name: strip(child) for name, child in value.items()}
+            if key in ("properties", "$defs")
+            else strip(value)
+            for key, value in node.items()
+            if key not in ("title", "description")
+        }
+
+    full_schema: dict[str, Any] = schema.model_json_schema()
+    return {"title": full_schema["title"], **strip(full_schema)}
+
 
 class LLMBase:
     _instance: Self | None = None
+    _http_async_client: httpx.AsyncClient | None = None
+    _http_transport: CountingTransport | None = None
+
+    def __init__(self) -> None:
+        self._api_key: SecretStr = SecretStr(os.getenv("OPENAI_API_KEY", ""))
+        self._clients: dict[tuple[Any, ...], "AzureChatOpenAI | ChatOpenAI"] = {}
+        self._chains: dict[tuple[Any, ...], "Runnable"] = {}
+        self.hedge_config: HedgeConfig = HedgeConfig.from_env()
+        self.hedge_stats: HedgeStats = HedgeStats()
+        self._latencies: dict[str, LatencyTracker] = {}
+        self.token_usage: TokenUsageStats = TokenUsageStats()
+        # "prefix": statische Anweisungen als System-Nachricht vorn (Prompt-Caching), Eingabe zuletzt, kompaktes Schema
+        # "inline": bisheriges Template mit der Eingabe mitten im Text
+        self.prompt_layout: str = os.getenv("CUSTOM_API_LLM_PROMPT_LAYOUT", "prefix").lower()
+        self.warmed_up: bool = False
 
     @classmethod
     def get_instance(cls) -> Self:
@@ -30,37 +134,249 @@ class LLMBase:
             cls._instance = cls()
         return cls._instance
 
+    @classmethod
+    def get_http_async_client(cls) -> httpx.AsyncClient:
+        """Gemeinsamer, gepoolter HTTP-Transport für alle LLM-Clients"""
+        if LLMBase._http_async_client is None:
+            LLMBase._http_transport = CountingTransport.create(
+                httpx.Limits(
+                    max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100")),
+                    max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20")),
+                    keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60")),
+                )
+            )
+            LLMBase._http_async_client = httpx.AsyncClient(transport=LLMBase._http_transport)
+        return LLMBase._http_async_client
+
+    @classmethod
+    async def aclose(cls) -> None:
+        if LLMBase._http_async_client is not None:
+            await LLMBase._http_async_client.aclose()
+            LLMBase._http_async_client = None
+            LLMBase._http_transport = None
+
     def get_client(
         self,
         model_config: LLMConfig,
         seed: int | None = 1397,
-    ) -> AzureChatOpenAI | ChatOpenAI:
+    ) -> "AzureChatOpenAI | ChatOpenAI":
+        """Gibt einen gecachten Client zurück; die Temperatur wird erst beim Aufruf gebunden"""
+        key: tuple[Any, ...] = model_config.cache_key()
+        if key not in self._clients:
+            self._clients[key] = self._create_client(model_config)
+        return self._clients[key]
 
+    def _create_client(self, model_config: LLMConfig) -> "AzureChatOpenAI | ChatOpenAI":
+        # Retries, Backoff und Hedging regeln `_ainvoke_with_retry` und `_race`, nicht das SDK
+        from langchain_openai import AzureChatOpenAI, ChatOpenAI
+
+        from custom_api.llm.usage import TokenUsageCallback
+
+        callbacks: list[TokenUsageCallback] = [TokenUsageCallback(model_config.name, self.record_usage)]
         llm_api_base: str | None = model_config.model_provider
-        llm_api_key: SecretStr = convert_to_secret_str(os.getenv("OPENAI_API_KEY", ""))
         if llm_api_base and "openai.azure.com" in llm_api_base:
             return AzureChatOpenAI(
                 name=model_config.name,
                 model=model_config.model_id,
                 azure_endpoint=llm_api_base,
-                api_key=llm_api_key,
+                api_key=self._api_key,
                 api_version=model_config.api_version or "2024-02-15-preview",
                 max_tokens=model_config.max_completion_tokens,
-                temperature=model_config.temperature,
                 timeout=model_config.timeout,
+                max_retries=0,
+                stream_usage=True,
+                callbacks=callbacks,
+                http_async_client=self.get_http_async_client(),
             )
         else:
             return ChatOpenAI(
                 name=model_config.name,
                 model=model_config.model_id,
                 base_url=llm_api_base,
-                api_key=llm_api_key,
-                temperature=model_config.temperature,
+                api_key=self._api_key,
+                max_completion_tokens=model_config.max_completion_tokens,
                 timeout=model_config.timeout,
+                max_retries=0,
+                stream_usage=True,
+                callbacks=callbacks,
+                http_async_client=self.get_http_async_client(),
+            )
+
+    def record_usage(self, name: str, usage: dict[str, Any]) -> None:
+        """Verbucht die `usage_metadata` einer Modellantwort (Prompt-, gecachte und Completion-Token)"""
+        prompt_tokens: int = usage.get("input_tokens", 0)
+        cached_tokens: int = (usage.get("input_token_details") or {}).get("cache_read", 0)
+        completion_tokens: int = usage.get("output_tokens", 0)
+        self.token_usage.record(prompt_tokens, cached_tokens, completion_tokens)
+        LLM_TOKENS.labels(name, "prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(name, "cached").inc(cached_tokens)
+        LLM_TOKENS.labels(name, "completion").inc(completion_tokens)
+        SAMPLED_LOGGER.info(
+            "🤖 {}: {} prompt tokens ({} cached), {} completion tokens",
+            name,
+            prompt_tokens,
+            cached_tokens,
+            completion_tokens,
+        )
+
+    def get_chain(self, model_config: LLMConfig, schema: type[BaseModel], partial: bool = False) -> "Runnable":
+        """Gibt die gecachte Chain `prompt | client.with_structured_output(schema)` zurück.
+
+        Mit `partial=True` wird das JSON-Schema statt des Pydantic-Modells genutzt, sodass `astream`
+        schrittweise wachsende Dicts liefert statt erst am Ende ein validiertes Objekt. Im Layout
+        "prefix" wird ein kompaktes Schema ohne Feldbeschreibungen gesendet (die Felder erklärt der
+        statische Prompt) und das Ergebnis danach gegen `schema` validiert.
+        """
+        key: tuple[Any, ...] = (*model_config.cache_key(), schema, partial)
+        if key not in self._chains:
+            compact: bool = self.prompt_layout == "prefix"
+            output_schema: type[BaseModel] | dict[str, Any] = (
+                compact_json_schema(schema) if compact else schema.model_json_schema() if partial else schema
             )
+            chain: "Runnable" = self.get_prompt() | self.get_client(model_config).with_structured_output(output_schema)
+            self._chains[key] = (chain | schema.model_validate) if compact and not partial else chain
+        return self._chains[key]
+
+    @staticmethod
+    def bind_call_options(chain: "Runnable", **options: Any) -> "Runnable":
+        """Bindet Per-Call-Parameter (z.B. temperature) an das Chat-Modell einer gecachten Chain"""
+        from langchain_core.language_models import BaseChatModel
+        from langchain_core.runnables import RunnableBinding, RunnableSequence
+
+        if isinstance(chain, BaseChatModel):
+            return chain.bind(**options)
+        if isinstance(chain, RunnableSequence):
+            steps: list["Runnable"] = list(chain.steps)
+            for index, step in enumerate(steps):
+                if isinstance(step, BaseChatModel) or (
+                    isinstance(step, RunnableBinding) and isinstance(step.bound, BaseChatModel)
+                ):
+                    steps[index] = step.bind(**options)
+                    return RunnableSequence(*steps)
+        raise ValueError(f"Keine Chat-Modell-Stufe in {type(chain).__name__} gefunden")
+
+    def hedge_delay(self, key: str) -> float:
+        """Verzögerung bis zur Hedge-Anfrage: Perzentil der bisherigen Latenzen, begrenzt auf [min, max]"""
+        tracker: LatencyTracker | None = self._latencies.get(key)
+        if tracker is None or len(tracker) < self.hedge_config.min_samples:
+            return self.hedge_config.default_delay
+        delay: float = tracker.percentile(self.hedge_config.percentile) or self.hedge_config.default_delay
+        return min(self.hedge_config.max_delay, max(self.hedge_config.min_delay, delay))
+
+    async def _race(self, key: str, attempts: Sequence[Callable[[], Awaitable[Any]]]) -> tuple[int, Any]:
+        """Startet `attempts[0]` und nach der Hedge-Verzögerung (oder sofort bei Fehler) den nächsten Versuch.
+
+        Das erste gültige Ergebnis gewinnt, alle anderen laufenden Versuche werden abgebrochen.
+        """
+        tracker: LatencyTracker = self._latencies.setdefault(key, LatencyTracker())
+
+        async def timed(attempt: Callable[[], Awaitable[Any]]) -> Any:
+            started_at: float = time.perf_counter()
+            outcome: str = "error"
+            LLM_CALLS_IN_PROGRESS.inc()
+            try:
+                result: Any = await attempt()
+                outcome = "ok"
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise
+            finally:
+                LLM_CALLS_IN_PROGRESS.dec()
+                LLM_CALL_SECONDS.labels(key, outcome).observe(time.perf_counter() - started_at)
+            tracker.record(time.perf_counter() - started_at)
+            return result
+
+        self.hedge_stats.requests += 1
+        delay: float = self.hedge_delay(key)
+        pending: dict[asyncio.Future[Any], int] = {asyncio.ensure_future(timed(attempts[0])): 0}
+        started: int = 1
+        error: BaseException | None = None
+        try:
+            while True:
+                can_hedge: bool = self.hedge_config.enabled and started < len(attempts)
+                done, _ = await asyncio.wait(
+                    pending, timeout=delay if can_hedge else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    index: int = pending.pop(task)
+                    if task.exception() is None and task.result() is not None:
+                        if index == 0:
+                            self.hedge_stats.primary_wins += 1
+                        else:
+                            self.hedge_stats.hedge_wins += 1
+                        return index, task.result()
+                    error = task.exception() or ValueError("Leere Antwort vom Modell")
+                    logger.warning(f"🤖 LLM attempt {index} for {key} failed: {error!r}")
+                if can_hedge and (not done or not pending):
+                    if done:
+                        self.hedge_stats.fallbacks += 1
+                    else:
+                        self.hedge_stats.hedged += 1
+                    logger.info(f"🤖 Hedging {key} after {delay:.2f}s with attempt {started}")
+                    pending[asyncio.ensure_future(timed(attempts[started]))] = started
+                    started += 1
+                elif not pending:
+                    self.hedge_stats.failures += 1
+                    raise error or RuntimeError(f"Kein Ergebnis für {key}")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _ainvoke_with_retry(self, chain: "Runnable", inputs: dict[str, Any]) -> Any:
+        for attempt in range(self.hedge_config.retry_attempts + 1):
+            try:
+                return await chain.ainvoke(inputs)
+            except retriable_errors():
+                if attempt == self.hedge_config.retry_attempts:
+                    raise
+                self.hedge_stats.retries += 1
+                await asyncio.sleep(self.hedge_config.backoff(attempt))
+
+    async def ainvoke_hedged(self, chains: Sequence["Runnable"], inputs: dict[str, Any], key: str) -> Any:
+        """Ruft `chains[0]` auf und hedged bei Langsamkeit oder Fehlern auf `chains[-1]` (Fallback-Modell oder Duplikat)"""
+        attempts: list[Callable[[], Awaitable[Any]]] = [
+            lambda: self._ainvoke_with_retry(chains[0], inputs),
+            lambda: self._ainvoke_with_retry(chains[-1], inputs),
+        ]
+        _, result = await self._race(f"{key}:invoke", attempts)
+        return result
+
+    async def astream_hedged(
+        self, chains: Sequence["Runnable"], inputs: dict[str, Any], key: str
+    ) -> AsyncIterator[Any]:
+        """Wie `ainvoke_hedged`, aber das Rennen entscheidet der erste Chunk; danach streamt nur der Gewinner"""
+        streams: list[AsyncIterator[Any]] = []
+
+        async def first_chunk(chain: "Runnable") -> Any:
+            for attempt in range(self.hedge_config.retry_attempts + 1):
+                stream: AsyncIterator[Any] = chain.astream(inputs)
+                try:
+                    chunk: Any = await anext(stream)
+                except retriable_errors():
+                    if attempt == self.hedge_config.retry_attempts:
+                        raise
+                    self.hedge_stats.retries += 1
+                    await asyncio.sleep(self.hedge_config.backoff(attempt))
+                    continue
+                streams.append(stream)
+                return stream, chunk
+
+        _, (stream, chunk) = await self._race(
+            f"{key}:first-chunk", [lambda: first_chunk(chains[0]), lambda: first_chunk(chains[-1])]
+        )
+        for other in streams:
+            if other is not stream:
+                await other.aclose()
+        yield chunk
+        async for chunk in stream:
+            yield chunk
+
+    def warm_up(self) -> None:
+        """Baut Clients und Chains vorab, damit die erste Anfrage keine Konstruktionskosten trägt"""
+        self.get_http_async_client()
 
     @abstractmethod
-    def get_prompt(self) -> PromptTemplate:
+    def get_prompt(self) -> "BasePromptTemplate":
         pass
 
     @abstractmethod
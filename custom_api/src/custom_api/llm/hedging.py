@@ -0,0 +1,96 @@
+import asyncio
+import math
+import os
+import random
+from collections import deque
+from functools import cache
+from typing import Any
+
+import httpx
+from pydantic import BaseModel
+
+
+@cache
+def retriable_errors() -> tuple[type[BaseException], ...]:
+    """Fehler, bei denen ein erneuter Versuch sinnvoll ist; `openai` wird erst beim ersten LLM-Aufruf importiert"""
+    import openai
+
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+        httpx.TransportError,
+        asyncio.TimeoutError,
+    )
+
+
+class HedgeConfig(BaseModel):
+    enabled: bool = True
+    percentile: float = 0.95
+    min_samples: int = 20
+    default_delay: float = 4.0
+    min_delay: float = 0.5
+    max_delay: float = 15.0
+    retry_attempts: int = 2
+    retry_base_delay: float = 0.5
+    retry_max_delay: float = 8.0
+
+    @classmethod
+    def from_env(cls) -> "HedgeConfig":
+        return cls(
+            enabled=os.getenv("CUSTOM_API_LLM_HEDGE_ENABLED", "true").lower() == "true",
+            percentile=float(os.getenv("CUSTOM_API_LLM_HEDGE_PERCENTILE", "0.95")),
+            default_delay=float(os.getenv("CUSTOM_API_LLM_HEDGE_DEFAULT_DELAY", "4")),
+            min_delay=float(os.getenv("CUSTOM_API_LLM_HEDGE_MIN_DELAY", "0.5")),
+            max_delay=float(os.getenv("CUSTOM_API_LLM_HEDGE_MAX_DELAY", "15")),
+            retry_attempts=int(os.getenv("CUSTOM_API_LLM_RETRY_ATTEMPTS", "2")),
+            retry_base_delay=float(os.getenv("CUSTOM_API_LLM_RETRY_BASE_DELAY", "0.5")),
+            retry_max_delay=float(os.getenv("CUSTOM_API_LLM_RETRY_MAX_DELAY", "8")),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Full-Jitter-Backoff: zufällig zwischen 0 und base * 2^attempt (gedeckelt)"""
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2**attempt))
+
+
+class LatencyTracker:
+    """Gleitendes Fenster der letzten erfolgreichen Latenzen für die Hedge-Verzögerung"""
+
+    def __init__(self, window: int = 200) -> None:
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered: list[float] = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+class HedgeStats:
+    def __init__(self) -> None:
+        self.requests: int = 0
+        self.hedged: int = 0
+        self.fallbacks: int = 0
+        self.primary_wins: int = 0
+        self.hedge_wins: int = 0
+        self.retries: int = 0
+        self.failures: int = 0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+            "fallbacks": self.fallbacks,
+            "primary_wins": self.primary_wins,
+            "hedge_wins": self.hedge_wins,
+            "retries": self.retries,
+            "failures": self.failures,
+        }
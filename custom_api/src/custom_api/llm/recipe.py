@@ -1,37 +1,44 @@
-from langchain.prompts import PromptTemplate
-from langchain_core.runnables import Runnable
+import hashlib
+import importlib.util
+import os
+import re
+import time
+import unicodedata
+from typing import TYPE_CHECKING, Any, AsyncIterator
+
+from loguru import logger
 from pydantic import BaseModel, Field
 
+from custom_api.cache import ResultCache, create_cache_backend
 from custom_api.llm import LLMBase, LLMConfig
-
-
-class RecipeResult(BaseModel):
-    """Strukturiertes Rezept basierend auf verfügbaren Zutaten"""
-
-    recipe_name: str = Field(description="Name des vorgeschlagenen Gerichts")
-    description: str = Field(description="Kurze Beschreibung des Gerichts (1-2 Sätze)")
-    cooking_time: str = Field(description="Zubereitungszeit (z.B. '30 Minuten')")
-    difficulty: str = Field(description="Schwierigkeitsgrad: Einfach, Mittel oder Schwer")
-
-    ingredients: list[str] = Field(description="Vollständige Zutatenliste mit Mengenangaben")
-    instructions: list[str] = Field(description="Schritt-für-Schritt Kochanleitung")
-    tips: list[str] = Field(description="Hilfreiche Kochtipps und Variationen")
-
-    nutritional_info: str = Field(description="Kurze Nährwertangaben (Kalorien, besondere Eigenschaften)")
-
-
-class RecipeAssistant(LLMBase):
-    """KI-Kochassistent der aus verfügbaren Zutaten leckere Rezepte erstellt"""
-
-    def get_prompt(self) -> PromptTemplate:
-        return PromptTemplate(
-            input_variables=["ingredients"],
-            template="""Du bist ein erfahrener Koch und Rezeptentwickler. Du musst ALLE Felder der Antwort ausfüllen!
-
-VERFÜGBARE ZUTATEN:
-{ingredients}
-
-Erstelle ein vollständiges Rezept mit ALLEN folgenden Feldern:
+from custom_api.singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from langchain_core.prompts import BasePromptTemplate
+    from langchain_core.runnables import Runnable
+
+    from custom_api.similarity import SimilarityIndex
+
+# Timeout der Rezept-Aufrufe; Teil des Client-/Chain-Schlüssels, daher nutzen Warm-up und Router denselben Wert
+RECIPE_TIMEOUT: int = 5000
+INGREDIENT_STOPWORDS: frozenset[str] = frozenset({"und", "oder", "mit", "and", "or", "with"})
+# Gleichwertige Zutaten für den Ähnlichkeitsindex auf einen gemeinsamen Begriff abbilden
+INGREDIENT_SYNONYMS: dict[str, str] = {
+    **dict.fromkeys(("nudeln", "spaghetti", "penne", "fusilli", "tagliatelle", "makkaroni", "noodles"), "pasta"),
+    **dict.fromkeys(("parmesan", "mozzarella", "gouda", "emmentaler", "pecorino", "cheese"), "käse"),
+    **dict.fromkeys(("tomate", "tomatoes", "tomato", "cherrytomaten"), "tomaten"),
+    **dict.fromkeys(("kartoffel", "potatoes", "potato"), "kartoffeln"),
+    **dict.fromkeys(("zwiebel", "onion", "onions"), "zwiebeln"),
+    **dict.fromkeys(("hähnchen", "huhn", "hühnchen", "chicken"), "hähnchen"),
+    **dict.fromkeys(("hackfleisch", "hack", "gehacktes"), "hackfleisch"),
+    "rice": "reis",
+    "eggs": "eier",
+    "ei": "eier",
+}
+
+
+RECIPE_ROLE: str = "Du bist ein erfahrener Koch und Rezeptentwickler. Du musst ALLE Felder der Antwort ausfüllen!"
+RECIPE_INSTRUCTIONS: str = """Erstelle ein vollständiges Rezept mit ALLEN folgenden Feldern:
 
 1. RECIPE_NAME: Ein kreativer, appetitlicher Name für das Gericht
 2. DESCRIPTION: 1-2 Sätze die das Gericht beschreiben und appetitlich machen
@@ -58,20 +65,181 @@ WICHTIGE REGELN:
 - Alle Mengenangaben müssen realistisch sein
 - Jeder Schritt muss klar und verständlich sein
 - Antworte komplett auf Deutsch
-- FÜLLE ALLE FELDER AUS - keines darf leer bleiben!
+- FÜLLE ALLE FELDER AUS - keines darf leer bleiben!"""
+RECIPE_INPUT: str = "VERFÜGBARE ZUTATEN:\n{ingredients}"
+RECIPE_CLOSING: str = "Erstelle jetzt das vollständige Rezept:"
+# Geänderte Prompt-Texte ergeben neue Cache-Schlüssel, alte Einträge verfallen über die TTL
+RECIPE_PROMPT_DIGEST: str = hashlib.sha256(
+    "\0".join((RECIPE_ROLE, RECIPE_INSTRUCTIONS, RECIPE_INPUT, RECIPE_CLOSING)).encode("utf-8")
+).hexdigest()[:16]
+
+
+class RecipeResult(BaseModel):
+    """Strukturiertes Rezept basierend auf verfügbaren Zutaten"""
 
-Erstelle jetzt das vollständige Rezept:""",
+    recipe_name: str = Field(description="Name des vorgeschlagenen Gerichts")
+    description: str = Field(description="Kurze Beschreibung des Gerichts (1-2 Sätze)")
+    cooking_time: str = Field(description="Zubereitungszeit (z.B. '30 Minuten')")
+    difficulty: str = Field(description="Schwierigkeitsgrad: Einfach, Mittel oder Schwer")
+
+    ingredients: list[str] = Field(description="Vollständige Zutatenliste mit Mengenangaben")
+    instructions: list[str] = Field(description="Schritt-für-Schritt Kochanleitung")
+    tips: list[str] = Field(description="Hilfreiche Kochtipps und Variationen")
+
+    nutritional_info: str = Field(description="Kurze Nährwertangaben (Kalorien, besondere Eigenschaften)")
+
+
+def canonicalize_ingredients(ingredients: str) -> str:
+    """Normalisiert eine Zutatenliste: Tokenisieren, Kleinschreibung, Duplikate entfernen, Sortieren"""
+    text: str = unicodedata.normalize("NFKC", ingredients).casefold()
+    tokens: set[str] = {token for token in re.findall(r"\w+", text) if token not in INGREDIENT_STOPWORDS}
+    return ",".join(sorted(tokens))
+
+
+def ingredient_tokens(ingredients: str) -> list[str]:
+    """Zutaten-Tokens für den Ähnlichkeitsindex: normalisiert, ohne Füllwörter, Synonyme zusammengeführt"""
+    text: str = unicodedata.normalize("NFKC", ingredients).casefold()
+    return [
+        INGREDIENT_SYNONYMS.get(token, token) for token in re.findall(r"\w+", text) if token not in INGREDIENT_STOPWORDS
+    ]
+
+
+def recipe_generation_fingerprint() -> str:
+    """Alles außer der Eingabe, was das erzeugte Rezept bestimmt: Modelle, Token-Limit, Prompt-Layout und -Text"""
+    configs: list[LLMConfig | None] = [RecipeAssistant.get_model_config(), RecipeAssistant.get_fallback_config()]
+    models: str = ",".join(f"{config.model_id}:{config.max_completion_tokens}" for config in configs if config)
+    layout: str = os.getenv("CUSTOM_API_LLM_PROMPT_LAYOUT", "prefix").lower()
+    return f"{models}|{layout}|{RECIPE_PROMPT_DIGEST}"
+
+
+def recipe_cache_key(ingredients: str, temperature: float) -> str:
+    canonical: str = canonicalize_ingredients(ingredients)
+    fingerprint: str = recipe_generation_fingerprint()
+    return hashlib.sha256(f"recipe:v2|{fingerprint}|{round(temperature, 1)}|{canonical}".encode("utf-8")).hexdigest()
+
+
+RECIPE_CACHE: ResultCache[RecipeResult] = ResultCache(
+    backend=create_cache_backend("CUSTOM_API_RECIPE_CACHE"), model=RecipeResult
+)
+RECIPE_SINGLE_FLIGHT: SingleFlight[RecipeResult] = SingleFlight()
+
+
+def create_recipe_similarity_index() -> "SimilarityIndex[RecipeResult] | None":
+    """Optionaler Ähnlichkeitsindex (`CUSTOM_API_RECIPE_SIMILARITY_*`); benötigt NumPy"""
+    if os.getenv("CUSTOM_API_RECIPE_SIMILARITY_ENABLED", "false").lower() != "true":
+        return None
+    if importlib.util.find_spec("numpy") is None:
+        logger.warning("🔎 Ähnlichkeitsindex angefordert, aber 'numpy' ist nicht installiert - deaktiviert")
+        return None
+    from custom_api.similarity import HashingVectorizer, SimilarityIndex
+
+    return SimilarityIndex(
+        path=os.getenv("CUSTOM_API_RECIPE_SIMILARITY_PATH", "/tmp/custom_api_recipe_similarity.idx"),
+        model=RecipeResult,
+        vectorizer=HashingVectorizer(int(os.getenv("CUSTOM_API_RECIPE_SIMILARITY_DIM", "1024")), ingredient_tokens),
+        capacity=int(os.getenv("CUSTOM_API_RECIPE_SIMILARITY_SIZE", "2048")),
+        threshold=float(os.getenv("CUSTOM_API_RECIPE_SIMILARITY_THRESHOLD", "0.8")),
+        top_k=int(os.getenv("CUSTOM_API_RECIPE_SIMILARITY_TOP_K", "3")),
+    )
+
+
+RECIPE_SIMILARITY: "SimilarityIndex[RecipeResult] | None" = create_recipe_similarity_index()
+
+
+class RecipeAssistant(LLMBase):
+    """KI-Kochassistent der aus verfügbaren Zutaten leckere Rezepte erstellt"""
+
+    def get_prompt(self) -> "BasePromptTemplate":
+        if self.prompt_layout == "inline":
+            from langchain_core.prompts import PromptTemplate
+
+            return PromptTemplate(
+                input_variables=["ingredients"],
+                template=f"{RECIPE_ROLE}\n\n{RECIPE_INPUT}\n\n{RECIPE_INSTRUCTIONS}\n\n{RECIPE_CLOSING}",
+            )
+        from langchain_core.prompts import ChatPromptTemplate
+
+        # Identischer System-Präfix für alle Anfragen (Prompt-Caching beim Provider), Zutaten ganz am Ende
+        return ChatPromptTemplate.from_messages(
+            [("system", f"{RECIPE_ROLE}\n\n{RECIPE_INSTRUCTIONS}"), ("human", f"{RECIPE_INPUT}\n\n{RECIPE_CLOSING}")]
         )
 
-    async def predict(self, ingredients: str, temperature: float = 0.1, timeout: int = 8000) -> RecipeResult:
+    @staticmethod
+    def get_model_config(timeout: int = RECIPE_TIMEOUT) -> LLMConfig:
+        return LLMConfig(
+            name="recipe-assistant",
+            model_id=os.getenv("CUSTOM_API_LLM_MODEL", "gpt-4.1"),
+            model_provider=os.getenv("CUSTOM_API_LLM_PROVIDER") or None,
+            max_completion_tokens=int(os.getenv("CUSTOM_API_LLM_MAX_COMPLETION_TOKENS", "1500")) or None,
+            timeout=timeout,
+        )
+
+    @staticmethod
+    def get_fallback_config(timeout: int = RECIPE_TIMEOUT) -> LLMConfig | None:
+        """Optionales zweites Modell für Hedge- und Fallback-Anfragen"""
+        model_id: str = os.getenv("CUSTOM_API_LLM_FALLBACK_MODEL", "")
+        if not model_id:
+            return None
+        return LLMConfig(
+            name="recipe-assistant-fallback",
+            model_id=model_id,
+            model_provider=os.getenv("CUSTOM_API_LLM_FALLBACK_PROVIDER") or None,
+            max_completion_tokens=int(os.getenv("CUSTOM_API_LLM_MAX_COMPLETION_TOKENS", "1500")) or None,
+            timeout=timeout,
+        )
+
+    def _get_chains(self, temperature: float, timeout: int, partial: bool = False) -> list["Runnable"]:
+        configs: list[LLMConfig | None] = [self.get_model_config(timeout), self.get_fallback_config(timeout)]
+        return [
+            self.bind_call_options(self.get_chain(config, RecipeResult, partial=partial), temperature=temperature)
+            for config in configs
+            if config is not None
+        ]
+
+    def warm_up(self) -> None:
+        super().warm_up()
+        self._get_chains(temperature=0.0, timeout=RECIPE_TIMEOUT)
+        self._get_chains(temperature=0.0, timeout=RECIPE_TIMEOUT, partial=True)
+        self.warmed_up = True
+
+    async def predict(self, ingredients: str, temperature: float = 0.1, timeout: int = RECIPE_TIMEOUT) -> RecipeResult:
         """Erstellt ein Rezept basierend auf verfügbaren Zutaten"""
-        model: Runnable = self.get_prompt() | self.get_client(
-            model_config=LLMConfig(
-                name="recipe-assistant",
-                model_id="gpt-4.1",
-                temperature=temperature,
-                timeout=timeout,
-            )
-        ).with_structured_output(RecipeResult)
+        return await self.ainvoke_hedged(
+            self._get_chains(temperature, timeout), {"ingredients": ingredients}, key="recipe"
+        )
+
+    async def astream_predict(
+        self, ingredients: str, temperature: float = 0.1, timeout: int = RECIPE_TIMEOUT
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Streamt das Rezept als schrittweise wachsendes Dict, während es generiert wird"""
+        async for partial_recipe in self.astream_hedged(
+            self._get_chains(temperature, timeout, partial=True), {"ingredients": ingredients}, key="recipe"
+        ):
+            yield partial_recipe
+
+    async def predict_batch(
+        self, ingredients: list[str], temperature: float = 0.1, timeout: int = RECIPE_TIMEOUT, max_concurrency: int = 8
+    ) -> AsyncIterator[tuple[int, RecipeResult | Exception, float]]:
+        """Erstellt Rezepte für viele Zutatenlisten über `abatch_as_completed` mit begrenzter Parallelität.
+
+        Liefert je Eintrag Index, Ergebnis (oder Fehler) und die Dauer ab dessen eigenem Start; Einträge hinter
+        dem Parallelitätslimit warten sonst ihre Wartezeit in die Latenz ein.
+        """
+        from langchain_core.runnables import RunnableConfig, RunnableLambda
+
+        model: "Runnable" = self.bind_call_options(
+            self.get_chain(self.get_model_config(timeout=timeout), RecipeResult), temperature=temperature
+        )
 
-        return await model.ainvoke({"ingredients": ingredients})
+        async def timed(inputs: dict[str, str], config: RunnableConfig) -> tuple[RecipeResult | Exception, float]:
+            started_at: float = time.perf_counter()
+            try:
+                result: RecipeResult | Exception = await model.ainvoke(inputs, config)
+            except Exception as error:
+                result = error
+            return result, time.perf_counter() - started_at
+
+        async for index, (result, seconds) in RunnableLambda(timed).abatch_as_completed(
+            [{"ingredients": item} for item in ingredients], config={"max_concurrency": max_concurrency}
+        ):
+            yield index, result, seconds
@@ -0,0 +1,24 @@
+from typing import Any, Callable
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """Meldet die `usage_metadata` jeder abgeschlossenen Modellantwort (auch gestreamter) an `record`.
+
+    Wird erst beim Bau der Clients importiert, damit `langchain_core` nicht beim Start geladen wird.
+    """
+
+    run_inline: bool = True
+
+    def __init__(self, name: str, record: Callable[[str, dict[str, Any]], None]) -> None:
+        self.name: str = name
+        self.record: Callable[[str, dict[str, Any]], None] = record
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                usage: dict[str, Any] | None = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    self.record(self.name, dict(usage))
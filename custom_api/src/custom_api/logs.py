@@ -0,0 +1,242 @@
+# Gemeinsames Modul beider Services: Änderungen auch im Schwesterpaket nachziehen (scripts/check_shared_modules.py)
+import atexit
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import traceback
+from typing import TYPE_CHECKING, Any, Callable, TextIO
+
+from loguru import logger
+
+from custom_api.metrics import Counter, Gauge
+
+if TYPE_CHECKING:
+    from loguru import Logger
+
+LOG_RECORDS_DROPPED: Counter = Counter(
+    "log_records_dropped_total", "Log-Einträge, die wegen voller Warteschlange verworfen wurden"
+)
+LOG_RECORDS_SAMPLED_OUT: Counter = Counter(
+    "log_records_sampled_out_total", "Als `sampled` markierte Log-Einträge, die durch Sampling entfallen sind"
+)
+LOG_QUEUE_DEPTH: Gauge = Gauge(
+    "log_queue_depth", "Wartende Log-Einträge in der Warteschlange", function=lambda: sum(sink.queued for sink in SINKS)
+)
+
+# Für häufige Meldungen (pro Anfrage/Tool-Aufruf); sie werden mit `<PREFIX>_LOG_SAMPLE_RATE` ausgedünnt
+SAMPLED_LOGGER: "Logger" = logger.bind(sampled=True)
+STDLIB_LOGGERS: tuple[str, ...] = ("uvicorn", "uvicorn.error", "uvicorn.access")
+SAMPLED_STDLIB_LOGGERS: frozenset[str] = frozenset({"uvicorn.access"})
+
+
+class QueueLogSink:
+    """Loguru-Sink, der Records nur in eine begrenzte Warteschlange legt und nie blockiert.
+
+    Ein Writer-Thread formatiert die Records (Text oder JSON, inkl. Tracebacks) und schreibt sie
+    gebündelt mit einem `write` pro Batch. Ist die Warteschlange voll, wird der Record verworfen
+    und gezählt, statt den Aufrufer warten zu lassen. Nach einem `fork` (z.B. gunicorn mit
+    `preload_app`) bekommt das Kind eine eigene Warteschlange und einen eigenen Writer-Thread.
+    """
+
+    _STOP: object = object()
+
+    def __init__(
+        self,
+        stream: TextIO,
+        json_format: bool = False,
+        max_queue: int = 10000,
+        batch_size: int = 256,
+        flush_interval: float = 0.2,
+    ) -> None:
+        self.stream: TextIO = stream
+        self.json_format: bool = json_format
+        self.batch_size: int = max(batch_size, 1)
+        self.flush_interval: float = flush_interval
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=max(max_queue, 1))
+        self.written: int = 0
+        self.dropped: int = 0
+        self.batches: int = 0
+        self._stopped: bool = False
+        self._thread: threading.Thread = self._start()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _start(self) -> threading.Thread:
+        thread: threading.Thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        thread.start()
+        return thread
+
+    def _after_fork(self) -> None:
+        """Threads überleben keinen `fork`; die Warteschlange des Elternprozesses schreibt dieser selbst"""
+        if self._stopped:
+            return
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self.written = self.dropped = self.batches = 0
+        self._thread = self._start()
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def __call__(self, message: Any) -> None:
+        try:
+            self._queue.put_nowait(message.record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+
+    @staticmethod
+    def _exception_text(record: dict[str, Any]) -> str:
+        exception: Any = record["exception"]
+        if exception is None:
+            return ""
+        return "".join(traceback.format_exception(exception.type, exception.value, exception.traceback))
+
+    def format_record(self, record: dict[str, Any]) -> str:
+        if self.json_format:
+            entry: dict[str, Any] = {
+                "time": record["time"].isoformat(),
+                "level": record["level"].name,
+                "logger": record["name"],
+                "function": record["function"],
+                "line": record["line"],
+                "message": record["message"],
+                "process": record["process"].id,
+                **{key: value for key, value in record["extra"].items() if key != "sampled"},
+            }
+            if record["exception"] is not None:
+                entry["exception"] = self._exception_text(record)
+            return json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        line: str = (
+            f"{record['time']:%Y-%m-%d %H:%M:%S} | {record['level'].name: <8} | "
+            f"{record['name']}:{record['function']}:{record['line']} - {record['message']}\n"
+        )
+        return line + self._exception_text(record)
+
+    def _write(self, records: list[dict[str, Any]]) -> None:
+        lines: list[str] = []
+        for record in records:
+            try:
+                lines.append(self.format_record(record))
+            except Exception as error:
+                lines.append(f"Log-Eintrag konnte nicht formatiert werden: {error!r}\n")
+        try:
+            self.stream.write("".join(lines))
+            self.stream.flush()
+        except (OSError, ValueError):
+            return
+        self.written += len(records)
+        self.batches += 1
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first: Any = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch: list[Any] = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop: bool = any(record is self._STOP for record in batch)
+            self._write([record for record in batch if record is not self._STOP])
+            if stop:
+                return
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Schreibt alle wartenden Records und beendet den Writer-Thread"""
+        self._stopped = True
+        if self._thread.is_alive():
+            try:
+                self._queue.put(self._STOP, timeout=timeout)
+            except queue.Full:
+                return
+            self._thread.join(timeout)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "queued": self.queued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "format": "json" if self.json_format else "text",
+        }
+
+
+class InterceptHandler(logging.Handler):
+    """Leitet Meldungen der Standardbibliothek (z.B. uvicorn) an loguru und damit an die Warteschlange weiter"""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            level: str | int = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+        frame: Any = inspect.currentframe()
+        depth: int = 0
+        while frame is not None and (depth == 0 or frame.f_code.co_filename == logging.__file__):
+            frame = frame.f_back
+            depth += 1
+        target: "Logger" = SAMPLED_LOGGER if record.name in SAMPLED_STDLIB_LOGGERS else logger
+        target.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
+
+
+def sample_filter(rate: float) -> Callable[[dict[str, Any]], bool]:
+    """Lässt `sampled` markierte Records nur mit Wahrscheinlichkeit `rate` durch, alle anderen immer"""
+
+    def accept(record: dict[str, Any]) -> bool:
+        if rate >= 1.0 or not record["extra"].get("sampled"):
+            return True
+        if random.random() < rate:
+            return True
+        LOG_RECORDS_SAMPLED_OUT.inc()
+        return False
+
+    return accept
+
+
+SINKS: list[QueueLogSink] = []
+
+
+def configure_logging(prefix: str) -> QueueLogSink:
+    """Ersetzt die Loguru-Handler durch einen nicht blockierenden Queue-Sink.
+
+    Liest `<PREFIX>_LOG_LEVEL`, `_LOG_FORMAT` (text|json), `_LOG_QUEUE_SIZE`, `_LOG_BATCH_SIZE`,
+    `_LOG_FLUSH_INTERVAL` und `_LOG_SAMPLE_RATE`. uvicorn-Logger werden ebenfalls umgeleitet.
+    """
+    level: str = os.getenv(f"{prefix}_LOG_LEVEL", "INFO").upper()
+    sink: QueueLogSink = QueueLogSink(
+        sys.stderr,
+        json_format=os.getenv(f"{prefix}_LOG_FORMAT", "text").lower() == "json",
+        max_queue=int(os.getenv(f"{prefix}_LOG_QUEUE_SIZE", "10000")),
+        batch_size=int(os.getenv(f"{prefix}_LOG_BATCH_SIZE", "256")),
+        flush_interval=float(os.getenv(f"{prefix}_LOG_FLUSH_INTERVAL", "0.2")),
+    )
+    logger.remove()
+    # Nur die Nachricht selbst wird im Aufrufer erzeugt, Zeilenformat und Tracebacks im Writer-Thread
+    logger.add(
+        sink,
+        level=level,
+        format=lambda _: "{message}",
+        filter=sample_filter(float(os.getenv(f"{prefix}_LOG_SAMPLE_RATE", "1.0"))),
+        colorize=False,
+        backtrace=False,
+        diagnose=False,
+    )
+    # Andere Bibliotheken (httpx, openai, ...) wie bisher erst ab WARNING
+    logging.basicConfig(handlers=[InterceptHandler()], level=logging.WARNING, force=True)
+    for name in STDLIB_LOGGERS:
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+        logging.getLogger(name).setLevel(logging.getLevelNamesMapping().get(level, logging.INFO))
+    for previous in SINKS:
+        previous.stop()
+    SINKS[:] = [sink]
+    atexit.register(sink.stop)
+    return sink
@@ -0,0 +1,226 @@
+# Gemeinsames Modul beider Services: Änderungen auch im Schwesterpaket nachziehen (scripts/check_shared_modules.py)
+import asyncio
+import json
+import math
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+
+from loguru import logger
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from custom_api.metrics import Counter, Gauge, Histogram
+
+LOOP_LAG_BUCKETS: tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+EVENT_LOOP_LAG_SECONDS: Histogram = Histogram(
+    "event_loop_lag_seconds",
+    "Verzögerung zwischen geplantem und tatsächlichem Aufwachen des Event-Loops",
+    buckets=LOOP_LAG_BUCKETS,
+)
+EVENT_LOOP_LAG_SMOOTHED: Gauge = Gauge(
+    "event_loop_lag_smoothed_seconds",
+    "Zeitgewichteter gleitender Mittelwert der Event-Loop-Verzögerung (langsamster Worker)",
+    merge="max",
+)
+EVENT_LOOP_STALLS: Counter = Counter(
+    "event_loop_stalls_total", "Blockaden des Event-Loops über der Stack-Schwelle (mit protokolliertem Stack)"
+)
+LOAD_SHEDDING_ACTIVE: Gauge = Gauge(
+    "load_shedding_active", "1, solange ein Worker teure Anfragen wegen Loop-Verzögerung ablehnt", merge="max"
+)
+LOAD_SHED_REQUESTS: Counter = Counter(
+    "load_shed_requests_total", "Wegen Loop-Verzögerung abgelehnte Anfragen", ("path",)
+)
+
+
+class LoopLagMonitor:
+    """Misst fortlaufend die Scheduling-Verzögerung des Event-Loops.
+
+    Ein Task schläft jeweils `interval` Sekunden; wie viel später er tatsächlich aufwacht, landet im
+    Histogramm. Der über `window` Sekunden zeitgewichtete Mittelwert entscheidet über Load Shedding:
+    über `shed_threshold` werden teure Anfragen abgelehnt, unter der halben Schwelle wieder angenommen.
+    Mit `stack_threshold` protokolliert ein Watchdog-Thread den Stack des Loop-Threads, sobald der Loop
+    länger als diese Schwelle nicht mehr zum Zug kommt - also den Code, der ihn gerade blockiert.
+    """
+
+    def __init__(
+        self, interval: float = 0.05, window: float = 2.0, shed_threshold: float = 0.2, stack_threshold: float = 0.0
+    ) -> None:
+        self.interval: float = max(interval, 0.001)
+        self.window: float = max(window, self.interval)
+        self.shed_threshold: float = shed_threshold
+        self.stack_threshold: float = stack_threshold
+        self.lag: float = 0.0
+        self.smoothed_lag: float = 0.0
+        self.max_lag: float = 0.0
+        self.samples: int = 0
+        self.shedding: bool = False
+        self.shed_requests: int = 0
+        self.stalls: int = 0
+        self._last_tick: float = time.monotonic()
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stop: threading.Event = threading.Event()
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "LoopLagMonitor":
+        """Liest `<PREFIX>_LOOP_MONITOR_INTERVAL`, `_LOOP_SHED_WINDOW`, `_LOOP_SHED_THRESHOLD` und `_LOOP_STACK_THRESHOLD` (0 = aus)"""
+        return cls(
+            interval=float(os.getenv(f"{prefix}_LOOP_MONITOR_INTERVAL", "0.05")),
+            window=float(os.getenv(f"{prefix}_LOOP_SHED_WINDOW", "2")),
+            shed_threshold=float(os.getenv(f"{prefix}_LOOP_SHED_THRESHOLD", "0.2")),
+            stack_threshold=float(os.getenv(f"{prefix}_LOOP_STACK_THRESHOLD", "0")),
+        )
+
+    def record(self, lag: float, elapsed: float) -> None:
+        """Verbucht eine Messung; `elapsed` (Dauer seit der letzten) gewichtet sie im gleitenden Mittelwert"""
+        self.lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.samples += 1
+        EVENT_LOOP_LAG_SECONDS.observe(lag)
+        self.smoothed_lag += (1.0 - math.exp(-elapsed / self.window)) * (lag - self.smoothed_lag)
+        EVENT_LOOP_LAG_SMOOTHED.set(self.smoothed_lag)
+        if self.shed_threshold <= 0:
+            return
+        if not self.shedding and self.smoothed_lag > self.shed_threshold:
+            self.shedding = True
+            LOAD_SHEDDING_ACTIVE.set(1)
+            logger.warning(f"🐢 Event-Loop-Verzögerung {self.smoothed_lag * 1000:.0f}ms - lehne teure Anfragen ab")
+        elif self.shedding and self.smoothed_lag < self.shed_threshold / 2:
+            self.shedding = False
+            LOAD_SHEDDING_ACTIVE.set(0)
+            logger.info(f"🐢 Event-Loop-Verzögerung {self.smoothed_lag * 1000:.0f}ms - nehme wieder alle Anfragen an")
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.window))
+
+    async def _run(self) -> None:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        while True:
+            started_at: float = loop.time()
+            await asyncio.sleep(self.interval)
+            elapsed: float = loop.time() - started_at
+            self._last_tick = time.monotonic()
+            self.record(max(elapsed - self.interval, 0.0), elapsed)
+
+    def _watch(self) -> None:
+        stalled: bool = False
+        while not self._stop.wait(min(self.interval, self.stack_threshold / 2)):
+            blocked: float = time.monotonic() - self._last_tick - self.interval
+            if blocked <= self.stack_threshold:
+                stalled = False
+                continue
+            if stalled:
+                continue
+            stalled = True
+            self.stalls += 1
+            EVENT_LOOP_STALLS.inc()
+            frame: Any = sys._current_frames().get(self._loop_thread_id or 0)
+            stack: str = "".join(traceback.format_stack(frame)) if frame is not None else "<Stack nicht verfügbar>\n"
+            logger.warning(f"🐢 Event-Loop seit {blocked * 1000:.0f}ms blockiert, aktueller Stack:\n{stack.rstrip()}")
+
+    @asynccontextmanager
+    async def running(self) -> AsyncIterator[None]:
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+        if self.stack_threshold > 0:
+            self._stop.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+        try:
+            yield
+        finally:
+            self._stop.set()
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "window": self.window,
+            "lag_seconds": self.lag,
+            "smoothed_lag_seconds": self.smoothed_lag,
+            "max_lag_seconds": self.max_lag,
+            "samples": self.samples,
+            "shed_threshold": self.shed_threshold,
+            "shedding": self.shedding,
+            "shed_requests": self.shed_requests,
+            "stack_threshold": self.stack_threshold,
+            "stalls": self.stalls,
+        }
+
+
+def is_tool_call(body: bytes) -> bool:
+    """Erkennt JSON-RPC-Nachrichten (auch Batches) mit `tools/call`"""
+    try:
+        message: Any = json.loads(body)
+    except ValueError:
+        return False
+    messages: list[Any] = message if isinstance(message, list) else [message]
+    return any(isinstance(item, dict) and item.get("method") == "tools/call" for item in messages)
+
+
+class LoadSheddingMiddleware:
+    """ASGI-Middleware, die bei anhaltender Loop-Verzögerung neue teure Anfragen mit 503 und `Retry-After` ablehnt.
+
+    Teuer sind POST-Anfragen auf `paths`; mit `body_filter` nur die, deren Body der Filter erkennt (der
+    Body wird dann gelesen und unverändert weitergereicht). Gilt nur für neue Anfragen: laufende
+    Antworten und offene Streams sowie Health-, Metrik- und alle anderen Pfade sind nicht betroffen.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        monitor: LoopLagMonitor,
+        paths: frozenset[str],
+        body_filter: Callable[[bytes], bool] | None = None,
+    ) -> None:
+        self.app: ASGIApp = app
+        self.monitor: LoopLagMonitor = monitor
+        self.paths: frozenset[str] = paths
+        self.body_filter: Callable[[bytes], bool] | None = body_filter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not self.monitor.shedding
+            or scope["method"] != "POST"
+            or scope["path"] not in self.paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if self.body_filter is not None:
+            messages: deque[Message] = deque()
+            while True:
+                message: Message = await receive()
+                messages.append(message)
+                if message["type"] != "http.request" or not message.get("more_body"):
+                    break
+
+            async def replay() -> Message:
+                return messages.popleft() if messages else await receive()
+
+            if not self.body_filter(b"".join(message.get("body", b"") for message in messages)):
+                await self.app(scope, replay, send)
+                return
+            receive = replay
+
+        self.monitor.shed_requests += 1
+        LOAD_SHED_REQUESTS.labels(scope["path"]).inc()
+        response: JSONResponse = JSONResponse(
+            {"detail": "Server ausgelastet, bitte später erneut versuchen"},
+            status_code=503,
+            headers={"Retry-After": str(self.monitor.retry_after())},
+        )
+        await response(scope, receive, send)
@@ -1,33 +1,87 @@
+import asyncio
+import json
+import logging
 import os
-import sys
-from typing import Any
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
 
-import uvicorn
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
-from fastapi.responses import HTMLResponse
+from fastapi.responses import Response
 from loguru import logger
 
 from custom_api import __version__ as API_VERSION
-from custom_api.authentication import verify_basic_auth
+from custom_api.authentication import PASSWORD_HASH, verify_basic_auth
+from custom_api.document_cache import DocumentCache
+from custom_api.llm import LLMBase
+from custom_api.llm.recipe import RECIPE_SIMILARITY, RecipeAssistant
+from custom_api.logs import QueueLogSink, configure_logging
+from custom_api.loop_monitor import LoadSheddingMiddleware, LoopLagMonitor
+from custom_api.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware, SharedMetrics
+from custom_api.readiness import READINESS
 from custom_api.routers.healthcheck import APP as healthcheck_router
+from custom_api.routers.healthcheck import PROBE_PATHS
 from custom_api.routers.recipe import router as recipe_assistant_router
+from custom_api.server import run
+from custom_api.startup import STARTUP
+
+# Configure loguru: non-blocking queue sink, formatted and written by a background thread
+LOG_SINK: QueueLogSink = configure_logging("CUSTOM_API")
+
+
+class ProbeAccessLogFilter(logging.Filter):
+    """Unterdrückt Access-Log-Zeilen für Liveness- und Readiness-Probes"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        args: Any = record.args
+        return not (isinstance(args, tuple) and len(args) >= 3 and str(args[2]).split("?", 1)[0] in PROBE_PATHS)
+
+
+logging.getLogger("uvicorn.access").addFilter(ProbeAccessLogFilter())
+
+SHARED_METRICS: SharedMetrics = SharedMetrics(REGISTRY, "CUSTOM_API")
+LOOP_MONITOR: LoopLagMonitor = LoopLagMonitor.from_env("CUSTOM_API")
+# Bei anhaltender Loop-Verzögerung werden nur neue Rezeptgenerierungen abgelehnt
+EXPENSIVE_PATHS: frozenset[str] = frozenset({"/chat/completions", "/recipes/batch"})
+DOCS_GZIP: bool = os.getenv("CUSTOM_API_DOCS_GZIP", "true").lower() == "true"
+
+
+def warm_up() -> None:
+    """Lädt langchain/openai, baut die LLM-Clients und berechnet den Passwort-Hash abseits des Event-Loops"""
+    try:
+        PASSWORD_HASH.get()
+        RecipeAssistant.get_instance().warm_up()
+        logger.info(f"🍳 LLM clients warmed up after {STARTUP.mark('warm_up'):.2f}s")
+    except Exception:
+        logger.exception("🍳 LLM warm-up failed, clients will be created on first use")
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    # /health antwortet sofort, /ready erst nach dem Warm-up im Hintergrund
+    warm_up_task: asyncio.Task[None] = asyncio.create_task(asyncio.to_thread(warm_up))
+    warm_up_task.add_done_callback(lambda _: READINESS.refresh())
+    async with READINESS.running(), SHARED_METRICS.running(), LOOP_MONITOR.running():
+        logger.info(f"⏱️ Application startup after {STARTUP.mark('lifespan'):.2f}s")
+        yield
+    warm_up_task.cancel()
+    await LLMBase.aclose()
+    if RECIPE_SIMILARITY is not None:
+        RECIPE_SIMILARITY.close()
 
-# Configure loguru
-logger.remove()  # Remove default handler
-logger.add(
-    sys.stderr,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-    level="INFO",
-)
 
 # Create main FastAPI application
 app: FastAPI = FastAPI(
     title="JAAI Hub Custom API Example",
     description="API showcasing the JAAI Hub Custom API features",
     version=API_VERSION,
+    lifespan=lifespan,
+    # Eigene, geschützte Routen unten; die eingebauten würden sie sonst ohne Auth überdecken
+    docs_url=None,
+    redoc_url=None,
+    openapi_url=None,
 )
 
 # Configure CORS
@@ -38,21 +92,12 @@ app.add_middleware(
     allow_headers=["*"],
     allow_credentials=True,
 )
+app.add_middleware(LoadSheddingMiddleware, monitor=LOOP_MONITOR, paths=EXPENSIVE_PATHS)
+app.add_middleware(MetricsMiddleware)
 
-# Add auth protection to documentation
-@app.get("/docs", include_in_schema=False)
-async def get_documentation(_: str = Depends(verify_basic_auth)) -> HTMLResponse:
-    return get_swagger_ui_html(openapi_url="/openapi.json", title="docs")
-
-
-@app.get("/redoc", include_in_schema=False)
-async def get_redoc_documentation(_: str = Depends(verify_basic_auth)) -> HTMLResponse:
-    return get_redoc_html(openapi_url="/openapi.json", title="docs")
 
-
-@app.get("/openapi.json", include_in_schema=False)
-async def openapi(_: str = Depends(verify_basic_auth)) -> dict[str, Any]:
-    return get_openapi(
+def build_openapi_document() -> bytes:
+    schema: dict[str, Any] = get_openapi(
         title=app.title,
         version=app.version,
         description=app.description,
@@ -60,6 +105,61 @@ async def openapi(_: str = Depends(verify_basic_auth)) -> dict[str, Any]:
         routes=app.routes,
         tags=app.openapi_tags,
     )
+    return json.dumps(schema, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def routes_version() -> tuple[int, ...]:
+    return tuple(id(route) for route in app.routes)
+
+
+OPENAPI_DOCUMENT: DocumentCache = DocumentCache(
+    build_openapi_document, routes_version, media_type="application/json", compress=DOCS_GZIP
+)
+SWAGGER_DOCUMENT: DocumentCache = DocumentCache(
+    lambda: bytes(get_swagger_ui_html(openapi_url="/openapi.json", title="docs").body),
+    lambda: None,
+    media_type="text/html",
+    compress=DOCS_GZIP,
+)
+REDOC_DOCUMENT: DocumentCache = DocumentCache(
+    lambda: bytes(get_redoc_html(openapi_url="/openapi.json", title="docs").body),
+    lambda: None,
+    media_type="text/html",
+    compress=DOCS_GZIP,
+)
+
+
+# Add auth protection to documentation
+@app.get("/docs", include_in_schema=False)
+async def get_documentation(request: Request, _: str = Depends(verify_basic_auth)) -> Response:
+    return SWAGGER_DOCUMENT.respond(request)
+
+
+@app.get("/redoc", include_in_schema=False)
+async def get_redoc_documentation(request: Request, _: str = Depends(verify_basic_auth)) -> Response:
+    return REDOC_DOCUMENT.respond(request)
+
+
+@app.get("/openapi.json", include_in_schema=False)
+async def openapi(request: Request, _: str = Depends(verify_basic_auth)) -> Response:
+    return OPENAPI_DOCUMENT.respond(request)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(_: str = Depends(verify_basic_auth)) -> Response:
+    return Response(await SHARED_METRICS.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/stats/startup", include_in_schema=False)
+async def get_startup_stats(_: str = Depends(verify_basic_auth)) -> dict[str, Any]:
+    """Sekunden seit Prozessstart bis Import, Lifespan, Warm-up und erstem erfolgreichen /health"""
+    return STARTUP.stats()
+
+
+@app.get("/stats/event-loop", include_in_schema=False)
+async def get_event_loop_stats(_: str = Depends(verify_basic_auth)) -> dict[str, Any]:
+    """Aktuelle, geglättete und maximale Event-Loop-Verzögerung sowie Load-Shedding-Status"""
+    return LOOP_MONITOR.stats()
 
 
 @app.get("/", include_in_schema=False)
@@ -68,20 +168,15 @@ async def read_root(_: str = Depends(verify_basic_auth)) -> dict[str, str]:
 
 
 # Mount the routers
-app.include_router(healthcheck_router, tags=["Healthcheck"], dependencies=[Depends(verify_basic_auth)])
+app.include_router(healthcheck_router, tags=["Healthcheck"])
 app.include_router(recipe_assistant_router, tags=["Recipe Assistant"], dependencies=[Depends(verify_basic_auth)])
+STARTUP.mark("import")
 
 
 def main() -> None:
     port: int = int(os.getenv("CUSTOM_API_PORT", "8000"))
     logger.info(f"Starting JAAI Hub Custom API server on port {port}")
-    uvicorn.run(
-        "custom_api.main:app",
-        host="0.0.0.0",
-        port=port,
-        reload=False,
-        log_level="info",
-    )
+    run("custom_api.main:app", prefix="CUSTOM_API", port=port)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,432 @@
+# Gemeinsames Modul beider Services: Änderungen auch im Schwesterpaket nachziehen (scripts/check_shared_modules.py)
+import asyncio
+import json
+import os
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterator, Literal
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+LATENCY_BUCKETS: tuple[float, ...] = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs: list[str] = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Registry:
+    """Sammelt alle Metriken eines Prozesses und rendert sie im Prometheus-Textformat"""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, "Metric"] = {}
+
+    def register(self, metric: "Metric") -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metrik {metric.name} ist bereits registriert")
+        self._metrics[metric.name] = metric
+
+    def collect(self) -> dict[str, list[tuple[list[str], Any]]]:
+        """Aktuelle Werte aller Metriken als JSON-serialisierbarer Snapshot"""
+        return {
+            name: [(list(values), value) for values, value in metric.collect().items()]
+            for name, metric in list(self._metrics.items())
+        }
+
+    def render(self, others: list[dict[str, list[tuple[list[str], Any]]]] | None = None) -> str:
+        """Rendert die eigenen Werte, bei `others` zusammengeführt mit den Snapshots anderer Prozesse"""
+        lines: list[str] = []
+        for name, metric in list(self._metrics.items()):
+            data: dict[tuple[str, ...], Any] = metric.collect()
+            for snapshot in others or []:
+                for values, value in snapshot.get(name, []):
+                    key: tuple[str, ...] = tuple(values)
+                    data[key] = metric.merge(data[key], value) if key in data else value
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            lines.extend(metric.samples(data))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY: Registry = Registry()
+
+
+class Metric:
+    """Basisklasse mit Label-Kindern; Updates laufen ohne Lock.
+
+    Alle Beobachtungen passieren auf dem Event-Loop, Kinder werden über `dict.setdefault` angelegt.
+    Aus Threads heraus können unter Konkurrenz einzelne Inkremente verloren gehen, was für
+    Monitoring vertretbar ist und den Hot Path frei von Locks hält.
+    """
+
+    type: str = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = (), registry: Registry | None = REGISTRY
+    ) -> None:
+        self.name: str = name
+        self.documentation: str = documentation
+        self.labelnames: tuple[str, ...] = labelnames
+        self._children: dict[tuple[str, ...], object] = {}
+        if not labelnames:
+            self.labels()
+        if registry is not None:
+            registry.register(self)
+
+    def _new_child(self) -> object:
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child: object | None = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} erwartet die Labels {self.labelnames}")
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def collect(self) -> dict[tuple[str, ...], Any]:
+        return {values: child.value for values, child in list(self._children.items())}
+
+    @staticmethod
+    def merge(left: Any, right: Any) -> Any:
+        return left + right
+
+    def samples(self, data: dict[tuple[str, ...], Any]) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+            for values, value in data.items()
+        ]
+
+
+class CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value: float = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def _new_child(self) -> CounterChild:
+        return CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value: float = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    @contextmanager
+    def track_inprogress(self) -> Iterator[None]:
+        self.value += 1
+        try:
+            yield
+        finally:
+            self.value -= 1
+
+
+class Gauge(Metric):
+    """Momentanwert; mit `function` wird der Wert erst beim Scrape gelesen (z.B. Warteschlangentiefe).
+
+    `merge` legt fest, wie die Werte mehrerer Worker zusammengeführt werden: `sum` für Mengen
+    (laufende Anfragen, Puffer), `max`/`min` für Zustände und Messwerte pro Prozess.
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        function: Callable[[], float] | None = None,
+        registry: Registry | None = REGISTRY,
+        merge: Literal["sum", "max", "min"] = "sum",
+    ) -> None:
+        super().__init__(name, documentation, labelnames, registry)
+        self.function: Callable[[], float] | None = function
+        self.merge_mode: Literal["sum", "max", "min"] = merge
+
+    def merge(self, left: Any, right: Any) -> Any:
+        if self.merge_mode == "max":
+            return max(left, right)
+        if self.merge_mode == "min":
+            return min(left, right)
+        return left + right
+
+    def _new_child(self) -> GaugeChild:
+        return GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def track_inprogress(self):
+        return self.labels().track_inprogress()
+
+    def collect(self) -> dict[tuple[str, ...], Any]:
+        if self.function is not None:
+            return {(): self.function()}
+        return super().collect()
+
+
+class HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "count")
+
+    def __init__(self, upper_bounds: tuple[float, ...]) -> None:
+        self.upper_bounds: tuple[float, ...] = upper_bounds
+        self.counts: list[int] = [0] * (len(upper_bounds) + 1)
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started_at: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at)
+
+
+class Histogram(Metric):
+    """Latenzverteilung mit festen Buckets; `observe` ist ein Bisect und drei Inkremente"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        registry: Registry | None = REGISTRY,
+    ) -> None:
+        self.upper_bounds: tuple[float, ...] = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> HistogramChild:
+        return HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def collect(self) -> dict[tuple[str, ...], Any]:
+        return {values: [*child.counts, child.sum, child.count] for values, child in list(self._children.items())}
+
+    @staticmethod
+    def merge(left: Any, right: Any) -> Any:
+        return [a + b for a, b in zip(left, right)]
+
+    def samples(self, data: dict[tuple[str, ...], Any]) -> list[str]:
+        lines: list[str] = []
+        for values, (*counts, total, count) in data.items():
+            cumulative: int = 0
+            for upper_bound, bucket_count in zip((*self.upper_bounds, float("inf")), counts):
+                cumulative += bucket_count
+                le: str = f'le="{_format_value(upper_bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+            labels: str = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def process_alive(pid: int) -> bool:
+    """Ob ein Prozess mit dieser PID existiert (auch wenn er einem anderen Benutzer gehört)"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedMetrics:
+    """Teilt Metriken zwischen Worker-Prozessen über JSON-Snapshots in `<PREFIX>_METRICS_DIR`.
+
+    Jeder Worker schreibt seinen Snapshot regelmäßig und vor jedem Scrape; `/metrics` führt die
+    Snapshots aller Worker zusammen, egal welcher Worker den Scrape beantwortet. Snapshots beendeter Prozesse
+    werden entfernt, solche ohne Aktualisierung seit `stale_after` Sekunden übersprungen. Ohne
+    Verzeichnis (ein Worker) wird nur die eigene Registry gerendert.
+    """
+
+    def __init__(self, registry: Registry, prefix: str, interval: float = 1.0) -> None:
+        self.registry: Registry = registry
+        self.prefix: str = prefix
+        self.interval: float = interval
+        self.stale_after: float = max(10 * interval, 30.0)
+
+    @property
+    def directory(self) -> Path | None:
+        directory: str | None = os.getenv(f"{self.prefix}_METRICS_DIR")
+        return Path(directory) if directory else None
+
+    def _own_path(self, directory: Path) -> Path:
+        return directory / f"{os.getpid()}.json"
+
+    def _read_snapshot(self, path: Path) -> dict[str, list[tuple[list[str], Any]]] | None:
+        """Snapshot eines anderen Workers; `None` für beendete (wird gelöscht) oder hängende Prozesse"""
+        try:
+            if path.stem.isdigit() and not process_alive(int(path.stem)):
+                path.unlink(missing_ok=True)
+                return None
+            if time.time() - path.stat().st_mtime > self.stale_after:
+                return None
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def write(self, snapshot: dict[str, list[tuple[list[str], Any]]] | None = None) -> None:
+        directory: Path | None = self.directory
+        if directory is None:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        temporary: Path = directory / f".{os.getpid()}.tmp"
+        temporary.write_text(json.dumps(snapshot if snapshot is not None else self.registry.collect()))
+        os.replace(temporary, self._own_path(directory))
+
+    def _exchange(
+        self, directory: Path, snapshot: dict[str, list[tuple[list[str], Any]]]
+    ) -> list[dict[str, list[tuple[list[str], Any]]]]:
+        """Schreibt den eigenen Snapshot und liest die der anderen Worker"""
+        self.write(snapshot)
+        own: Path = self._own_path(directory)
+        others: list[dict[str, list[tuple[list[str], Any]]]] = []
+        for path in directory.glob("*.json"):
+            if path != own and (other := self._read_snapshot(path)) is not None:
+                others.append(other)
+        return others
+
+    async def render(self) -> str:
+        """Gesammelt wird auf dem Event-Loop, die Datei-IO läuft in einem Thread"""
+        directory: Path | None = self.directory
+        if directory is None:
+            return self.registry.render()
+        others: list[dict[str, list[tuple[list[str], Any]]]] = await asyncio.to_thread(
+            self._exchange, directory, self.registry.collect()
+        )
+        return self.registry.render(others)
+
+    @asynccontextmanager
+    async def running(self) -> AsyncIterator[None]:
+        """Schreibt den eigenen Snapshot periodisch und entfernt ihn beim Beenden des Workers"""
+
+        async def sync() -> None:
+            while True:
+                await asyncio.sleep(self.interval)
+                await asyncio.to_thread(self.write)
+
+        task: asyncio.Task[None] | None = asyncio.create_task(sync()) if self.directory is not None else None
+        try:
+            yield
+        finally:
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                self._own_path(self.directory).unlink(missing_ok=True)
+
+
+HTTP_REQUESTS: Counter = Counter(
+    "http_requests_total", "HTTP-Anfragen pro Route und Status", ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION: Histogram = Histogram(
+    "http_request_duration_seconds", "Dauer von HTTP-Anfragen bis zum Ende der Antwort", ("method", "route")
+)
+HTTP_REQUESTS_IN_PROGRESS: Gauge = Gauge("http_requests_in_progress", "Laufende HTTP-Anfragen inkl. offener Streams")
+
+
+def _route_template(scope: Scope, path: str, root_path: str) -> str:
+    """Route-Vorlage statt roher Pfad, damit die Label-Kardinalität begrenzt bleibt"""
+    route = scope.get("route")
+    if route is not None and hasattr(route, "path"):
+        return route.path
+    app = scope.get("app")
+    router = getattr(app, "router", None)
+    if router is not None:
+        probe: Scope = {"type": "http", "path": path, "root_path": root_path, "method": scope["method"]}
+        for candidate in router.routes:
+            match, _ = candidate.matches(probe)
+            if match == Match.FULL:
+                return getattr(candidate, "path", "") or "/"
+    return "<unmatched>"
+
+
+class MetricsMiddleware:
+    """ASGI-Middleware für Anzahl, Dauer und laufende HTTP-Anfragen; misst Streams bis zum letzten Byte"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app: ASGIApp = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path: str = scope["path"]
+        root_path: str = scope.get("root_path", "")
+        status_code: int = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started_at: float = time.perf_counter()
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            route: str = _route_template(scope, path, root_path)
+            HTTP_REQUESTS.labels(scope["method"], route, str(status_code)).inc()
+            HTTP_REQUEST_DURATION.labels(scope["method"], route).observe(time.perf_counter() - started_at)
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+import httpx
+from loguru import logger
+
+from custom_api.admission import ADMISSION
+from custom_api.http_transport import CountingTransport
+from custom_api.llm import LLMBase
+from custom_api.llm.recipe import RecipeAssistant
+
+READINESS_INTERVAL: float = float(os.getenv("CUSTOM_API_READINESS_INTERVAL", "5"))
+
+
+def _pool_health(client: httpx.AsyncClient | None, transport: CountingTransport | None) -> dict[str, Any]:
+    if client is None or client.is_closed or transport is None:
+        return {"healthy": False, "in_use_connections": 0, "max_connections": None, "saturated": False}
+    return {"healthy": True, **transport.stats()}
+
+
+class ReadinessProbe:
+    """Readiness-Snapshot, den ein Hintergrund-Task regelmäßig neu berechnet.
+
+    Der Endpunkt liefert nur die vorserialisierten Bytes aus, sodass Probes weder rechnen noch
+    mit Nutzeranfragen um CPU konkurrieren.
+    """
+
+    def __init__(self, interval: float = 5.0) -> None:
+        self.interval: float = interval
+        self.ready: bool = False
+        self.body: bytes = b'{"ready":false,"reason":"starting"}'
+        self._task: asyncio.Task[None] | None = None
+
+    def refresh(self) -> None:
+        llm_warmed_up: bool = RecipeAssistant.get_instance().warmed_up
+        pool: dict[str, Any] = _pool_health(LLMBase._http_async_client, LLMBase._http_transport)
+        admission: dict[str, Any] = {
+            "in_flight": ADMISSION.in_flight,
+            "queue_depth": ADMISSION.queue_depth,
+            "max_queue": ADMISSION.max_queue,
+            "saturated": ADMISSION.queue_depth >= ADMISSION.max_queue,
+        }
+        ready: bool = llm_warmed_up and pool["healthy"] and not admission["saturated"]
+        if ready != self.ready:
+            logger.info(f"🩺 Readiness: {'bereit' if ready else 'nicht bereit'}")
+        self.ready = ready
+        self.body = json.dumps(
+            {
+                "ready": ready,
+                "checked_at": time.time(),
+                "llm": {"warmed_up": llm_warmed_up},
+                "http_pool": pool,
+                "admission": admission,
+            },
+            separators=(",", ":"),
+        ).encode()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("🩺 Readiness check failed")
+                self.ready = False
+                self.body = b'{"ready":false,"reason":"check failed"}'
+            await asyncio.sleep(self.interval)
+
+    @asynccontextmanager
+    async def running(self) -> AsyncIterator[None]:
+        self._task = asyncio.create_task(self._run())
+        try:
+            yield
+        finally:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+READINESS: ReadinessProbe = ReadinessProbe(READINESS_INTERVAL)
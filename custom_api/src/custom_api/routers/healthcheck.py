@@ -1,10 +1,23 @@
-from fastapi import APIRouter
-from loguru import logger
+from fastapi import APIRouter, Response
+
+from custom_api.readiness import READINESS
+from custom_api.startup import STARTUP
 
 APP: APIRouter = APIRouter()
 
+PROBE_PATHS: frozenset[str] = frozenset({"/health", "/ready"})
+LIVENESS_RESPONSE: Response = Response(content=b"true", status_code=201, media_type="application/json")
+
 
 @APP.get("/health", status_code=201)
-async def get_custom_api_healthcheck() -> bool:
-    logger.info("Healthcheck called")
-    return True
+async def get_custom_api_healthcheck() -> Response:
+    """Liveness: ohne Auth und ohne Logging, liefert eine vorgefertigte Antwort"""
+    if not STARTUP.healthy:
+        STARTUP.mark_healthy()
+    return LIVENESS_RESPONSE
+
+
+@APP.get("/ready")
+async def get_custom_api_readiness() -> Response:
+    """Readiness: LLM-Warm-up, HTTP-Pool und Admission-Warteschlange aus dem zuletzt berechneten Snapshot"""
+    return Response(content=READINESS.body, status_code=200 if READINESS.ready else 503, media_type="application/json")
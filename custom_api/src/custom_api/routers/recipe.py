@@ -1,12 +1,41 @@
 import asyncio
+import os
+import time
+import uuid
+from typing import Any, AsyncIterator, Literal
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from jaai_hub.custom_api import ChatCompletionRequest
 from jaai_hub.streaming_message import SourceGenType, Status, StreamingMessage
 from loguru import logger
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
 
-from custom_api.llm.recipe import RecipeAssistant, RecipeResult
+from custom_api.admission import ADMISSION, AdmissionRejected, Ticket
+from custom_api.authentication import verify_basic_auth
+from custom_api.llm.recipe import (
+    RECIPE_CACHE,
+    RECIPE_SIMILARITY,
+    RECIPE_SINGLE_FLIGHT,
+    RECIPE_TIMEOUT,
+    RecipeAssistant,
+    RecipeResult,
+    recipe_cache_key,
+)
+from custom_api.logs import SAMPLED_LOGGER
+from custom_api.metrics import LATENCY_BUCKETS, Histogram
+from custom_api.stages import Stage, StagePipeline
+
+RECIPE_STREAMING: bool = os.getenv("CUSTOM_API_RECIPE_STREAMING", "true").lower() == "true"
+BATCH_MAX_SIZE: int = int(os.getenv("CUSTOM_API_BATCH_MAX_SIZE", "1000"))
+BATCH_MAX_CONCURRENCY: int = int(os.getenv("CUSTOM_API_BATCH_MAX_CONCURRENCY", "8"))
+
+SSE_FIRST_CHUNK_SECONDS: Histogram = Histogram(
+    "sse_time_to_first_chunk_seconds",
+    "Zeit vom Eingang der Anfrage bis zum ersten Inhalts-Chunk im SSE-Stream",
+    buckets=LATENCY_BUCKETS,
+)
 
 router: APIRouter = APIRouter(
     tags=["recipe_assistant"],
@@ -14,77 +43,325 @@ router: APIRouter = APIRouter(
 )
 
 
-@router.post("/chat/completions")
-async def chat_completion(request: ChatCompletionRequest) -> StreamingResponse:
-    """Chat completion endpoint for recipe generation with streaming support"""
-    logger.info(f"🍳 Received recipe request with {len(request.messages)} messages")
-    logger.debug(f"🍳 Request model: {request.model}, stream: {request.stream}")
+class RecipeBatchRequest(BaseModel):
+    ingredients: list[str] = Field(description="Zutatenlisten, je Eintrag ein Rezept")
+    temperature: float = 0.3
+    max_concurrency: int | None = Field(default=None, description="Obergrenze paralleler LLM-Aufrufe")
+    format: Literal["json", "ndjson"] = "json"
+
+
+class RecipeBatchItem(BaseModel):
+    index: int
+    ingredients: str
+    recipe: RecipeResult | None = None
+    markdown: str | None = None
+    cached: bool = False
+    error: str | None = None
+
+
+@router.post("/chat/completions", response_model=None)
+async def chat_completion(
+    request: ChatCompletionRequest, username: str = Depends(verify_basic_auth)
+) -> StreamingResponse | JSONResponse:
+    """Chat completion endpoint for recipe generation with streaming and non-streaming support"""
+    SAMPLED_LOGGER.info("🍳 Received recipe request with {} messages", len(request.messages))
+    logger.debug("🍳 Request model: {}, stream: {}", request.model, request.stream)
+    last_message: str = request.messages[-1].content if request.messages else ""
+    temperature: float = request.temperature or 0.3
+    cache_key: str = recipe_cache_key(last_message, temperature)
     if request.stream:
-        logger.info("🍳 Starting streaming response for recipe generation")
-        return StreamingResponse(StreamingMessage(stream_recipe_response(request)), media_type="text/event-stream")
-    else:
-        logger.warning("🍳 Non-streaming requests not supported for recipe generation")
-        raise HTTPException(status_code=400, detail="Streaming is required for recipe generation")
+        SAMPLED_LOGGER.info("🍳 Starting streaming response for recipe generation")
+        started_at: float = time.perf_counter()
+        pipeline: StagePipeline = StagePipeline()
+        cached_recipe: RecipeResult | None = None
+        stream_ticket: Ticket | None = None
+        if last_message.strip():
+            # Cache und Admission vor dem Stream, damit eine volle Warteschlange noch als 429 ankommt
+            with pipeline.measure("cache"):
+                cached_recipe = await find_cached_recipe(last_message, cache_key)
+            if cached_recipe is None:
+                stream_ticket = admit_leader(username, cache_key)
+        return StreamingResponse(
+            StreamingMessage(
+                observe_first_chunk(
+                    stream_recipe_response(
+                        last_message, temperature, cache_key, pipeline, cached_recipe, stream_ticket, username
+                    ),
+                    started_at,
+                )
+            ),
+            media_type="text/event-stream",
+            background=BackgroundTask(stream_ticket.release) if stream_ticket is not None else None,
+        )
 
+    SAMPLED_LOGGER.info("🍳 Starting non-streaming recipe generation")
+    if not last_message.strip():
+        raise HTTPException(
+            status_code=400, detail="Bitte geben Sie Ihre verfügbaren Zutaten ein (z.B. 'Nudeln, Tomaten, Käse')."
+        )
+    # Cache-Treffer belegen keinen Platz in der Admission Control
+    recipe_result: RecipeResult | None = await find_cached_recipe(last_message, cache_key)
+    if recipe_result is None:
+        ticket: Ticket | None = admit_leader(username, cache_key)
+        try:
+            if ticket is not None:
+                await wait_admitted(ticket)
+            recipe_result = await get_or_generate_recipe(
+                RecipeAssistant.get_instance(), last_message, temperature, cache_key, use_cache=False
+            )
+        except HTTPException:
+            raise
+        except Exception as error:
+            logger.exception(f"🍳 Recipe generation failed")
+            raise HTTPException(status_code=502, detail=f"Fehler bei der Rezepterstellung: {error}") from error
+        finally:
+            if ticket is not None:
+                ticket.release()
 
-def format_recipe_as_markdown(recipe: RecipeResult) -> str:
-    """Formatiert das Rezept als schönes Markdown"""
+    # openai-Typen erst hier importieren, damit sie den Kaltstart nicht verlängern
+    from openai.types.chat import ChatCompletion, ChatCompletionMessage
+    from openai.types.chat.chat_completion import Choice
+
+    completion: ChatCompletion = ChatCompletion(
+        id=f"chatcmpl-{uuid.uuid4().hex}",
+        object="chat.completion",
+        created=int(time.time()),
+        model=request.model or RecipeAssistant.get_model_config().model_id,
+        choices=[
+            Choice(
+                index=0,
+                finish_reason="stop",
+                message=ChatCompletionMessage(role="assistant", content=format_recipe_as_markdown(recipe_result)),
+            )
+        ],
+    )
+    return JSONResponse(completion.model_dump(exclude_none=True))
 
-    difficulty_emoji: str = {"Einfach": "🟢", "Mittel": "🟡", "Schwer": "🔴"}.get(recipe.difficulty, "⚪")
-    markdown: str = f"""# 🍳 {recipe.recipe_name}
 
-## 📝 Beschreibung
-{recipe.description}
+@router.post("/recipes/batch", response_model=None)
+async def recipe_batch(request: RecipeBatchRequest, username: str = Depends(verify_basic_auth)) -> Response:
+    """Erstellt Rezepte für viele Zutatenlisten; Ergebnisse in Eingabereihenfolge als JSON oder NDJSON"""
+    if len(request.ingredients) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Maximal {BATCH_MAX_SIZE} Zutatenlisten pro Batch erlaubt")
+    logger.info("🍳 Received recipe batch with {} items ({})", len(request.ingredients), request.format)
+    cache_keys: list[str] = [recipe_cache_key(item, request.temperature) for item in request.ingredients]
+    results, pending = await lookup_recipe_batch(request, cache_keys)
+    # Plätze vor dem Antwortbeginn belegen, damit Überlast auch im NDJSON-Modus als 429 ankommt
+    max_concurrency: int = min(request.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY, len(pending))
+    tickets: list[Ticket] = await admit_batch(username, max(max_concurrency, 1)) if pending else []
 
-## ⏱️ Details
-- **Zubereitungszeit:** {recipe.cooking_time}
-- **Schwierigkeit:** {difficulty_emoji} {recipe.difficulty}
+    def release_tickets() -> None:
+        for ticket in tickets:
+            ticket.release()
 
-## 🛒 Zutaten
-"""
-    for ingredient in recipe.ingredients:
-        markdown += f"- {ingredient}\n"
+    if request.format == "ndjson":
 
-    markdown += f"""
-## 👨‍🍳 Zubereitung
-"""
-    for i, instruction in enumerate(recipe.instructions, 1):
-        markdown += f"{i}. {instruction}\n"
+        async def stream_batch() -> AsyncIterator[str]:
+            async for item in generate_recipe_batch(request, cache_keys, results, pending, tickets):
+                yield item.model_dump_json() + "\n"
 
-    markdown += f"""
-## 💡 Kochtipps
-"""
-    for tip in recipe.tips:
-        markdown += f"- 💡 {tip}\n"
+        return StreamingResponse(
+            stream_batch(), media_type="application/x-ndjson", background=BackgroundTask(release_tickets)
+        )
 
-    markdown += f"""
-## 🥗 Nährwerte
-{recipe.nutritional_info}
+    try:
+        items: list[RecipeBatchItem] = [
+            item async for item in generate_recipe_batch(request, cache_keys, results, pending, tickets)
+        ]
+    finally:
+        release_tickets()
+    return JSONResponse(
+        {
+            "results": [item.model_dump(mode="json") for item in items],
+            "errors": sum(1 for item in items if item.error is not None),
+        }
+    )
 
----
-*Guten Appetit! 🍽️ Rezept erstellt von Ihrem KI-Kochassistenten* 🤖
-"""
 
-    return markdown
+@router.get("/stats/admission")
+async def get_admission_stats() -> dict[str, Any]:
+    """Warteschlangentiefe, laufende Anfragen und Wartezeiten der Admission Control"""
+    return ADMISSION.stats()
 
 
-async def stream_recipe_response(request: ChatCompletionRequest) -> SourceGenType:
-    """Generate streaming response for recipe generation"""
-    logger.info("🍳 Starting AI-powered recipe generation workflow")
+@router.get("/stats/llm")
+async def get_llm_stats() -> dict[str, Any]:
+    """Hedge-Rate, Gewinner und Retries der LLM-Aufrufe sowie Prompt-, gecachte und Completion-Token"""
+    recipe_assistant: RecipeAssistant = RecipeAssistant.get_instance()
+    return {**recipe_assistant.hedge_stats.stats(), "tokens": recipe_assistant.token_usage.stats()}
 
-    # Get ingredients from the last user message
-    last_message: str = request.messages[-1].content if request.messages else ""
-    logger.debug(f"🍳 Ingredients text length: {len(last_message)} characters")
+
+@router.get("/stats/recipe-cache")
+async def get_recipe_cache_stats() -> dict[str, Any]:
+    """Hit-Ratio und eingesparte Latenz des Rezept-Caches"""
+    return await RECIPE_CACHE.stats()
+
+
+@router.get("/stats/recipe-similarity")
+async def get_recipe_similarity_stats() -> dict[str, Any]:
+    """Größe, Treffer und Suchdauer des Ähnlichkeitsindex (leer, wenn deaktiviert)"""
+    return RECIPE_SIMILARITY.stats() if RECIPE_SIMILARITY is not None else {"enabled": False}
+
+
+@router.get("/stats/recipe-single-flight")
+async def get_recipe_single_flight_stats() -> dict[str, Any]:
+    """Anzahl gebündelter, gleichzeitig laufender Rezeptgenerierungen"""
+    return RECIPE_SINGLE_FLIGHT.stats()
+
+
+DIFFICULTY_EMOJIS: dict[str, str] = {"Einfach": "🟢", "Mittel": "🟡", "Schwer": "🔴"}
+RECIPE_FOOTER: str = "\n---\n*Guten Appetit! 🍽️ Rezept erstellt von Ihrem KI-Kochassistenten* 🤖\n"
+
+
+class RecipeMarkdownStreamer:
+    """Rendert ein Rezept schrittweise als Markdown, während die strukturierte Ausgabe wächst.
+
+    Ein Feld gilt als fertig, sobald das nächste Feld in der Ausgabe erscheint; ein Listeneintrag,
+    sobald der nächste Eintrag beginnt. Jeder Abschnitt wird genau einmal und in Reihenfolge ausgegeben.
+    """
+
+    FIELDS: tuple[tuple[str, bool], ...] = (
+        ("recipe_name", False),
+        ("description", False),
+        ("cooking_time", False),
+        ("difficulty", False),
+        ("ingredients", True),
+        ("instructions", True),
+        ("tips", True),
+        ("nutritional_info", False),
+    )
+    LIST_HEADERS: dict[str, str] = {
+        "ingredients": "## 🛒 Zutaten\n",
+        "instructions": "\n## 👨‍🍳 Zubereitung\n",
+        "tips": "\n## 💡 Kochtipps\n",
+    }
+
+    def __init__(self) -> None:
+        self._field: int = 0
+        self._item: int = 0
+        self._header_sent: bool = False
+
+    @property
+    def finished(self) -> bool:
+        return self._field >= len(self.FIELDS)
+
+    @staticmethod
+    def _render_value(name: str, value: Any) -> str:
+        text: str = "" if value is None else str(value)
+        if name == "recipe_name":
+            return f"# 🍳 {text}\n\n"
+        if name == "description":
+            return f"## 📝 Beschreibung\n{text}\n\n"
+        if name == "cooking_time":
+            return f"## ⏱️ Details\n- **Zubereitungszeit:** {text}\n"
+        if name == "difficulty":
+            return f"- **Schwierigkeit:** {DIFFICULTY_EMOJIS.get(text, '⚪')} {text}\n\n"
+        return f"\n## 🥗 Nährwerte\n{text}\n{RECIPE_FOOTER}"
+
+    @staticmethod
+    def _render_item(name: str, index: int, value: Any) -> str:
+        if name == "instructions":
+            return f"{index + 1}. {value}\n"
+        if name == "tips":
+            return f"- 💡 {value}\n"
+        return f"- {value}\n"
+
+    def feed(self, partial_recipe: dict[str, Any], final: bool = False) -> str:
+        """Gibt das Markdown zurück, das seit dem letzten Aufruf vollständig geworden ist"""
+        parts: list[str] = []
+        while not self.finished:
+            name, is_list = self.FIELDS[self._field]
+            next_started: bool = final or any(
+                following in partial_recipe for following, _ in self.FIELDS[self._field + 1 :]
+            )
+            if is_list:
+                if not self._header_sent and (name in partial_recipe or next_started):
+                    parts.append(self.LIST_HEADERS[name])
+                    self._header_sent = True
+                items: list[Any] = partial_recipe.get(name) or []
+                complete: int = len(items) if next_started else max(len(items) - 1, 0)
+                while self._item < complete:
+                    parts.append(self._render_item(name, self._item, items[self._item]))
+                    self._item += 1
+                if not next_started:
+                    break
+                self._item = 0
+                self._header_sent = False
+            else:
+                if not next_started:
+                    break
+                parts.append(self._render_value(name, partial_recipe.get(name)))
+            self._field += 1
+        return "".join(parts)
+
+
+def format_recipe_as_markdown(recipe: RecipeResult) -> str:
+    """Formatiert das Rezept als schönes Markdown"""
+    return RecipeMarkdownStreamer().feed(recipe.model_dump(), final=True)
+
+
+async def stream_recipe_response(
+    last_message: str,
+    temperature: float,
+    cache_key: str,
+    pipeline: StagePipeline,
+    cached_recipe: RecipeResult | None,
+    ticket: Ticket | None,
+    username: str,
+) -> SourceGenType:
+    """Generate streaming response for recipe generation
+
+    Cache-Lookup und Admission erledigt bereits `chat_completion`; `ticket` wird hier eingelöst und freigegeben.
+    Ohne Ticket schließt sich die Anfrage einer laufenden Generierung mit demselben Schlüssel an.
+    """
+    SAMPLED_LOGGER.info("🍳 Starting AI-powered recipe generation workflow")
+    logger.debug("🍳 Ingredients text length: {} characters", len(last_message))
     if not last_message.strip():
         yield "❌ **Fehler:** Bitte geben Sie Ihre verfügbaren Zutaten ein (z.B. 'Nudeln, Tomaten, Käse')."
         return
 
+    if cached_recipe is None and ticket is None and not RECIPE_SINGLE_FLIGHT.is_inflight(cache_key):
+        # The generation this request meant to join has finished in the meantime
+        cached_recipe = await find_cached_recipe(last_message, cache_key)
+        if cached_recipe is None:
+            try:
+                ticket = ADMISSION.enter(username)
+            except AdmissionRejected as rejection:
+                yield f"❌ **Fehler:** {rejection}. Bitte in {rejection.retry_after} Sekunden erneut versuchen."
+                return
+
+    # Serve repeated ingredient sets straight from the cache
+    if cached_recipe is not None:
+        SAMPLED_LOGGER.info("🍳 Recipe served from cache")
+        with pipeline.measure("format"):
+            formatted_recipe: str = format_recipe_as_markdown(cached_recipe)
+        yield formatted_recipe
+        yield pipeline.complete("✅ Rezept fertig! Guten Appetit! 🍽️")
+        return
+
+    if ticket is not None and RECIPE_SINGLE_FLIGHT.is_inflight(cache_key):
+        # Meanwhile another request started the same generation: join it and hand back the slot
+        ticket.release()
+        ticket = None
+    source: SourceGenType = generate_recipe_response(pipeline, last_message, temperature, cache_key)
+    if ticket is not None:
+        source = stream_admitted(ticket, source)
+    try:
+        async for item in source:
+            yield item
+    finally:
+        await source.aclose()
+
+
+async def generate_recipe_response(
+    pipeline: StagePipeline, last_message: str, temperature: float, cache_key: str
+) -> SourceGenType:
+    """Generiert das Rezept für einen Cache-Fehlschlag und liefert Status-Meldungen und Markdown-Chunks"""
     # Initialize the recipe assistant
     try:
-        yield Status(type="basic", text="🍳 Starte Kochassistent...")
-        await asyncio.sleep(0.3)  # Brief processing time
-        recipe_assistant: RecipeAssistant = RecipeAssistant.get_instance()
-        logger.info("🍳 Recipe Assistant initialized successfully")
+        with pipeline.measure("init"):
+            recipe_assistant: RecipeAssistant = RecipeAssistant.get_instance()
+        SAMPLED_LOGGER.info("🍳 Recipe Assistant initialized successfully")
     except Exception as error:
         logger.exception(f"🍳 Failed to initialize recipe assistant")
         yield f"❌ **Fehler beim Starten des Kochassistenten:** {str(error)}"
@@ -92,24 +369,263 @@ async def stream_recipe_response(request: ChatCompletionRequest) -> SourceGenTyp
 
     # Generate the recipe
     try:
-        yield Status(type="basic", text="👨‍🍳 Entwickle Rezept...")
-        logger.info("🍳 Starting recipe generation")
+        if RECIPE_SINGLE_FLIGHT.is_inflight(cache_key):
+            generate_status: str = "👨‍🍳 Gleiches Rezept wird bereits entwickelt..."
+            SAMPLED_LOGGER.info("🍳 Joining in-flight recipe generation")
+        else:
+            generate_status = "👨‍🍳 Entwickle Rezept..."
+            SAMPLED_LOGGER.info("🍳 Starting recipe generation")
 
-        recipe_result: RecipeResult = await recipe_assistant.predict(
-            ingredients=last_message, temperature=request.temperature or 0.3, timeout=5000
-        )
-        logger.success("🍳 Recipe generation completed successfully")
+        if RECIPE_STREAMING:
+            streamer: RecipeMarkdownStreamer = RecipeMarkdownStreamer()
+            async for item in pipeline.stream(
+                "generate",
+                generate_status,
+                stream_recipe_markdown(recipe_assistant, last_message, temperature, cache_key),
+            ):
+                if isinstance(item, Status):
+                    yield item
+                    continue
+                with pipeline.measure("format"):
+                    if isinstance(item, RecipeResult):
+                        chunk: str = streamer.feed(item.model_dump(), final=True)
+                    else:
+                        chunk = streamer.feed(item)
+                if chunk:
+                    yield chunk
+            SAMPLED_LOGGER.success("🍳 Recipe generation completed successfully")
+        else:
 
-        yield Status(type="basic", text="📝 Formatiere Rezept...")
-        await asyncio.sleep(0.2)
+            generate: Stage[RecipeResult] = pipeline.stage("generate", generate_status)
+            async for status in generate.run(
+                get_or_generate_recipe(recipe_assistant, last_message, temperature, cache_key, use_cache=False)
+            ):
+                yield status
+            SAMPLED_LOGGER.success("🍳 Recipe generation completed successfully")
 
-        # Format and yield the recipe as markdown
-        formatted_recipe: str = format_recipe_as_markdown(recipe_result)
-        yield formatted_recipe
+            # Format and yield the recipe as markdown
+            with pipeline.measure("format"):
+                formatted_recipe: str = format_recipe_as_markdown(generate.result)
+            yield formatted_recipe
 
-        yield Status(type="complete", text="✅ Rezept fertig! Guten Appetit! 🍽️")
-        logger.success("🍳 Recipe generation workflow completed successfully")
+        yield pipeline.complete("✅ Rezept fertig! Guten Appetit! 🍽️")
+        logger.opt(lazy=True).success("🍳 Recipe generation workflow completed successfully ({})", pipeline.summary)
 
     except Exception as error:
         logger.exception(f"🍳 Recipe generation failed")
         yield f"❌ **Fehler bei der Rezepterstellung:** {str(error)}"
+
+
+def admit(username: str) -> Ticket:
+    """Reserviert einen Platz in der Admission Control oder lehnt sofort mit 429 ab"""
+    try:
+        return ADMISSION.enter(username)
+    except AdmissionRejected as rejection:
+        raise HTTPException(
+            status_code=429, detail=str(rejection), headers={"Retry-After": str(rejection.retry_after)}
+        ) from rejection
+
+
+def admit_leader(username: str, cache_key: str) -> Ticket | None:
+    """Wie `admit`, aber wer sich einer laufenden Generierung anschließt, braucht keinen Platz (`None`)"""
+    if RECIPE_SINGLE_FLIGHT.is_inflight(cache_key):
+        SAMPLED_LOGGER.info("🍳 Joining in-flight recipe generation without admission")
+        return None
+    return admit(username)
+
+
+async def wait_admitted(ticket: Ticket) -> None:
+    try:
+        async for _ in ticket.wait():
+            pass
+    except AdmissionRejected as rejection:
+        raise HTTPException(
+            status_code=429, detail=str(rejection), headers={"Retry-After": str(rejection.retry_after)}
+        ) from rejection
+
+
+async def admit_batch(username: str, slots: int) -> list[Ticket]:
+    """Wartet auf einen Platz und belegt bis zu `slots - 1` weitere, solange sie sofort frei sind.
+
+    Jeder parallele LLM-Aufruf eines Batches braucht seinen eigenen Platz; auf die zusätzlichen wird nicht
+    gewartet, damit ein Batch weder andere Anfragen überholt noch an seinem eigenen Benutzer-Limit hängen bleibt.
+    """
+    ticket: Ticket = admit(username)
+    await wait_admitted(ticket)
+    tickets: list[Ticket] = [ticket]
+    while len(tickets) < slots and (extra := ADMISSION.try_enter(username)) is not None:
+        tickets.append(extra)
+    return tickets
+
+
+async def stream_admitted(ticket: Ticket, source: SourceGenType) -> SourceGenType:
+    """Meldet die Warteschlangenposition als Status, bis die Anfrage zugelassen ist, und reicht dann `source` durch"""
+    try:
+        try:
+            replace: bool = False
+            async for position in ticket.wait():
+                yield Status(
+                    type="basic",
+                    text=f"⏳ Viele Anfragen - Position {position} in der Warteschlange...",
+                    replace=replace,
+                )
+                replace = True
+        except AdmissionRejected as rejection:
+            yield f"❌ **Fehler:** {rejection}. Bitte in {rejection.retry_after} Sekunden erneut versuchen."
+            return
+        async for item in source:
+            yield item
+    finally:
+        ticket.release()
+
+
+async def observe_first_chunk(source: SourceGenType, started_at: float) -> SourceGenType:
+    """Reicht `source` durch und misst die Zeit bis zum ersten Text-Chunk (Status-Meldungen zählen nicht)"""
+    observed: bool = False
+    async for item in source:
+        if not observed and isinstance(item, str):
+            SSE_FIRST_CHUNK_SECONDS.observe(time.perf_counter() - started_at)
+            observed = True
+        yield item
+
+
+async def find_cached_recipe(ingredients: str, cache_key: str) -> RecipeResult | None:
+    """Exakter Treffer im Rezept-Cache, sonst ein ausreichend ähnliches früheres Rezept aus dem Index"""
+    if (cached_recipe := await RECIPE_CACHE.get(cache_key)) is not None:
+        return cached_recipe
+    if RECIPE_SIMILARITY is not None and (match := RECIPE_SIMILARITY.lookup(ingredients)) is not None:
+        SAMPLED_LOGGER.info(
+            "🔎 Similar recipe ({:.2f}) reused for '{}' from '{}'", match.similarity, ingredients, match.text
+        )
+        return match.result
+    return None
+
+
+async def store_recipe(ingredients: str, cache_key: str, result: RecipeResult, latency: float) -> None:
+    await RECIPE_CACHE.set(cache_key, result, latency=latency)
+    if RECIPE_SIMILARITY is not None:
+        RECIPE_SIMILARITY.add(ingredients, result)
+
+
+async def get_or_generate_recipe(
+    recipe_assistant: RecipeAssistant, ingredients: str, temperature: float, cache_key: str, use_cache: bool = True
+) -> RecipeResult:
+    """Liefert das Rezept aus dem Cache oder generiert es über den Single-Flight-Layer"""
+    if use_cache and (cached_recipe := await find_cached_recipe(ingredients, cache_key)) is not None:
+        return cached_recipe
+
+    async def generate_recipe() -> RecipeResult:
+        started_at: float = time.perf_counter()
+        result: RecipeResult = await recipe_assistant.predict(
+            ingredients=ingredients, temperature=temperature, timeout=RECIPE_TIMEOUT
+        )
+        await store_recipe(ingredients, cache_key, result, latency=time.perf_counter() - started_at)
+        return result
+
+    return await RECIPE_SINGLE_FLIGHT.do(cache_key, generate_recipe)
+
+
+async def lookup_recipe_batch(
+    request: RecipeBatchRequest, cache_keys: list[str]
+) -> tuple[dict[int, RecipeBatchItem], list[int]]:
+    """Beantwortet leere Einträge und Cache-Treffer; liefert diese Ergebnisse und die Indizes der Fehlschläge"""
+    results: dict[int, RecipeBatchItem] = {}
+    pending: list[int] = []
+    for index, ingredients in enumerate(request.ingredients):
+        if not ingredients.strip():
+            results[index] = RecipeBatchItem(index=index, ingredients=ingredients, error="Keine Zutaten angegeben")
+        elif (cached_recipe := await find_cached_recipe(ingredients, cache_keys[index])) is not None:
+            results[index] = RecipeBatchItem(
+                index=index,
+                ingredients=ingredients,
+                recipe=cached_recipe,
+                markdown=format_recipe_as_markdown(cached_recipe),
+                cached=True,
+            )
+        else:
+            pending.append(index)
+    return results, pending
+
+
+async def generate_recipe_batch(
+    request: RecipeBatchRequest,
+    cache_keys: list[str],
+    results: dict[int, RecipeBatchItem],
+    pending: list[int],
+    tickets: list[Ticket],
+) -> AsyncIterator[RecipeBatchItem]:
+    """Generiert die Fehlschläge mit einem LLM-Aufruf je Platz in `tickets` und liefert alles in Eingabereihenfolge"""
+    next_index: int = 0
+    try:
+        while next_index in results:
+            yield results.pop(next_index)
+            next_index += 1
+        if not pending:
+            return
+        async for item in generate_pending_items(request, pending, cache_keys, len(tickets)):
+            results[item.index] = item
+            while next_index in results:
+                yield results.pop(next_index)
+                next_index += 1
+    finally:
+        for ticket in tickets:
+            ticket.release()
+
+
+async def generate_pending_items(
+    request: RecipeBatchRequest, pending: list[int], cache_keys: list[str], max_concurrency: int
+) -> AsyncIterator[RecipeBatchItem]:
+    """Generiert die Cache-Fehlschläge eines Batches mit höchstens `max_concurrency` parallelen LLM-Aufrufen"""
+    async for position, result, seconds in RecipeAssistant.get_instance().predict_batch(
+        [request.ingredients[index] for index in pending],
+        temperature=request.temperature,
+        timeout=RECIPE_TIMEOUT,
+        max_concurrency=max_concurrency,
+    ):
+        index: int = pending[position]
+        if isinstance(result, RecipeResult):
+            await store_recipe(request.ingredients[index], cache_keys[index], result, latency=seconds)
+            yield RecipeBatchItem(
+                index=index,
+                ingredients=request.ingredients[index],
+                recipe=result,
+                markdown=format_recipe_as_markdown(result),
+            )
+        else:
+            logger.warning("🍳 Batch item {} failed: {}", index, result)
+            yield RecipeBatchItem(index=index, ingredients=request.ingredients[index], error=str(result))
+
+
+async def stream_recipe_markdown(
+    recipe_assistant: RecipeAssistant, ingredients: str, temperature: float, cache_key: str
+) -> AsyncIterator[dict[str, Any] | RecipeResult]:
+    """Liefert Teilergebnisse der laufenden Generierung und zum Schluss das validierte Rezept.
+
+    Die Generierung läuft über den Single-Flight-Layer: Der erste Aufrufer erhält die Teilergebnisse,
+    spätere Aufrufer mit demselben Schlüssel nur das fertige Rezept.
+    """
+    partial_recipes: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue()
+
+    async def generate_recipe() -> RecipeResult:
+        started_at: float = time.perf_counter()
+        partial_recipe: dict[str, Any] = {}
+        try:
+            async for partial_recipe in recipe_assistant.astream_predict(
+                ingredients=ingredients, temperature=temperature, timeout=RECIPE_TIMEOUT
+            ):
+                partial_recipes.put_nowait(partial_recipe)
+        finally:
+            partial_recipes.put_nowait(None)
+        result: RecipeResult = RecipeResult.model_validate(partial_recipe)
+        await store_recipe(ingredients, cache_key, result, latency=time.perf_counter() - started_at)
+        return result
+
+    shared: asyncio.Future[RecipeResult] = asyncio.ensure_future(RECIPE_SINGLE_FLIGHT.do(cache_key, generate_recipe))
+    shared.add_done_callback(lambda _: partial_recipes.put_nowait(None))
+    try:
+        while (partial_recipe := await partial_recipes.get()) is not None:
+            yield partial_recipe
+        yield await shared
+    finally:
+        if not shared.done():
+            shared.cancel()
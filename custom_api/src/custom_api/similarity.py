@@ -0,0 +1,257 @@
+import fcntl
+import json
+import math
+import os
+import time
+import zlib
+from collections import Counter
+from typing import Any, Callable, Generic, NamedTuple, TypeVar
+
+import numpy as np
+from loguru import logger
+from pydantic import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+MAGIC: int = 0x52454349  # "RECI"
+VERSION: int = 1
+HEADER_FIELDS: int = 8  # magic, version, dim, capacity, payload_size, sequence, reserved, reserved
+
+
+class HashingVectorizer:
+    """Bildet Text lokal auf einen L2-normierten Vektor fester Länge ab (Feature Hashing).
+
+    Features sind die Tokens aus `tokenize` sowie deren Zeichen-Trigramme (geringer gewichtet), damit
+    auch Schreibvarianten wie "Tomate"/"Tomaten" ähnlich sind. Gewichtet wird sublinear (1 + log tf),
+    das Vorzeichen stammt aus dem Hash. `zlib.crc32` ist in allen Workern stabil, anders als `hash()`.
+    """
+
+    def __init__(self, dim: int, tokenize: Callable[[str], list[str]], ngram_weight: float = 0.3) -> None:
+        self.dim: int = dim
+        self.tokenize: Callable[[str], list[str]] = tokenize
+        self.ngram_weight: float = ngram_weight
+
+    def features(self, text: str) -> dict[str, float]:
+        weights: dict[str, float] = {}
+        for token, count in Counter(self.tokenize(text)).items():
+            weights[f"w:{token}"] = 1.0 + math.log(count)
+            padded: str = f" {token} "
+            for start in range(len(padded) - 2):
+                feature: str = f"c:{padded[start:start + 3]}"
+                weights[feature] = weights.get(feature, 0.0) + self.ngram_weight
+        return weights
+
+    def sparse(self, text: str) -> tuple[np.ndarray, np.ndarray]:
+        """Indizes und Werte der Nicht-Null-Einträge des normierten Vektors"""
+        values: dict[int, float] = {}
+        for feature, weight in self.features(text).items():
+            digest: int = zlib.crc32(feature.encode("utf-8"))
+            index: int = digest % self.dim
+            values[index] = values.get(index, 0.0) + (weight if digest & 0x80000000 else -weight)
+        indices: np.ndarray = np.fromiter(values.keys(), dtype=np.int64, count=len(values))
+        data: np.ndarray = np.fromiter(values.values(), dtype=np.float32, count=len(values))
+        norm: float = float(np.linalg.norm(data))
+        return indices, data / norm if norm > 0 else data
+
+    def dense(self, text: str) -> np.ndarray:
+        vector: np.ndarray = np.zeros(self.dim, dtype=np.float32)
+        indices, data = self.sparse(text)
+        vector[indices] = data
+        return vector
+
+
+class SimilarMatch(NamedTuple, Generic[ModelT]):
+    result: ModelT
+    similarity: float
+    text: str
+
+
+class SimilarityIndex(Generic[ModelT]):
+    """Vektorindex früherer Ergebnisse in einer per `mmap` geteilten Datei.
+
+    Layout: Header, Vektoren (float32, dim x capacity), Sequenznummern, letzte Nutzung und
+    JSON-Payloads fester Maximalgröße. Alle Worker öffnen dieselbe Datei; Schreiber serialisieren
+    sich über `flock` auf `<path>.lock`, Leser arbeiten ohne Sperre und verwerfen Slots, deren
+    Sequenznummer sich zwischen Bewertung des Vektors und Lesen des Payloads geändert hat. Passt das
+    Layout nicht (z.B. geänderte Kapazität), wird eine neue Datei angelegt und per `os.replace`
+    ausgetauscht; Worker mit der alten Abbildung lesen bis zu ihrem Neustart ungestört weiter. Ist der Index voll, wird der am längsten nicht genutzte Slot
+    überschrieben. Datei und Sperre öffnet jeder Prozess beim ersten Zugriff selbst: Ein über `fork`
+    geerbter Deskriptor teilte die `flock`-Sperre mit dem Elternprozess.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        model: type[ModelT],
+        vectorizer: HashingVectorizer,
+        capacity: int = 2048,
+        payload_size: int = 8192,
+        threshold: float = 0.8,
+        top_k: int = 3,
+    ) -> None:
+        self.path: str = path
+        self.model: type[ModelT] = model
+        self.vectorizer: HashingVectorizer = vectorizer
+        self.dim: int = vectorizer.dim
+        self.capacity: int = max(capacity, 1)
+        self.payload_size: int = payload_size
+        self.threshold: float = threshold
+        self.top_k: int = max(top_k, 1)
+        self.hits: int = 0
+        self.misses: int = 0
+        self.inserts: int = 0
+        self.skipped: int = 0
+        self.lookup_seconds: float = 0.0
+        self._lock_file: Any = None
+        self._pid: int | None = None
+
+    def _layout(self) -> list[tuple[str, np.dtype, tuple[int, ...]]]:
+        return [
+            ("header", np.dtype(np.int64), (HEADER_FIELDS,)),
+            # Transponiert (dim x capacity), damit eine Anfrage nur die Zeilen ihrer Features liest
+            ("vectors", np.dtype(np.float32), (self.dim, self.capacity)),
+            ("sequences", np.dtype(np.int64), (self.capacity,)),
+            ("used_at", np.dtype(np.float64), (self.capacity,)),
+            ("lengths", np.dtype(np.int32), (self.capacity,)),
+            ("payloads", np.dtype(np.uint8), (self.capacity, self.payload_size)),
+        ]
+
+    def _open(self) -> None:
+        size: int = sum(dtype.itemsize * math.prod(shape) for _, dtype, shape in self._layout())
+        expected: list[int] = [MAGIC, VERSION, self.dim, self.capacity, self.payload_size]
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            with os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644), "r+b") as file:
+                raw_header: bytes = file.read(HEADER_FIELDS * 8).ljust(HEADER_FIELDS * 8, b"\0")
+                matches: bool = (
+                    os.fstat(file.fileno()).st_size == size
+                    and np.frombuffer(raw_header, dtype=np.int64)[:5].tolist() == expected
+                )
+            if not matches:
+                # Nie die abgebildete Datei anderer Worker kürzen: neue Datei anlegen und austauschen
+                logger.info(f"🔎 Lege Ähnlichkeitsindex neu an: {self.path} ({self.capacity} x {self.dim})")
+                temporary: str = f"{self.path}.{os.getpid()}.tmp"
+                with open(temporary, "wb") as file:
+                    file.truncate(size)
+                    file.write(np.array(expected + [0] * (HEADER_FIELDS - 5), dtype=np.int64).tobytes())
+                os.replace(temporary, self.path)
+            offset: int = 0
+            for name, dtype, shape in self._layout():
+                setattr(self, f"_{name}", np.memmap(self.path, dtype=dtype, mode="r+", offset=offset, shape=shape))
+                offset += dtype.itemsize * math.prod(shape)
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _ensure_open(self) -> None:
+        if self._pid == os.getpid():
+            return
+        if self._lock_file is not None:
+            self._lock_file.close()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock_file = open(f"{self.path}.lock", "a+b")
+        self._open()
+        self._pid = os.getpid()
+
+    def __len__(self) -> int:
+        self._ensure_open()
+        return int(np.count_nonzero(self._sequences))
+
+    def _read(self, slot: int, sequence: int) -> dict[str, Any] | None:
+        """Payload des Slots, sofern er seit der Bewertung (Sequenznummer `sequence`) nicht überschrieben wurde"""
+        length: int = int(self._lengths[slot])
+        if sequence == 0 or int(self._sequences[slot]) != sequence or not 0 < length <= self.payload_size:
+            return None
+        raw: bytes = self._payloads[slot, :length].tobytes()
+        if int(self._sequences[slot]) != sequence:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    def search(self, text: str) -> list[tuple[int, float, int]]:
+        """Top-k Slots nach Kosinus-Ähnlichkeit mit der Sequenznummer, unter der sie bewertet wurden.
+
+        Nutzt nur die Nicht-Null-Spalten der Anfrage.
+        """
+        self._ensure_open()
+        indices, data = self.vectorizer.sparse(text)
+        if len(indices) == 0:
+            return []
+        # Sequenznummern vor den Vektoren lesen: ändert sich eine danach, gehört die Bewertung nicht zum Payload
+        sequences: np.ndarray = np.array(self._sequences)
+        scores: np.ndarray = data @ self._vectors[indices]
+        scores[sequences == 0] = -1.0
+        k: int = min(self.top_k, self.capacity)
+        best: np.ndarray = np.argpartition(-scores, k - 1)[:k] if k < self.capacity else np.arange(self.capacity)
+        return sorted(
+            ((int(slot), float(scores[slot]), int(sequences[slot])) for slot in best if scores[slot] > 0),
+            key=lambda hit: -hit[1],
+        )
+
+    def lookup(self, text: str) -> SimilarMatch[ModelT] | None:
+        started_at: float = time.perf_counter()
+        try:
+            for slot, similarity, sequence in self.search(text):
+                if similarity < self.threshold:
+                    break
+                entry: dict[str, Any] | None = self._read(slot, sequence)
+                if entry is None:
+                    continue
+                self._used_at[slot] = time.time()
+                self.hits += 1
+                return SimilarMatch(self.model.model_validate(entry["result"]), similarity, entry["text"])
+            self.misses += 1
+            return None
+        finally:
+            self.lookup_seconds += time.perf_counter() - started_at
+
+    def add(self, text: str, result: ModelT) -> None:
+        payload: bytes = json.dumps(
+            {"text": text, "result": result.model_dump(mode="json")}, ensure_ascii=False
+        ).encode("utf-8")
+        if len(payload) > self.payload_size:
+            self.skipped += 1
+            return
+        vector: np.ndarray = self.vectorizer.dense(text)
+        self._ensure_open()
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            empty: np.ndarray = np.flatnonzero(self._sequences == 0)
+            slot: int = int(empty[0]) if len(empty) else int(np.argmin(self._used_at))
+            self._header[5] += 1
+            # Slot erst ungültig machen, dann schreiben, zuletzt die neue Sequenznummer setzen
+            self._sequences[slot] = 0
+            self._vectors[:, slot] = vector
+            self._payloads[slot, : len(payload)] = np.frombuffer(payload, dtype=np.uint8)
+            self._lengths[slot] = len(payload)
+            self._used_at[slot] = time.time()
+            self._sequences[slot] = self._header[5]
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        self.inserts += 1
+
+    def close(self) -> None:
+        if self._pid != os.getpid():
+            return
+        for name, _, _ in self._layout():
+            getattr(self, f"_{name}").flush()
+        self._lock_file.close()
+        self._lock_file = None
+        self._pid = None
+
+    def stats(self) -> dict[str, Any]:
+        lookups: int = self.hits + self.misses
+        return {
+            "path": self.path,
+            "size": len(self),
+            "capacity": self.capacity,
+            "dim": self.dim,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "inserts": self.inserts,
+            "skipped": self.skipped,
+            "mean_lookup_microseconds": round(self.lookup_seconds / lookups * 1e6, 1) if lookups else 0.0,
+        }
@@ -0,0 +1,60 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call(Generic[T]):
+    def __init__(self, task: asyncio.Task[T]) -> None:
+        self.task: asyncio.Task[T] = task
+        self.waiters: int = 0
+
+
+class SingleFlight(Generic[T]):
+    """Bündelt gleichzeitige Aufrufe mit demselben Schlüssel zu einer geteilten Ausführung.
+
+    Jeder Aufrufer wartet über `asyncio.shield` auf den geteilten Task, sodass der Abbruch eines
+    einzelnen Clients die Ausführung für die anderen nicht beendet. Erst wenn der letzte Wartende
+    abbricht, wird auch der geteilte Task abgebrochen.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, _Call[T]] = {}
+        self.executions: int = 0
+        self.coalesced: int = 0
+
+    def is_inflight(self, key: str) -> bool:
+        return key in self._calls
+
+    def _forget(self, key: str, call: _Call[T]) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def do(self, key: str, function: Callable[[], Awaitable[T]]) -> T:
+        call: _Call[T] | None = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(function()))
+            call.task.add_done_callback(lambda _, key=key, call=call: self._forget(key, call))
+            self._calls[key] = call
+            self.executions += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                # Last waiter left: stop the shared call and let new requests start a fresh one
+                self._forget(key, call)
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "inflight": len(self._calls),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
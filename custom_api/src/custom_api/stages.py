@@ -0,0 +1,90 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Awaitable, Generic, Iterator, TypeVar
+
+from jaai_hub.streaming_message import Status
+from loguru import logger
+
+T = TypeVar("T")
+
+STATUS_THRESHOLD: float = float(os.getenv("CUSTOM_API_STATUS_THRESHOLD", "0.25"))
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 1:
+        return f"{seconds * 1000:.0f} ms"
+    return f"{seconds:.1f} s"
+
+
+class Stage(Generic[T]):
+    """Eine asynchrone Stufe, die ihren Status nur meldet, wenn sie länger als der Schwellwert dauert"""
+
+    def __init__(self, pipeline: "StagePipeline", name: str, status_text: str) -> None:
+        self.pipeline: StagePipeline = pipeline
+        self.name: str = name
+        self.status_text: str = status_text
+        self.result: T
+
+    async def run(self, awaitable: Awaitable[T]) -> AsyncIterator[Status]:
+        """Führt `awaitable` aus und liefert ggf. den Status; das Ergebnis steht danach in `result`"""
+        task: asyncio.Future[T] = asyncio.ensure_future(awaitable)
+        with self.pipeline.measure(self.name):
+            try:
+                done, _ = await asyncio.wait({task}, timeout=self.pipeline.threshold)
+                if not done:
+                    yield Status(type="basic", text=self.status_text)
+                self.result = await task
+            finally:
+                if not task.done():
+                    task.cancel()
+
+
+class StagePipeline:
+    """Misst Stufen eines Streaming-Workflows und meldet Status nur für tatsächlich langsame Stufen.
+
+    Die gemessenen Zeiten werden an den abschließenden `Status(type="complete")` angehängt.
+    """
+
+    def __init__(self, threshold: float | None = None) -> None:
+        self.threshold: float = STATUS_THRESHOLD if threshold is None else threshold
+        self.timings: dict[str, float] = {}
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        """Misst synchrone oder wiederholte Abschnitte einer Stufe; mehrere Abschnitte werden summiert"""
+        started_at: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed: float = time.perf_counter() - started_at
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            logger.debug(f"⏱️ Stage {name} took {format_duration(elapsed)}")
+
+    def stage(self, name: str, status_text: str) -> Stage:
+        return Stage(self, name, status_text)
+
+    async def stream(self, name: str, status_text: str, items: AsyncIterator[T]) -> AsyncIterator[Status | T]:
+        """Reicht `items` durch und meldet den Status, falls das erste Element länger als der Schwellwert braucht"""
+        with self.measure(name):
+            first_item: asyncio.Future[T] = asyncio.ensure_future(anext(items))
+            try:
+                done, _ = await asyncio.wait({first_item}, timeout=self.threshold)
+                if not done:
+                    yield Status(type="basic", text=status_text)
+                try:
+                    yield await first_item
+                except StopAsyncIteration:
+                    return
+            finally:
+                if not first_item.done():
+                    first_item.cancel()
+            async for item in items:
+                yield item
+
+    def summary(self) -> str:
+        return " · ".join(f"{name} {format_duration(seconds)}" for name, seconds in self.timings.items())
+
+    def complete(self, text: str) -> Status:
+        return Status(type="complete", text=f"{text} ({self.summary()})" if self.timings else text)
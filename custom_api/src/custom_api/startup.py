@@ -0,0 +1,123 @@
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Any
+
+import click
+import httpx
+from loguru import logger
+
+from custom_api.metrics import Gauge
+
+STARTUP_PHASE_SECONDS: Gauge = Gauge(
+    "startup_phase_seconds",
+    "Sekunden seit Prozessstart bis zum Erreichen einer Startphase (langsamster Worker)",
+    ("phase",),
+    merge="max",
+)
+IMPORT_TIME_LINE: re.Pattern[str] = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(\s*)(\S+)")
+
+
+def process_age() -> float:
+    """Sekunden seit dem Start des Prozesses (inkl. Interpreter-Start); 0, wenn `/proc` fehlt"""
+    try:
+        with open("/proc/self/stat") as stat:
+            fields: list[str] = stat.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as uptime:
+            uptime_seconds: float = float(uptime.read().split()[0])
+        return max(uptime_seconds - int(fields[19]) / os.sysconf("SC_CLK_TCK"), 0.0)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class StartupProfile:
+    """Zeitpunkte der Startphasen relativ zum Prozessstart: Imports, Lifespan, Warm-up und erster /health"""
+
+    def __init__(self) -> None:
+        self.started_at: float = time.perf_counter() - process_age()
+        self.phases: dict[str, float] = {}
+        self.healthy: bool = False
+
+    def mark(self, phase: str) -> float:
+        elapsed: float = time.perf_counter() - self.started_at
+        self.phases.setdefault(phase, elapsed)
+        STARTUP_PHASE_SECONDS.labels(phase).set(self.phases[phase])
+        return self.phases[phase]
+
+    def mark_healthy(self) -> None:
+        if not self.healthy:
+            self.healthy = True
+            logger.info(f"⏱️ Erster erfolgreicher /health nach {self.mark('first_health'):.2f}s")
+
+    def stats(self) -> dict[str, Any]:
+        return {"phases": dict(sorted(self.phases.items(), key=lambda phase: phase[1])), "healthy": self.healthy}
+
+
+STARTUP: StartupProfile = StartupProfile()
+
+
+def profile_imports(module: str) -> dict[str, float]:
+    """Importiert `module` in einem frischen Interpreter mit `-X importtime`.
+
+    Liefert die Eigenzeit in Sekunden pro Top-Level-Paket, absteigend sortiert; die Summe entspricht
+    der gesamten Importzeit.
+    """
+    result: subprocess.CompletedProcess[str] = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    totals: defaultdict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        match: re.Match[str] | None = IMPORT_TIME_LINE.match(line)
+        if match:
+            totals[match.group(4).split(".", 1)[0]] += int(match.group(1)) / 1_000_000
+    return dict(sorted(totals.items(), key=lambda total: total[1], reverse=True))
+
+
+def measure_first_health(command: list[str], port_env: str, timeout: float = 60.0) -> float:
+    """Startet den Server auf einem freien Port und misst die Zeit bis zur ersten erfolgreichen /health-Antwort"""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port: int = probe.getsockname()[1]
+    started_at: float = time.perf_counter()
+    process: subprocess.Popen[bytes] = subprocess.Popen(
+        command, env={**os.environ, port_env: str(port)}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while time.perf_counter() - started_at < timeout:
+                if process.poll() is not None:
+                    raise RuntimeError(f"Server beendet mit Code {process.returncode}")
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/health").is_success:
+                        return time.perf_counter() - started_at
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.02)
+        raise TimeoutError(f"Kein erfolgreicher /health innerhalb von {timeout:.0f}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@click.command()
+@click.option("--module", default="custom_api.main", show_default=True, help="Zu profilierendes Modul")
+@click.option("--top", default=15, show_default=True, help="Anzahl der angezeigten Pakete")
+@click.option("--health/--no-health", default=True, show_default=True, help="Zeit bis zum ersten /health messen")
+def profile_startup_cli(module: str, top: int, health: bool) -> None:
+    """Gibt die Importzeit pro Paket und die Zeit bis zum ersten erfolgreichen /health aus"""
+    imports: dict[str, float] = profile_imports(module)
+    print(f"Importzeit {module}: {sum(imports.values()):.3f}s")
+    for package, seconds in list(imports.items())[:top]:
+        print(f"  {package:<32} {seconds:8.3f}s")
+    if health:
+        first_health: float = measure_first_health(
+            [sys.executable, "-c", "from custom_api.main import main; main()"], "CUSTOM_API_PORT"
+        )
+        print(f"Zeit bis zum ersten erfolgreichen /health: {first_health:.3f}s")
@@ -0,0 +1,105 @@
+import asyncio
+
+import httpx
+import pytest
+
+from custom_api.admission import AdmissionController, AdmissionRejected, Ticket
+
+
+async def drain(ticket: Ticket) -> None:
+    async for _ in ticket.wait():
+        pass
+
+
+def test_waiting_tickets_are_admitted_in_fifo_order() -> None:
+    async def scenario() -> list[str]:
+        controller: AdmissionController = AdmissionController(max_concurrency=1, max_per_user=4, max_queue=8)
+        running: Ticket = controller.enter("alice")
+        assert running.granted
+        waiting: list[Ticket] = [controller.enter(user) for user in ("bob", "carol", "dave")]
+        assert [ticket.position for ticket in waiting] == [1, 2, 3]
+
+        order: list[str] = []
+
+        async def run(ticket: Ticket) -> None:
+            await drain(ticket)
+            order.append(ticket.user)
+            await asyncio.sleep(0)
+            ticket.release()
+
+        tasks: list[asyncio.Task[None]] = [asyncio.create_task(run(ticket)) for ticket in waiting]
+        await asyncio.sleep(0)
+        running.release()
+        await asyncio.gather(*tasks)
+        assert controller.in_flight == 0 and controller.queue_depth == 0
+        return order
+
+    assert asyncio.run(scenario()) == ["bob", "carol", "dave"]
+
+
+def test_per_user_limit_does_not_block_other_users() -> None:
+    async def scenario() -> None:
+        controller: AdmissionController = AdmissionController(max_concurrency=4, max_per_user=1, max_queue=8)
+        first: Ticket = controller.enter("alice")
+        second: Ticket = controller.enter("alice")
+        other: Ticket = controller.enter("bob")
+        assert first.granted and not second.granted and other.granted
+        # Eine neue Anfrage überholt keine wartende desselben Benutzers
+        assert controller.try_enter("alice") is None
+
+        first.release()
+        await asyncio.wait_for(drain(second), timeout=1)
+        assert second.granted
+        second.release()
+        other.release()
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_with_retry_after() -> None:
+    controller: AdmissionController = AdmissionController(max_concurrency=1, max_per_user=1, max_queue=1)
+    controller.enter("alice")
+    controller.enter("alice")
+    with pytest.raises(AdmissionRejected) as rejection:
+        controller.enter("alice")
+    assert rejection.value.retry_after >= 1
+    assert controller.rejected == 1
+
+
+def test_queue_timeout_releases_the_ticket() -> None:
+    async def scenario() -> None:
+        controller: AdmissionController = AdmissionController(max_concurrency=1, max_queue=4, queue_timeout=0.05)
+        controller.enter("alice")
+        waiting: Ticket = controller.enter("bob")
+        with pytest.raises(AdmissionRejected):
+            await drain(waiting)
+        assert controller.queue_depth == 0 and controller.timed_out == 1
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_chat_completion_returns_429_when_admission_is_full(monkeypatch: pytest.MonkeyPatch, stream: bool) -> None:
+    monkeypatch.setenv("CUSTOM_API_USER", "user")
+    monkeypatch.setenv("CUSTOM_API_PASSWORD", "secret")
+    from custom_api.main import app
+    from custom_api.routers import recipe
+
+    controller: AdmissionController = AdmissionController(max_concurrency=1, max_per_user=1, max_queue=0)
+    monkeypatch.setattr(recipe, "ADMISSION", controller)
+    held: Ticket = controller.enter("user")
+
+    async def scenario() -> httpx.Response:
+        transport: httpx.ASGITransport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", auth=("user", "secret")) as client:
+            return await client.post(
+                "/chat/completions",
+                json={"model": "recipe", "stream": stream, "messages": [{"role": "user", "content": "Linsen, Möhren"}]},
+            )
+
+    response: httpx.Response = asyncio.run(scenario())
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    held.release()
+    assert controller.in_flight == 0 and controller.queue_depth == 0
@@ -0,0 +1,75 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from custom_api.metrics import Counter, Gauge, Histogram, Registry, SharedMetrics
+
+
+def create_metrics(registry: Registry) -> tuple[Counter, Gauge, Gauge, Histogram]:
+    return (
+        Counter("requests_total", "Anfragen", ("route",), registry=registry),
+        Gauge("in_progress", "Laufende Anfragen", registry=registry),
+        Gauge("loop_lag_seconds", "Verzögerung", registry=registry, merge="max"),
+        Histogram("duration_seconds", "Dauer", buckets=(0.1, 1.0), registry=registry),
+    )
+
+
+def sample(text: str, name: str) -> float:
+    return next(float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith(name + " "))
+
+
+def test_render_merges_snapshots_of_other_workers(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("TEST_METRICS_DIR", str(tmp_path))
+    own: Registry = Registry()
+    requests, in_progress, lag, duration = create_metrics(own)
+    requests.labels("/a").inc(2)
+    in_progress.set(3)
+    lag.set(0.1)
+    duration.observe(0.05)
+
+    other: Registry = Registry()
+    other_requests, other_in_progress, other_lag, other_duration = create_metrics(other)
+    other_requests.labels("/a").inc(5)
+    other_requests.labels("/b").inc(1)
+    other_in_progress.set(2)
+    other_lag.set(0.4)
+    other_duration.observe(0.5)
+    # Der Elternprozess lebt, sein Snapshot gilt als der eines anderen Workers
+    (tmp_path / f"{os.getppid()}.json").write_text(json.dumps(other.collect()))
+
+    text: str = asyncio.run(SharedMetrics(own, "TEST").render())
+    assert sample(text, 'requests_total{route="/a"}') == 7
+    assert sample(text, 'requests_total{route="/b"}') == 1
+    assert sample(text, "in_progress") == 5
+    assert sample(text, "loop_lag_seconds") == 0.4
+    assert sample(text, "duration_seconds_count") == 2
+    assert sample(text, 'duration_seconds_bucket{le="0.1"}') == 1
+    assert (tmp_path / f"{os.getpid()}.json").exists()
+
+
+def test_snapshots_of_dead_and_stale_workers_are_ignored(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("TEST_METRICS_DIR", str(tmp_path))
+    own: Registry = Registry()
+    requests, *_ = create_metrics(own)
+    requests.labels("/a").inc()
+
+    other: Registry = Registry()
+    other_requests, *_ = create_metrics(other)
+    other_requests.labels("/a").inc(10)
+    finished: subprocess.Popen = subprocess.Popen([sys.executable, "-c", "pass"])
+    finished.wait()
+    dead: Path = tmp_path / f"{finished.pid}.json"
+    dead.write_text(json.dumps(other.collect()))
+    stale: Path = tmp_path / f"{os.getppid()}.json"
+    stale.write_text(json.dumps(other.collect()))
+    os.utime(stale, (0, 0))
+
+    text: str = asyncio.run(SharedMetrics(own, "TEST").render())
+    assert sample(text, 'requests_total{route="/a"}') == 1
+    assert not dead.exists()
+    assert stale.exists()
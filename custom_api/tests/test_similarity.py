@@ -0,0 +1,54 @@
+import os
+from pathlib import Path
+
+import pytest
+from pydantic import BaseModel
+
+pytest.importorskip("numpy")
+
+from custom_api.similarity import HashingVectorizer, SimilarityIndex  # noqa: E402
+
+
+class Result(BaseModel):
+    value: str
+
+
+def create_index(path: Path, capacity: int = 4) -> SimilarityIndex[Result]:
+    vectorizer: HashingVectorizer = HashingVectorizer(256, lambda text: text.lower().split())
+    return SimilarityIndex(str(path), Result, vectorizer, capacity=capacity, threshold=0.5)
+
+
+def test_lookup_finds_similar_entry(tmp_path: Path) -> None:
+    index: SimilarityIndex[Result] = create_index(tmp_path / "index.bin")
+    index.add("pasta tomaten basilikum", Result(value="pasta"))
+    match = index.lookup("tomaten pasta basilikum")
+    assert match is not None and match.result.value == "pasta"
+    assert index.lookup("reis erbsen") is None
+
+
+def test_slot_rewritten_after_scoring_is_not_returned(tmp_path: Path) -> None:
+    index: SimilarityIndex[Result] = create_index(tmp_path / "index.bin")
+    index.add("pasta tomaten", Result(value="pasta"))
+    [(slot, _, sequence)] = index.search("pasta tomaten")
+    assert index._read(slot, sequence) is not None
+
+    # Ein Schreiber überschreibt den Slot zwischen Bewertung und Lesen des Payloads
+    index._sequences[slot] = 0
+    assert index._read(slot, sequence) is None
+    index._sequences[slot] = sequence + 1
+    assert index._read(slot, sequence) is None
+
+
+def test_layout_change_replaces_file_without_truncating_mapped_one(tmp_path: Path) -> None:
+    path: Path = tmp_path / "index.bin"
+    old: SimilarityIndex[Result] = create_index(path, capacity=4)
+    old.add("pasta tomaten", Result(value="pasta"))
+    inode: int = os.stat(path).st_ino
+
+    new: SimilarityIndex[Result] = create_index(path, capacity=8)
+    assert len(new) == 0
+    assert os.stat(path).st_ino != inode
+    # Worker mit der alten Abbildung lesen weiter ihre (nun unverlinkte) Datei
+    match = old.lookup("pasta tomaten")
+    assert match is not None and match.result.value == "pasta"
+    assert sorted(entry.name for entry in tmp_path.iterdir()) == ["index.bin", "index.bin.lock"]
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from custom_api.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution() -> None:
+    async def scenario() -> None:
+        flight: SingleFlight[int] = SingleFlight()
+        calls: int = 0
+
+        async def compute() -> int:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return 42
+
+        results: list[int] = await asyncio.gather(*(flight.do("key", compute) for _ in range(5)))
+        assert results == [42] * 5
+        assert calls == 1
+        assert flight.stats() == {"inflight": 0, "executions": 1, "coalesced": 4}
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call() -> None:
+    async def scenario() -> None:
+        flight: SingleFlight[str] = SingleFlight()
+        release: asyncio.Event = asyncio.Event()
+        cancelled: bool = False
+
+        async def compute() -> str:
+            nonlocal cancelled
+            try:
+                await release.wait()
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            return "done"
+
+        leaving: asyncio.Task[str] = asyncio.create_task(flight.do("key", compute))
+        staying: asyncio.Task[str] = asyncio.create_task(flight.do("key", compute))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        assert flight.is_inflight("key")
+
+        release.set()
+        assert await staying == "done"
+        assert not cancelled
+
+    asyncio.run(scenario())
+
+
+def test_last_waiter_leaving_cancels_the_shared_call() -> None:
+    async def scenario() -> None:
+        flight: SingleFlight[str] = SingleFlight()
+        started: asyncio.Event = asyncio.Event()
+        cancelled: asyncio.Event = asyncio.Event()
+
+        async def compute() -> str:
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "never"
+
+        waiters: list[asyncio.Task[str]] = [asyncio.create_task(flight.do("key", compute)) for _ in range(2)]
+        await started.wait()
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        assert not flight.is_inflight("key")
+
+        async def fresh() -> str:
+            return "fresh"
+
+        # Nach dem Abbruch startet eine neue Anfrage eine eigene Ausführung
+        assert await flight.do("key", fresh) == "fresh"
+        assert flight.executions == 2
+
+    asyncio.run(scenario())
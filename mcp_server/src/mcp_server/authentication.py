@@ -2,15 +2,21 @@ import base64
 import logging
 import os
 import secrets
+import time
 
 import click
 from dotenv import load_dotenv
 from loguru import logger
 from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import Response
 
+from mcp_server.credential_cache import CredentialCache, PasswordHash
+from mcp_server.logs import SAMPLED_LOGGER
+from mcp_server.metrics import Histogram
+
 logging.getLogger("passlib").setLevel(logging.ERROR)
 load_dotenv()
 
@@ -30,23 +36,41 @@ def hash_password(password: str, show_hashed_password: bool = False) -> str:
 
 ### Simple Basic Auth Middleware ###
 PWD_CONTEXT: CryptContext = CryptContext(schemes=["bcrypt"], deprecated="auto")
+CREDENTIAL_CACHE: CredentialCache = CredentialCache(
+    max_size=int(os.getenv("MCP_AUTH_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("MCP_AUTH_CACHE_TTL", "300")),
+)
+AUTH_VERIFICATION_SECONDS: Histogram = Histogram(
+    "auth_verification_seconds", "Dauer der Basic-Auth-Prüfung nach Ergebnis", ("result",)
+)
 
 
 class BasicAuthMiddleware(BaseHTTPMiddleware):
+    PUBLIC_PATHS: frozenset[str] = frozenset({"/health"})
+
     def __init__(self, app) -> None:
         super().__init__(app)
-        self.username: str = os.getenv("MCP_USER", "admin")
-        self.hashed_password: str = hash_password(password=os.getenv("MCP_PASSWORD", ""))
+        # Beim Start berechnet und bei geändertem MCP_PASSWORD neu erzeugt
+        self.password_hash: PasswordHash = PasswordHash("MCP_PASSWORD", hash_password)
+        self.password_hash.get()
+
+    @property
+    def username(self) -> str:
+        return os.getenv("MCP_USER", "admin")
 
     def _verify_user(self, username: str) -> bool:
         return not self.username or secrets.compare_digest(username, self.username)
 
     def _verify_password(self, plain_password: str) -> bool:
-        if not self.hashed_password:
+        hashed_password: str = self.password_hash.get()
+        if not hashed_password:
             return True
-        return PWD_CONTEXT.verify(plain_password, self.hashed_password)
+        return PWD_CONTEXT.verify(plain_password, hashed_password)
 
     async def dispatch(self, request: Request, call_next) -> Response:
+        if request.url.path in self.PUBLIC_PATHS:
+            return await call_next(request)
+        started_at: float = time.perf_counter()
         auth_header: str = request.headers.get("Authorization", "")
         if not auth_header.startswith("Basic "):
             logger.warning("🔒 Kein Basic Auth Header")
@@ -60,14 +84,23 @@ class BasicAuthMiddleware(BaseHTTPMiddleware):
             encoded: str = auth_header.split(" ", 1)[1]
             decoded: str = base64.b64decode(encoded).decode("utf-8")
             username, password = decoded.split(":", 1)
-            if self._verify_user(username) and self._verify_password(password):
-                logger.info(f"✅ Basic Auth OK: {username}")
+            # Fingerprint aus aktuell konfiguriertem Benutzer und Passwort-Hash
+            fingerprint: str = f"{self.username}\x00{await self.password_hash.aget()}"
+            if CREDENTIAL_CACHE.contains(auth_header, fingerprint):
+                AUTH_VERIFICATION_SECONDS.labels("cached").observe(time.perf_counter() - started_at)
+                request.state.user = username
+                return await call_next(request)
+            if self._verify_user(username) and await run_in_threadpool(self._verify_password, password):
+                SAMPLED_LOGGER.info("✅ Basic Auth OK: {}", username)
+                CREDENTIAL_CACHE.add(auth_header, fingerprint)
+                AUTH_VERIFICATION_SECONDS.labels("verified").observe(time.perf_counter() - started_at)
                 request.state.user = username
                 return await call_next(request)
             else:
                 logger.warning(f"🔒 Falsche Credentials: {username}")
         except Exception as e:
             logger.warning(f"🔒 Basic Auth Error: {e}")
+        AUTH_VERIFICATION_SECONDS.labels("rejected").observe(time.perf_counter() - started_at)
         return Response(
             content="Invalid credentials", status_code=401, headers={"WWW-Authenticate": 'Basic realm="MCP Server"'}
         )
@@ -0,0 +1,102 @@
+import os
+import time
+from collections import deque
+from enum import Enum
+from typing import Any
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Der Host gilt als gestört und es gibt keine zwischengespeicherte Antwort"""
+
+    def __init__(self, host: str, retry_after: float) -> None:
+        super().__init__(f"{host} ist vorübergehend nicht erreichbar, neuer Versuch in {retry_after:.0f}s")
+        self.host: str = host
+        self.retry_after: float = retry_after
+
+
+class CircuitBreaker:
+    """Circuit Breaker pro Host über ein gleitendes Fenster der letzten Aufrufe.
+
+    Fehler und Aufrufe langsamer als `slow_call_seconds` zählen als Fehlschlag. Übersteigt deren Anteil
+    `error_rate` (bei mindestens `min_calls` Aufrufen), öffnet der Breaker für `open_seconds`. Danach
+    darf genau ein Probe-Aufruf (half-open) entscheiden, ob wieder geschlossen oder erneut geöffnet wird.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        window: int = 20,
+        min_calls: int = 5,
+        error_rate: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        open_seconds: float = 30.0,
+    ) -> None:
+        self.host: str = host
+        self.min_calls: int = min_calls
+        self.error_rate: float = error_rate
+        self.slow_call_seconds: float = slow_call_seconds
+        self.open_seconds: float = open_seconds
+        self.state: CircuitState = CircuitState.CLOSED
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._opened_at: float = 0.0
+        self.opened: int = 0
+        self.probes: int = 0
+
+    @classmethod
+    def from_env(cls, host: str) -> "CircuitBreaker":
+        return cls(
+            host=host,
+            window=int(os.getenv("MCP_BREAKER_WINDOW", "20")),
+            min_calls=int(os.getenv("MCP_BREAKER_MIN_CALLS", "5")),
+            error_rate=float(os.getenv("MCP_BREAKER_ERROR_RATE", "0.5")),
+            slow_call_seconds=float(os.getenv("MCP_BREAKER_SLOW_CALL", "5")),
+            open_seconds=float(os.getenv("MCP_BREAKER_OPEN_SECONDS", "30")),
+        )
+
+    @property
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def try_acquire_probe(self) -> bool:
+        """Wechselt nach Ablauf der Sperrzeit nach half-open; nur der erste Aufrufer erhält die Probe"""
+        if self.state is CircuitState.OPEN and self.retry_after <= 0:
+            self.state = CircuitState.HALF_OPEN
+            self.probes += 1
+            return True
+        return False
+
+    def record(self, success: bool, latency: float, probe: bool = False) -> None:
+        failed: bool = not success or latency > self.slow_call_seconds
+        if probe:
+            if failed:
+                self._open()
+            else:
+                self.state = CircuitState.CLOSED
+                self._outcomes.clear()
+            return
+        if self.state is not CircuitState.CLOSED:
+            return
+        self._outcomes.append(failed)
+        if len(self._outcomes) >= self.min_calls and sum(self._outcomes) / len(self._outcomes) >= self.error_rate:
+            self._open()
+
+    def _open(self) -> None:
+        self.state = CircuitState.OPEN
+        self._opened_at = time.monotonic()
+        self.opened += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "failure_rate": sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0,
+            "calls_in_window": len(self._outcomes),
+            "retry_after": round(self.retry_after, 1) if self.state is CircuitState.OPEN else 0.0,
+            "opened": self.opened,
+            "probes": self.probes,
+        }
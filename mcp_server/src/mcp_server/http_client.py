@@ -0,0 +1,121 @@
+import asyncio
+import importlib.util
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+from urllib.parse import urlsplit
+
+import httpx
+from loguru import logger
+
+from mcp_server.http_transport import CountingTransport
+
+
+def _parse_host_timeouts(value: str) -> dict[str, float]:
+    """Parst 'host=sekunden,host=sekunden' in ein Dict"""
+    timeouts: dict[str, float] = {}
+    for item in value.split(","):
+        host, _, seconds = item.strip().partition("=")
+        if host and seconds:
+            timeouts[host.strip()] = float(seconds)
+    return timeouts
+
+
+class HttpClientPool:
+    """Langlebiger, geteilter httpx.AsyncClient für alle externen API-Aufrufe.
+
+    Der Client wird beim ersten `lifespan()` erstellt und beim letzten wieder geschlossen,
+    sodass Verbindungen (TCP + TLS) zwischen Tool-Aufrufen wiederverwendet werden.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 30.0,
+        host_timeouts: dict[str, float] | None = None,
+        http2: bool = False,
+    ) -> None:
+        self.limits: httpx.Limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout: float = timeout
+        self.host_timeouts: dict[str, float] = host_timeouts or {}
+        self.http2: bool = http2 and importlib.util.find_spec("h2") is not None
+        if http2 and not self.http2:
+            logger.warning("🌐 HTTP/2 angefordert, aber 'h2' ist nicht installiert - nutze HTTP/1.1")
+
+        self._client: httpx.AsyncClient | None = None
+        self._transport: CountingTransport | None = None
+        self._users: int = 0
+        self._lock: asyncio.Lock = asyncio.Lock()
+        self.requests: int = 0
+        self.new_connections: int = 0
+
+    @classmethod
+    def from_env(cls) -> "HttpClientPool":
+        return cls(
+            max_connections=int(os.getenv("MCP_HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("MCP_HTTP_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("MCP_HTTP_KEEPALIVE_EXPIRY", "30")),
+            timeout=float(os.getenv("MCP_HTTP_TIMEOUT", "30")),
+            host_timeouts=_parse_host_timeouts(os.getenv("MCP_HTTP_HOST_TIMEOUTS", "")),
+            http2=os.getenv("MCP_HTTP2", "false").lower() == "true",
+        )
+
+    @asynccontextmanager
+    async def lifespan(self) -> AsyncIterator[httpx.AsyncClient]:
+        async with self._lock:
+            if self._client is None:
+                self._client = self._create_client()
+                logger.info(f"🌐 HTTP Client Pool gestartet (HTTP/2: {self.http2})")
+            self._users += 1
+        try:
+            yield self._client
+        finally:
+            async with self._lock:
+                self._users -= 1
+                if self._users == 0 and self._client is not None:
+                    await self._client.aclose()
+                    self._client = None
+                    self._transport = None
+                    logger.info("🌐 HTTP Client Pool geschlossen")
+
+    def _create_client(self) -> httpx.AsyncClient:
+        self._transport = CountingTransport.create(self.limits, http2=self.http2)
+        return httpx.AsyncClient(transport=self._transport, timeout=self.timeout)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Fallback für Aufrufe außerhalb des Server-Lifespans (z.B. Skripte)
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    async def _trace(self, event_name: str, _: dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connections += 1
+
+    async def get(self, url: str) -> httpx.Response:
+        host: str = urlsplit(url).hostname or ""
+        self.requests += 1
+        return await self._get_client().get(
+            url,
+            timeout=self.host_timeouts.get(host, self.timeout),
+            extensions={"trace": self._trace},
+        )
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_ratio": 1 - self.new_connections / self.requests if self.requests else 0.0,
+            "in_use_connections": self._transport.in_use if self._transport is not None else 0,
+            "max_connections": self.limits.max_connections,
+            "http2": self.http2,
+        }
+
+
+HTTP_CLIENT_POOL: HttpClientPool = HttpClientPool.from_env()
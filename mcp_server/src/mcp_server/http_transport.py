@@ -0,0 +1,71 @@
+# Gemeinsames Modul beider Services: Änderungen auch im Schwesterpaket nachziehen (scripts/check_shared_modules.py)
+from typing import Any, AsyncIterator, Callable
+
+import httpx
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Antwort-Body, der beim Schließen genau einmal `release` aufruft"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]) -> None:
+        self._stream: httpx.AsyncByteStream = stream
+        self._release: Callable[[], None] | None = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class CountingTransport(httpx.AsyncBaseTransport):
+    """Transport-Hülle, die belegte Verbindungen über die öffentliche Transport-API von httpx zählt.
+
+    Eine Verbindung gilt ab dem Senden der Anfrage bis zum Schließen des Antwort-Bodys als belegt;
+    bei HTTP/2 zählt jeder Stream einzeln. Ersetzt das Auslesen des privaten httpcore-Pools.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, max_connections: int | None = None) -> None:
+        self.transport: httpx.AsyncBaseTransport = transport
+        self.max_connections: int | None = max_connections
+        self.in_use: int = 0
+        self.requests: int = 0
+
+    @classmethod
+    def create(cls, limits: httpx.Limits, http2: bool = False) -> "CountingTransport":
+        return cls(httpx.AsyncHTTPTransport(limits=limits, http2=http2), max_connections=limits.max_connections)
+
+    def _release(self) -> None:
+        self.in_use -= 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.in_use += 1
+        self.requests += 1
+        try:
+            response: httpx.Response = await self.transport.handle_async_request(request)
+        except BaseException:
+            self._release()
+            raise
+        stream: Any = response.stream
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(stream, self._release),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+    def stats(self) -> dict[str, int | bool | None]:
+        return {
+            "in_use_connections": self.in_use,
+            "max_connections": self.max_connections,
+            "saturated": self.max_connections is not None and self.in_use >= self.max_connections,
+        }
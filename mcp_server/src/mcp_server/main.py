@@ -1,15 +1,82 @@
+import asyncio
 import os
-from typing import Any
+import time
+from contextlib import asynccontextmanager
+from typing import Annotated, Any, AsyncIterator, Awaitable
 
 from fastmcp import FastMCP
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import CallNext, Middleware, MiddlewareContext
 from loguru import logger
+from pydantic import Field
+from starlette.applications import Starlette
 from starlette.requests import Request
-from starlette.responses import PlainTextResponse
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Mount
 
 from mcp_server.authentication import BasicAuthMiddleware
-from mcp_server.utils import call_external_api
+from mcp_server.http_client import HTTP_CLIENT_POOL
+from mcp_server.logs import SAMPLED_LOGGER, QueueLogSink, configure_logging
+from mcp_server.loop_monitor import LoadSheddingMiddleware, LoopLagMonitor, is_tool_call
+from mcp_server.metrics import (
+    CONTENT_TYPE,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsMiddleware,
+    SharedMetrics,
+)
+from mcp_server.prefetch import PrefetchBuffer, run_prefetchers
+from mcp_server.server import run
+from mcp_server.utils import (
+    ApiResponse,
+    call_external_api,
+    format_stale_hint,
+    upstream_stats,
+)
 
-mcp: FastMCP = FastMCP(name="Externe APIs MCP Server")
+# Loguru über einen nicht blockierenden Queue-Sink, formatiert und geschrieben von einem Hintergrund-Thread
+LOG_SINK: QueueLogSink = configure_logging("MCP")
+
+
+@asynccontextmanager
+async def lifespan(_: FastMCP) -> AsyncIterator[None]:
+    async with HTTP_CLIENT_POOL.lifespan():
+        yield
+
+
+TOOL_CALLS: Counter = Counter("mcp_tool_calls_total", "MCP-Tool-Aufrufe nach Ergebnis", ("tool", "outcome"))
+TOOL_CALL_SECONDS: Histogram = Histogram("mcp_tool_call_duration_seconds", "Dauer von MCP-Tool-Aufrufen", ("tool",))
+TOOL_CALLS_IN_PROGRESS: Gauge = Gauge("mcp_tool_calls_in_progress", "Laufende MCP-Tool-Aufrufe", ("tool",))
+
+
+class ToolMetricsMiddleware(Middleware):
+    async def on_call_tool(self, context: MiddlewareContext, call_next: CallNext) -> Any:
+        tool: str = context.message.name
+        outcome: str = "error"
+        started_at: float = time.perf_counter()
+        try:
+            with TOOL_CALLS_IN_PROGRESS.labels(tool).track_inprogress():
+                result: Any = await call_next(context)
+            outcome = "ok"
+            return result
+        finally:
+            TOOL_CALLS.labels(tool, outcome).inc()
+            TOOL_CALL_SECONDS.labels(tool).observe(time.perf_counter() - started_at)
+
+
+SHARED_METRICS: SharedMetrics = SharedMetrics(REGISTRY, "MCP")
+LOOP_MONITOR: LoopLagMonitor = LoopLagMonitor.from_env("MCP")
+
+mcp: FastMCP = FastMCP(name="Externe APIs MCP Server", lifespan=lifespan)
+mcp.add_middleware(ToolMetricsMiddleware())
+
+CAT_FACT_URL: str = os.getenv("MCP_CAT_FACT_URL", "https://catfact.ninja/fact")
+DOG_IMAGE_URL: str = os.getenv("MCP_DOG_IMAGE_URL", "https://dog.ceo/api/breeds/image/random")
+ADVICE_URL: str = os.getenv("MCP_ADVICE_URL", "https://api.adviceslip.com/advice")
+MULTI_FETCH_MAX_ITEMS: int = int(os.getenv("MCP_MULTI_FETCH_MAX_ITEMS", "50"))
+MULTI_FETCH_CONCURRENCY: int = int(os.getenv("MCP_MULTI_FETCH_CONCURRENCY", "8"))
 
 
 @mcp.custom_route("/health", methods=["GET"])
@@ -17,49 +84,166 @@ async def get_mcp_server_healthcheck(_: Request) -> PlainTextResponse:
     return PlainTextResponse("OK", status_code=200)
 
 
+@mcp.custom_route("/stats/http", methods=["GET"])
+async def get_http_pool_stats(_: Request) -> JSONResponse:
+    return JSONResponse(HTTP_CLIENT_POOL.stats())
+
+
+@mcp.custom_route("/stats/upstream", methods=["GET"])
+async def get_upstream_stats(_: Request) -> JSONResponse:
+    return JSONResponse(upstream_stats())
+
+
+@mcp.custom_route("/stats/event-loop", methods=["GET"])
+async def get_event_loop_stats(_: Request) -> JSONResponse:
+    return JSONResponse(LOOP_MONITOR.stats())
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def get_metrics(_: Request) -> Response:
+    return Response(await SHARED_METRICS.render(), media_type=CONTENT_TYPE)
+
+
+async def fetch_cat_fact(allow_stale: bool = True) -> str:
+    result: ApiResponse = await call_external_api(CAT_FACT_URL, allow_stale=allow_stale)
+    return f"🐱 **Katzenfakt:** {result.data['fact']}{format_stale_hint(result)}"
+
+
+async def fetch_dog_image(allow_stale: bool = True) -> str:
+    result: ApiResponse = await call_external_api(DOG_IMAGE_URL, allow_stale=allow_stale)
+    return (
+        f"🐕 **Hundebild:** {result.data['message']}\n\n📊 **Status:** {result.data['status']}"
+        f"{format_stale_hint(result)}"
+    )
+
+
+async def fetch_advice(allow_stale: bool = True) -> str:
+    result: ApiResponse = await call_external_api(ADVICE_URL, allow_stale=allow_stale)
+    advice_text: str = result.data.get("slip", {}).get("advice", "")
+    advice_id: int = result.data.get("slip", {}).get("id", 0)
+    return f"💡 **Ratschlag #{advice_id}:** {advice_text}{format_stale_hint(result)}"
+
+
+CAT_FACT_PREFETCH: PrefetchBuffer = PrefetchBuffer.from_env("cat_fact", fetch_cat_fact)
+DOG_IMAGE_PREFETCH: PrefetchBuffer = PrefetchBuffer.from_env("dog_image", fetch_dog_image)
+ADVICE_PREFETCH: PrefetchBuffer = PrefetchBuffer.from_env("advice", fetch_advice)
+PREFETCHERS: list[PrefetchBuffer] = [CAT_FACT_PREFETCH, DOG_IMAGE_PREFETCH, ADVICE_PREFETCH]
+TOOL_PREFETCHERS: dict[str, PrefetchBuffer] = {buffer.name: buffer for buffer in PREFETCHERS}
+
+
+@mcp.custom_route("/stats/prefetch", methods=["GET"])
+async def get_prefetch_stats(_: Request) -> JSONResponse:
+    return JSONResponse({buffer.name: buffer.stats() for buffer in PREFETCHERS})
+
+
 @mcp.tool()
 async def cat_fact() -> str:
     """Holt einen interessanten Fakt über Katzen"""
-    result: dict[str, Any] = await call_external_api("https://catfact.ninja/fact")
-    response: str = f"🐱 **Katzenfakt:** {result['fact']}"
-    logger.info(f"🔍 Cat Fact: {response}")
+    response: str = await CAT_FACT_PREFETCH.get()
+    SAMPLED_LOGGER.info("🔍 Cat Fact: {}", response)
     return response
 
 
 @mcp.tool()
 async def dog_image() -> str:
     """Holt ein zufälliges Hundebild"""
-    result: dict[str, Any] = await call_external_api("https://dog.ceo/api/breeds/image/random")
-    response: str = f"🐕 **Hundebild:** {result['message']}\n\n📊 **Status:** {result['status']}"
-    logger.info(f"🔍 Dog Image: {response}")
+    response: str = await DOG_IMAGE_PREFETCH.get()
+    SAMPLED_LOGGER.info("🔍 Dog Image: {}", response)
     return response
 
 
 @mcp.tool()
 async def advice() -> str:
     """Holt einen zufälligen Lebensratschlag"""
-    result: dict[str, Any] = await call_external_api("https://api.adviceslip.com/advice")
-    advice_text: str = result.get("slip", {}).get("advice", "")
-    advice_id: int = result.get("slip", {}).get("id", 0)
-    response: str = f"💡 **Ratschlag #{advice_id}:** {advice_text}"
-    logger.info(f"🔍 Advice: {response}")
+    response: str = await ADVICE_PREFETCH.get()
+    SAMPLED_LOGGER.info("🔍 Advice: {}", response)
     return response
 
 
+@mcp.tool()
+async def multi_fetch(
+    requests: Annotated[
+        dict[str, int],
+        Field(description='Tool-Name und Anzahl, z.B. {"cat_fact": 5, "dog_image": 3, "advice": 1}'),
+    ],
+) -> dict[str, Any]:
+    """Ruft cat_fact, dog_image und advice beliebig oft parallel ab und liefert alle Ergebnisse gesammelt"""
+    total: int = sum(max(count, 0) for count in requests.values())
+    if total > MULTI_FETCH_MAX_ITEMS:
+        raise ToolError(f"Maximal {MULTI_FETCH_MAX_ITEMS} Ergebnisse pro Aufruf erlaubt ({total} angefragt)")
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(max(MULTI_FETCH_CONCURRENCY, 1))
+
+    async def fetch_one(buffer: PrefetchBuffer) -> dict[str, Any]:
+        async with semaphore:
+            try:
+                return {"tool": buffer.name, "result": await buffer.get()}
+            except Exception as error:
+                logger.warning("🔍 multi_fetch: {} fehlgeschlagen: {!r}", buffer.name, error)
+                return {"tool": buffer.name, "error": str(error) or type(error).__name__}
+
+    started_at: float = time.perf_counter()
+    # Ergebnisse stehen in Reihenfolge der Anfrage, auch Fehler für unbekannte Tools
+    results: list[dict[str, Any]] = []
+    positions: list[int] = []
+    fetches: list[Awaitable[dict[str, Any]]] = []
+    for tool, count in requests.items():
+        buffer: PrefetchBuffer | None = TOOL_PREFETCHERS.get(tool)
+        if buffer is None:
+            results.append({"tool": tool, "error": f"Unbekanntes Tool, erlaubt sind: {', '.join(TOOL_PREFETCHERS)}"})
+            continue
+        for _ in range(max(count, 0)):
+            positions.append(len(results))
+            results.append({})
+            fetches.append(fetch_one(buffer))
+    for position, result in zip(positions, await asyncio.gather(*fetches)):
+        results[position] = result
+    errors: int = sum(1 for result in results if "error" in result)
+    SAMPLED_LOGGER.info(
+        "🔍 multi_fetch: {} Ergebnisse, {} Fehler in {:.2f}s", len(results), errors, time.perf_counter() - started_at
+    )
+    return {"results": results, "errors": errors}
+
+
+def create_app() -> Starlette:
+    enable_auth: bool = os.getenv("MCP_ENABLE_AUTH", "true").lower() == "true"
+    # Bei anhaltender Loop-Verzögerung werden neue Tool-Aufrufe abgelehnt, bevor die Auth-Prüfung Zeit kostet
+    load_shedding: tuple[Any, ...] = (
+        LoadSheddingMiddleware,
+        [],
+        {"monitor": LOOP_MONITOR, "paths": frozenset({"/"}), "body_filter": is_tool_call},
+    )
+    app: Starlette = mcp.http_app(
+        path="/",
+        middleware=[(MetricsMiddleware, [], {}), load_shedding]
+        + ([(BasicAuthMiddleware, [], {})] if enable_auth else []),
+    )
+    # The MCP endpoint is mounted at "/" and would otherwise shadow the custom routes
+    app.router.routes.sort(key=lambda route: isinstance(route, Mount))
+    session_manager_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def app_lifespan(app: Starlette) -> AsyncIterator[None]:
+        # Der MCP-Lifespan läuft pro Session; Client-Pool und Prefetcher sollen die ganze Serverlaufzeit leben
+        async with (
+            HTTP_CLIENT_POOL.lifespan(),
+            run_prefetchers(PREFETCHERS),
+            SHARED_METRICS.running(),
+            LOOP_MONITOR.running(),
+            session_manager_lifespan(app),
+        ):
+            yield
+
+    app.router.lifespan_context = app_lifespan
+    return app
+
+
 def main() -> None:
     port: int = int(os.getenv("MCP_PORT", "8001"))
     enable_auth: bool = os.getenv("MCP_ENABLE_AUTH", "true").lower() == "true"
     logger.info(f"🚀 Starte JAAI Hub MCP Server für externe APIs")
     logger.info(f"🌐 Server läuft auf Port {port}")
     logger.info(f"🔒 Basic Auth ist {'aktiviert' if enable_auth else 'deaktiviert'}")
-    mcp.run(
-        transport="http",
-        host="0.0.0.0",
-        port=port,
-        path="/",
-        log_level="info",
-        middleware=[(BasicAuthMiddleware, [], {})] if enable_auth else [],
-    )
+    run("mcp_server.main:create_app", prefix="MCP", port=port, factory=True)
 
 
 if __name__ == "__main__":
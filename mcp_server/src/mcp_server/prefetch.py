@@ -0,0 +1,159 @@
+import asyncio
+import os
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from loguru import logger
+
+from mcp_server.metrics import Counter, Gauge
+from mcp_server.server import worker_count
+
+PREFETCH_BUFFERED: Gauge = Gauge("prefetch_buffered", "Vorgeladene Antworten im Puffer pro Tool", ("tool",))
+PREFETCH_SERVED: Counter = Counter(
+    "prefetch_served_total", "Tool-Antworten aus dem Puffer (hit) oder per Live-Aufruf (fallback)", ("tool", "source")
+)
+PREFETCH_REFILLS: Counter = Counter(
+    "prefetch_refills_total", "Hintergrund-Nachladevorgänge pro Tool", ("tool", "outcome")
+)
+
+
+class PrefetchBuffer:
+    """Begrenzter Ringpuffer fertiger Antworten für ein Tool mit zufälligem Ergebnis.
+
+    Ein Hintergrund-Task hält den Puffer gefüllt (höchstens `max_concurrency` parallele Aufrufe und
+    `refill_rate` Aufrufe pro Sekunde). `get()` nimmt sofort eine Antwort aus dem Puffer und ruft nur
+    bei leerem Puffer live ab. Nachgeladen wird mit `fetch(allow_stale=False)`, damit keine
+    zwischengespeicherten Antworten eines gestörten Hosts im Puffer landen.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[..., Awaitable[str]],
+        depth: int = 8,
+        max_concurrency: int = 2,
+        refill_rate: float = 2.0,
+        enabled: bool = True,
+    ) -> None:
+        self.name: str = name
+        self.fetch: Callable[..., Awaitable[str]] = fetch
+        self.depth: int = depth
+        self.max_concurrency: int = max(max_concurrency, 1)
+        self.refill_rate: float = refill_rate
+        self.enabled: bool = enabled and depth > 0
+        self._buffer: deque[str] = deque(maxlen=max(depth, 1))
+        self._inflight: set[asyncio.Task[None]] = set()
+        self._wakeup: asyncio.Event = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._next_start: float = 0.0
+        self._consecutive_errors: int = 0
+        self.hits: int = 0
+        self.fallbacks: int = 0
+        self.refills: int = 0
+        self.refill_errors: int = 0
+        self._buffered = PREFETCH_BUFFERED.labels(name)
+
+    @classmethod
+    def from_env(cls, name: str, fetch: Callable[..., Awaitable[str]]) -> "PrefetchBuffer":
+        """Liest `MCP_PREFETCH_<TOOL>_*` mit `MCP_PREFETCH_*` als Vorgabe; die Rate wird auf die Worker aufgeteilt"""
+
+        def setting(key: str, default: str) -> str:
+            return os.getenv(f"MCP_PREFETCH_{name.upper()}_{key}") or os.getenv(f"MCP_PREFETCH_{key}", default)
+
+        return cls(
+            name=name,
+            fetch=fetch,
+            depth=int(setting("DEPTH", "8")),
+            max_concurrency=int(setting("CONCURRENCY", "2")),
+            refill_rate=float(setting("RATE", "2")) / worker_count("MCP"),
+            enabled=setting("ENABLED", "true").lower() == "true",
+        )
+
+    async def get(self) -> str:
+        if self._buffer:
+            response: str = self._buffer.popleft()
+            self._buffered.set(len(self._buffer))
+            self.hits += 1
+            PREFETCH_SERVED.labels(self.name, "hit").inc()
+            self._wakeup.set()
+            return response
+        self.fallbacks += 1
+        PREFETCH_SERVED.labels(self.name, "fallback").inc()
+        self._wakeup.set()
+        return await self.fetch()
+
+    async def _pace(self) -> None:
+        if self.refill_rate <= 0:
+            return
+        now: float = asyncio.get_running_loop().time()
+        if self._next_start > now:
+            await asyncio.sleep(self._next_start - now)
+        self._next_start = max(now, self._next_start) + 1 / self.refill_rate
+
+    async def _refill_one(self) -> None:
+        try:
+            response: str = await self.fetch(allow_stale=False)
+        except Exception as error:
+            self.refill_errors += 1
+            self._consecutive_errors += 1
+            PREFETCH_REFILLS.labels(self.name, "error").inc()
+            backoff: float = min(30.0, 0.5 * 2**self._consecutive_errors)
+            logger.warning(f"📦 Prefetch für {self.name} fehlgeschlagen, neuer Versuch in {backoff:.1f}s: {error!r}")
+            await asyncio.sleep(backoff)
+        else:
+            self._consecutive_errors = 0
+            self.refills += 1
+            PREFETCH_REFILLS.labels(self.name, "ok").inc()
+            self._buffer.append(response)
+            self._buffered.set(len(self._buffer))
+        finally:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            while len(self._buffer) + len(self._inflight) < self.depth and len(self._inflight) < self.max_concurrency:
+                await self._pace()
+                task: asyncio.Task[None] = asyncio.create_task(self._refill_one())
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+            await self._wakeup.wait()
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks: list[asyncio.Task[None]] = [*self._inflight, *([self._task] if self._task else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    def stats(self) -> dict[str, Any]:
+        served: int = self.hits + self.fallbacks
+        return {
+            "enabled": self.enabled,
+            "depth": self.depth,
+            "buffered": len(self._buffer),
+            "refilling": len(self._inflight),
+            "max_concurrency": self.max_concurrency,
+            "refill_rate": self.refill_rate,
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "fallback_rate": self.fallbacks / served if served else 0.0,
+            "refills": self.refills,
+            "refill_errors": self.refill_errors,
+        }
+
+
+@asynccontextmanager
+async def run_prefetchers(buffers: list[PrefetchBuffer]) -> AsyncIterator[None]:
+    for buffer in buffers:
+        buffer.start()
+    try:
+        yield
+    finally:
+        for buffer in buffers:
+            await buffer.stop()
@@ -0,0 +1,107 @@
+# Gemeinsames Modul beider Services: Änderungen auch im Schwesterpaket nachziehen (scripts/check_shared_modules.py)
+import importlib.util
+import math
+import os
+import shutil
+import tempfile
+from typing import Any
+
+import uvicorn
+from loguru import logger
+
+
+def worker_count(prefix: str) -> int:
+    return max(int(os.getenv(f"{prefix}_WORKERS", "1")), 1)
+
+
+def worker_share(total: float, prefix: str) -> int:
+    """Anteil eines prozessübergreifenden Limits pro Worker (mindestens 1), damit die Summe etwa dem Limit entspricht"""
+    return max(math.ceil(total / worker_count(prefix)), 1)
+
+
+def _event_loop() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") is not None else "asyncio"
+
+
+def _http_protocol() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") is not None else "h11"
+
+
+def _run_gunicorn(app: str, host: str, port: int, workers: int, graceful_timeout: float) -> None:
+    from gunicorn.app.base import BaseApplication
+    from gunicorn.util import import_app
+
+    worker_class: str = (
+        "uvicorn_worker.UvicornWorker"
+        if importlib.util.find_spec("uvicorn_worker") is not None
+        else "uvicorn.workers.UvicornWorker"
+    )
+    options: dict[str, Any] = {
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "worker_class": worker_class,
+        "preload_app": True,
+        "graceful_timeout": int(graceful_timeout),
+        "timeout": 0,
+        "accesslog": "-",
+    }
+
+    class Application(BaseApplication):
+        def load_config(self) -> None:
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self) -> Any:
+            return import_app(app)
+
+    Application().run()
+
+
+def run(app: str, prefix: str, port: int, factory: bool = False) -> None:
+    """Startet `app` (Import-String) mit einem oder mehreren Workern.
+
+    `<PREFIX>_WORKERS` legt die Anzahl der Prozesse fest. `<PREFIX>_SERVER=gunicorn` nutzt, falls
+    installiert, einen Pre-Fork-Master mit vorab geladener App (Copy-on-Write); sonst überwacht
+    uvicorn die Worker. Beide starten die Worker bei SIGHUP nacheinander und geordnet neu.
+    Zustand, der über Prozesse hinweg konsistent sein muss, liegt in einem gemeinsamen lokalen
+    Verzeichnis (`<PREFIX>_METRICS_DIR`, sonst ein temporäres, das beim Beenden entfernt wird) bzw.
+    im SQLite-Cache.
+    """
+    workers: int = worker_count(prefix)
+    server: str = os.getenv(f"{prefix}_SERVER", "uvicorn").lower()
+    graceful_timeout: float = float(os.getenv(f"{prefix}_GRACEFUL_TIMEOUT", "30"))
+    metrics_dir: str | None = None
+    if workers > 1 and not os.getenv(f"{prefix}_METRICS_DIR"):
+        metrics_dir = os.environ[f"{prefix}_METRICS_DIR"] = tempfile.mkdtemp(prefix=f"{prefix.lower()}_metrics_")
+    owner: int = os.getpid()
+    try:
+        _serve(app, prefix, port, factory, workers, server, graceful_timeout)
+    finally:
+        # Per fork gestartete Worker durchlaufen dieses `finally` ebenfalls; aufräumen darf nur der Master
+        if metrics_dir is not None and os.getpid() == owner:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+def _serve(app: str, prefix: str, port: int, factory: bool, workers: int, server: str, graceful_timeout: float) -> None:
+    if server == "gunicorn":
+        if importlib.util.find_spec("gunicorn") is not None:
+            logger.info(f"🚀 Starte gunicorn mit {workers} Worker(n) und vorab geladener App")
+            _run_gunicorn(f"{app}()" if factory else app, "0.0.0.0", port, workers, graceful_timeout)
+            return
+        logger.warning("🚀 gunicorn angefordert, aber nicht installiert - nutze uvicorn")
+
+    logger.info(f"🚀 Starte uvicorn mit {workers} Worker(n) ({_event_loop()}, {_http_protocol()})")
+    uvicorn.run(
+        app,
+        factory=factory,
+        host="0.0.0.0",
+        port=port,
+        workers=workers,
+        loop=_event_loop(),
+        http=_http_protocol(),
+        timeout_graceful_shutdown=graceful_timeout,
+        reload=False,
+        log_level="info",
+        # Logging ist bereits über den Queue-Sink konfiguriert; uvicorn soll keine eigenen Handler setzen
+        log_config=None,
+    )
@@ -1,14 +1,158 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
 from typing import Any
+from urllib.parse import urlsplit
 
 import httpx
 from loguru import logger
 
+from mcp_server.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState
+from mcp_server.http_client import HTTP_CLIENT_POOL
+from mcp_server.metrics import Counter, Gauge, Histogram
 
-async def call_external_api(endpoint: str) -> Any:
+UPSTREAM_REQUEST_SECONDS: Histogram = Histogram(
+    "upstream_request_duration_seconds", "Latenz der Aufrufe externer APIs pro Host und Status", ("host", "status")
+)
+UPSTREAM_REQUESTS_IN_PROGRESS: Gauge = Gauge(
+    "upstream_requests_in_progress", "Laufende Aufrufe externer APIs pro Host", ("host",)
+)
+UPSTREAM_STALE_RESPONSES: Counter = Counter(
+    "upstream_stale_responses_total", "Antworten aus dem Last-Known-Good-Cache pro Host und Grund", ("host", "reason")
+)
+CIRCUIT_STATE: Gauge = Gauge(
+    "circuit_breaker_state",
+    "Zustand pro Host (0 = closed, 1 = half-open, 2 = open; schlechtester Worker)",
+    ("host",),
+    merge="max",
+)
+
+BREAKER_ENABLED: bool = os.getenv("MCP_BREAKER_ENABLED", "true").lower() == "true"
+STALE_CACHE_SIZE: int = int(os.getenv("MCP_STALE_CACHE_SIZE", "16"))
+STATE_VALUES: dict[CircuitState, int] = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+
+
+@dataclass
+class ApiResponse:
+    data: Any
+    stale: bool = False
+    age: float = 0.0
+
+
+class StaleResponseCache:
+    """Die letzten erfolgreichen Antworten pro Endpunkt; bei Störungen wird eine davon zufällig ausgeliefert"""
+
+    def __init__(self, size: int = 16) -> None:
+        self.size: int = size
+        self._responses: dict[str, deque[tuple[Any, float]]] = {}
+
+    def put(self, endpoint: str, data: Any) -> None:
+        if self.size > 0:
+            self._responses.setdefault(endpoint, deque(maxlen=self.size)).append((data, time.monotonic()))
+
+    def get(self, endpoint: str) -> ApiResponse | None:
+        responses: deque[tuple[Any, float]] | None = self._responses.get(endpoint)
+        if not responses:
+            return None
+        data, stored_at = random.choice(responses)
+        return ApiResponse(data=data, stale=True, age=time.monotonic() - stored_at)
+
+
+BREAKERS: dict[str, CircuitBreaker] = {}
+STALE_CACHE: StaleResponseCache = StaleResponseCache(STALE_CACHE_SIZE)
+_background: set[asyncio.Task[Any]] = set()
+
+
+def get_breaker(host: str) -> CircuitBreaker:
+    if host not in BREAKERS:
+        BREAKERS[host] = CircuitBreaker.from_env(host)
+    return BREAKERS[host]
+
+
+def upstream_stats() -> dict[str, Any]:
+    return {host: breaker.stats() for host, breaker in BREAKERS.items()}
+
+
+def _run_in_background(awaitable: Any) -> None:
+    task: asyncio.Task[Any] = asyncio.ensure_future(awaitable)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    # Fehler sind bereits geloggt und im Breaker verbucht
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+
+async def _request(endpoint: str, host: str, probe: bool = False) -> Any:
+    breaker: CircuitBreaker = get_breaker(host)
+    status: str = "error"
+    success: bool = False
+    started_at: float = time.perf_counter()
     try:
-        response = await httpx.AsyncClient(timeout=30.0).get(endpoint)
+        with UPSTREAM_REQUESTS_IN_PROGRESS.labels(host).track_inprogress():
+            response = await HTTP_CLIENT_POOL.get(endpoint)
+        status = str(response.status_code)
+        success = response.status_code < 500 and response.status_code != 429
         response.raise_for_status()
-        return response.json()
+        data: Any = response.json()
+        STALE_CACHE.put(endpoint, data)
+        return data
     except httpx.HTTPStatusError:
         logger.exception(f"Failed to call external API: {endpoint}")
         raise
+    finally:
+        elapsed: float = time.perf_counter() - started_at
+        UPSTREAM_REQUEST_SECONDS.labels(host, status).observe(elapsed)
+        if BREAKER_ENABLED:
+            previous: CircuitState = breaker.state
+            breaker.record(success, elapsed, probe=probe)
+            CIRCUIT_STATE.labels(host).set(STATE_VALUES[breaker.state])
+            if breaker.state is not previous:
+                logger.warning(f"🔌 Circuit Breaker für {host}: {previous.value} → {breaker.state.value}")
+
+
+def _serve_stale(endpoint: str, host: str, reason: str, allow_stale: bool) -> ApiResponse:
+    cached: ApiResponse | None = STALE_CACHE.get(endpoint) if allow_stale else None
+    if cached is None:
+        raise CircuitOpenError(host, get_breaker(host).retry_after)
+    UPSTREAM_STALE_RESPONSES.labels(host, reason).inc()
+    return cached
+
+
+async def call_external_api(endpoint: str, allow_stale: bool = True) -> ApiResponse:
+    """Ruft `endpoint` über den geteilten Client auf, geschützt durch einen Circuit Breaker pro Host.
+
+    Ist der Host gestört, wird sofort die letzte bekannte gute Antwort (als `stale` markiert) geliefert,
+    während höchstens ein Probe-Aufruf im Hintergrund prüft, ob er sich erholt hat. Dauert ein Aufruf
+    länger als die Slow-Call-Schwelle, wird ebenfalls die zwischengespeicherte Antwort geliefert und der
+    Aufruf läuft im Hintergrund zu Ende.
+    """
+    host: str = urlsplit(endpoint).hostname or ""
+    if not BREAKER_ENABLED:
+        return ApiResponse(data=await _request(endpoint, host))
+
+    breaker: CircuitBreaker = get_breaker(host)
+    if breaker.state is not CircuitState.CLOSED:
+        if breaker.try_acquire_probe():
+            logger.info(f"🔌 Prüfe im Hintergrund, ob {host} wieder erreichbar ist")
+            CIRCUIT_STATE.labels(host).set(STATE_VALUES[breaker.state])
+            _run_in_background(_request(endpoint, host, probe=True))
+        return _serve_stale(endpoint, host, "open", allow_stale)
+
+    request: asyncio.Task[Any] = asyncio.ensure_future(_request(endpoint, host))
+    if not allow_stale or STALE_CACHE.get(endpoint) is None:
+        return ApiResponse(data=await request)
+    done, _ = await asyncio.wait({request}, timeout=breaker.slow_call_seconds)
+    if done:
+        return ApiResponse(data=request.result())
+    _run_in_background(request)
+    return _serve_stale(endpoint, host, "slow", allow_stale)
+
+
+def format_stale_hint(response: ApiResponse) -> str:
+    if not response.stale:
+        return ""
+    minutes: int = int(response.age // 60)
+    age: str = f"vor {minutes} min" if minutes else "vor weniger als einer Minute"
+    return f"\n\n⏳ *Zwischengespeicherte Antwort ({age} abgerufen) - die Quelle ist gerade nicht erreichbar*"
@@ -0,0 +1,77 @@
+import pytest
+
+from mcp_server import circuit_breaker
+from mcp_server.circuit_breaker import CircuitBreaker, CircuitState
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now: float = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock: Clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+
+def create_breaker() -> CircuitBreaker:
+    return CircuitBreaker("api.example", window=4, min_calls=4, error_rate=0.5, slow_call_seconds=1.0, open_seconds=30)
+
+
+def test_opens_once_failure_rate_is_reached(clock: Clock) -> None:
+    breaker: CircuitBreaker = create_breaker()
+    for success in (True, True, False):
+        breaker.record(success, latency=0.1)
+    assert breaker.state is CircuitState.CLOSED
+
+    # Langsame Aufrufe zählen als Fehlschlag
+    breaker.record(True, latency=2.0)
+    assert breaker.state is CircuitState.OPEN
+    assert breaker.opened == 1
+    assert breaker.retry_after == 30
+
+
+def test_needs_min_calls_before_opening(clock: Clock) -> None:
+    breaker: CircuitBreaker = create_breaker()
+    for _ in range(3):
+        breaker.record(False, latency=0.1)
+    assert breaker.state is CircuitState.CLOSED
+
+
+def test_half_open_probe_closes_on_success(clock: Clock) -> None:
+    breaker: CircuitBreaker = create_breaker()
+    for _ in range(4):
+        breaker.record(False, latency=0.1)
+    assert not breaker.try_acquire_probe()
+
+    clock.now += 30
+    assert breaker.try_acquire_probe()
+    assert breaker.state is CircuitState.HALF_OPEN
+    # Nur der erste Aufrufer erhält die Probe
+    assert not breaker.try_acquire_probe()
+    # Ergebnisse anderer Aufrufe ändern den Zustand während der Probe nicht
+    breaker.record(False, latency=0.1)
+    assert breaker.state is CircuitState.HALF_OPEN
+
+    breaker.record(True, latency=0.1, probe=True)
+    assert breaker.state is CircuitState.CLOSED
+    assert breaker.stats()["calls_in_window"] == 0
+
+
+def test_half_open_probe_reopens_on_failure(clock: Clock) -> None:
+    breaker: CircuitBreaker = create_breaker()
+    for _ in range(4):
+        breaker.record(False, latency=0.1)
+    clock.now += 31
+    assert breaker.try_acquire_probe()
+
+    breaker.record(True, latency=5.0, probe=True)
+    assert breaker.state is CircuitState.OPEN
+    assert breaker.opened == 2
+    assert breaker.retry_after == 30
+    assert breaker.stats()["probes"] == 1
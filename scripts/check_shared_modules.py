@@ -0,0 +1,56 @@
+"""Prüft, dass die von Custom API und MCP Server gemeinsam genutzten Module identisch sind.
+
+Beide Services werden aus getrennten Docker-Build-Kontexten (`./custom_api`, `./mcp_server`) mit
+eingefrorenem `uv.lock` gebaut und können deshalb kein gemeinsames Paket importieren. Die Module
+liegen daher in beiden Paketen; bis auf Paketname und Umgebungsvariablen-Präfix müssen sie
+übereinstimmen. Läuft als pre-commit-Hook: `python scripts/check_shared_modules.py`.
+"""
+
+import difflib
+import sys
+from pathlib import Path
+
+ROOT: Path = Path(__file__).resolve().parent.parent
+SHARED_MODULES: tuple[str, ...] = (
+    "credential_cache.py",
+    "http_transport.py",
+    "logs.py",
+    "loop_monitor.py",
+    "metrics.py",
+    "server.py",
+)
+PACKAGES: tuple[tuple[Path, tuple[str, ...]], ...] = (
+    (ROOT / "custom_api" / "src" / "custom_api", ("custom_api", "CUSTOM_API")),
+    (ROOT / "mcp_server" / "src" / "mcp_server", ("mcp_server", "MCP")),
+)
+
+
+def normalize(text: str, names: tuple[str, ...]) -> list[str]:
+    for name in names:
+        text = text.replace(name, "<PACKAGE>")
+    return text.splitlines(keepends=True)
+
+
+def main() -> int:
+    (first, first_names), (second, second_names) = PACKAGES
+    failed: bool = False
+    for module in SHARED_MODULES:
+        diff: list[str] = list(
+            difflib.unified_diff(
+                normalize((first / module).read_text(), first_names),
+                normalize((second / module).read_text(), second_names),
+                fromfile=str((first / module).relative_to(ROOT)),
+                tofile=str((second / module).relative_to(ROOT)),
+            )
+        )
+        if diff:
+            failed = True
+            sys.stdout.writelines(diff)
+    if failed:
+        print("❌ Gemeinsame Module sind nicht mehr synchron, Änderungen bitte in beiden Paketen nachziehen")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())